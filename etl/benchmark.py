@@ -0,0 +1,397 @@
+# Modifying sys.path to include '/workspace/etl' and '/workspace/etl/utils' in the list of paths
+import sys
+sys.path.append('/workspace/etl')
+sys.path.append('/workspace/etl/utils')
+
+# Importing Modules
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from extract import DataExtractor
+from transform import (DataTransformer, normalize_dates, normalize_entry_date, normalize_appt_date, ENTRY_DATE_FORMATS,
+                       APPT_DATE_FORMATS)
+from load import quote_identifier
+from lead_matching import LeadMatcher
+from synthetic_data import write_synthetic_dataset, REAL_CSV_FILES
+from instrumentation import metrics
+from utils_checks_db import get_schema_table_columns, invalidate_schema_cache
+from utils_connection import get_db_engine, dispose_connections
+from step2_load_to_postgres import DataLoader
+
+# Stages of the benchmark, with the stages they depend on (a stage is skipped when one of them did not succeed)
+BENCHMARK_STAGES = {
+    'extract_csv': [],
+    'extract_parquet': [],
+    'clean_csv': ['extract_csv'],
+    'normalize_dates': ['extract_csv'],
+    'clean_parquet': ['extract_parquet'],
+    'load': ['extract_csv', 'extract_parquet', 'clean_csv', 'clean_parquet'],
+    'gold_matching': ['clean_csv', 'clean_parquet'],
+}
+
+# Tables loaded by the 'load' stage: (table, source schema, frame, partitioned), created in the benchmark schema
+BENCHMARK_TABLES = [
+    ('leads_parquet', 'bronze', 'bronze_parquet', False),
+    ('csv_snapshots', 'bronze', 'bronze_csv', False),
+    ('stg_leads_parquet', 'silver', 'silver_parquet', False),
+    ('stg_csv_snapshots', 'silver', 'silver_csv', True),
+]
+
+# Date columns of the 'normalize_dates' stage: (column, formats, row-by-row parser, missing value), as in `clean_csv`
+BENCHMARK_DATE_COLUMNS = [
+    ('ENTRYDATE', ENTRY_DATE_FORMATS, normalize_entry_date, pd.NaT),
+    ('APPT_DATE', APPT_DATE_FORMATS, normalize_appt_date, pd.NA),
+]
+
+class LocalS3Client:
+    """
+    Serves the files of a local folder through the subset of the boto3 S3 client API used by DataExtractor,
+    so the extract stages run the real extraction code on a synthetic dataset, without any network transfer.
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Initialize parameters.
+
+        Args:
+            root_dir (str): The folder holding the files, under their S3 keys (see `write_synthetic_dataset`).
+        """
+        self.root_dir = root_dir
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        with open(os.path.join(self.root_dir, Key), 'rb') as file:
+            body = file.read()
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body)}
+
+def get_dataset_bytes(data_dir: str, dataset: dict) -> int:
+    """Total size in bytes of the files of a synthetic dataset."""
+    keys = [file_key for file_key, _ in dataset['csv_partitions']] + [dataset['parquet_key']]
+    return sum(os.path.getsize(os.path.join(data_dir, key)) for key in keys)
+
+def create_benchmark_tables(engine, schema: str, typed: bool = False):
+    """
+    (Re)creates empty copies of the Bronze and Silver tables in the benchmark schema, so the 'load' stage goes
+    through DataLoader without touching the pipeline tables. The Silver tables must exist (step 1).
+
+    Unless `typed` is set, the columns are TEXT (except the partition key), like the Silver tables at load time
+    in the pipeline, before step 4 applies the Silver data types.
+    """
+    source_columns = {}
+    for table_name, source_schema, _, _ in BENCHMARK_TABLES:
+        source_columns.update(get_schema_table_columns(None, source_schema, [table_name], engine=engine))
+
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(schema)} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {quote_identifier(schema)}"))
+        for table_name, source_schema, _, partitioned in BENCHMARK_TABLES:
+            table = f"{quote_identifier(schema)}.{quote_identifier(table_name)}"
+            connection.execute(text(
+                f"CREATE TABLE {table} (LIKE {quote_identifier(source_schema)}.{quote_identifier(table_name)})"
+                + (' PARTITION BY RANGE ("_partition_date")' if partitioned else '')
+            ))
+            if not typed:
+                text_columns = [column for column in source_columns[table_name] if not (partitioned and column == '_partition_date')]
+                connection.execute(text(f"ALTER TABLE {table} " + ', '.join(
+                    f"ALTER COLUMN {quote_identifier(column)} TYPE TEXT" for column in text_columns)))
+    invalidate_schema_cache(schema)
+
+def drop_benchmark_schema(engine, schema: str):
+    """Drops the benchmark schema and its tables."""
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(schema)} CASCADE"))
+    invalidate_schema_cache(schema)
+
+def run_benchmark(data_dir: str, num_rows: int, num_files: int = REAL_CSV_FILES, seed: int = 0,
+                  stages: list = None, typed: bool = False, load_method: str = 'copy', csv_fetch_workers: int = 8,
+                  csv_clean_workers: int = None, benchmark_schema: str = 'benchmark', keep_tables: bool = False,
+                  categorical: bool = False, date_baseline_rows: int = 20_000) -> dict:
+    """
+    Generates a synthetic dataset (see `write_synthetic_dataset`) and times each stage of the pipeline on it
+    separately: extraction of the CSV files and of the Parquet file, `clean_csv`, `normalize_dates` (the vectorized
+    date parsing of `clean_csv` against the row-by-row `Series.apply` it replaced), `clean_parquet`, the load of the
+    Bronze and Silver frames into Postgres, and the gold matching (`LeadMatcher`).
+
+    The extract stages read the files through a LocalS3Client (no network), and the 'load' stage writes into
+    copies of the Bronze and Silver tables in `benchmark_schema`, dropped at the end unless `keep_tables` is set.
+
+    Args:
+        data_dir (str): The folder where the synthetic dataset is written.
+        num_rows (int): The total number of CSV rows (e.g. 10_000_000).
+        num_files (int): The number of daily CSV files.
+        seed (int): The seed of the data generator.
+        stages (list): The stages to run (optional, defaults to all of BENCHMARK_STAGES). Stages that are needed
+            by a selected stage are also run.
+        typed (bool): Run the extraction and the cleaning in typed mode.
+        load_method (str): 'insert' or 'copy' (see `write_df_to_postgres`).
+        csv_fetch_workers (int): Number of CSV files extracted concurrently.
+        csv_clean_workers (int): Clean the CSV data in that many worker processes (optional, serial otherwise).
+        benchmark_schema (str): The schema of the tables of the 'load' stage.
+        keep_tables (bool): Keep the benchmark schema after the run.
+        categorical (bool): Carry the low-cardinality CSV columns as categoricals through the extraction and the cleaning.
+        date_baseline_rows (int): Number of rows parsed row by row by the 'normalize_dates' stage (the row-by-row
+            parsers take about a minute per 100k rows, so the baseline is timed on the first rows only).
+
+    Returns:
+        dict: The report: 'benchmark' (parameters and environment), 'dataset' (rows, bytes and generation time),
+        'stages' (status, seconds, rows in and out and rows per second, per stage), 'date_normalization' (per date
+        column: the vectorized and row-by-row times and the speedup, when the 'normalize_dates' stage ran),
+        'total_seconds' and 'metrics' (the instrumented sub-stages, e.g. the S3 fetches and the steps of `clean_csv`,
+        see `MetricsRecorder.summary`).
+    """
+    selected = set(stages or BENCHMARK_STAGES)
+    unknown_stages = selected - set(BENCHMARK_STAGES)
+    if unknown_stages:
+        raise ValueError(f"Unknown benchmark stages {sorted(unknown_stages)}. Expected some of: {list(BENCHMARK_STAGES)}")
+    pending = list(selected)
+    while pending:  # Add the stages the selected stages depend on
+        for dependency in BENCHMARK_STAGES[pending.pop()]:
+            if dependency not in selected:
+                selected.add(dependency)
+                pending.append(dependency)
+
+    report = {
+        'benchmark': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'num_rows': num_rows,
+            'num_files': num_files,
+            'seed': seed,
+            'typed': typed,
+            'categorical': categorical,
+            'load_method': load_method,
+            'csv_fetch_workers': csv_fetch_workers,
+            'csv_clean_workers': csv_clean_workers,
+            'date_baseline_rows': date_baseline_rows,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'stages': {},
+    }
+
+    # Synthetic dataset
+    start = time.perf_counter()
+    dataset = write_synthetic_dataset(data_dir, num_rows, num_files=num_files, seed=seed)
+    report['dataset'] = {
+        'csv_rows': dataset['csv_rows'],
+        'parquet_rows': dataset['parquet_rows'],
+        'bytes': get_dataset_bytes(data_dir, dataset),
+        'generate_seconds': time.perf_counter() - start,
+    }
+    logging.info(f"Generated {dataset['csv_rows']} CSV rows and {dataset['parquet_rows']} Parquet rows in "
+                 f"{report['dataset']['generate_seconds']:.2f}s.")
+
+    extractor = DataExtractor(s3_client=LocalS3Client(data_dir))
+    transformer = DataTransformer()
+    frames = {}
+
+    def extract_csv():
+        frames['bronze_csv'] = extractor.extract_all_csv(max_workers=csv_fetch_workers,
+                                                         csv_partitions=dataset['csv_partitions'], typed=typed,
+                                                         categorical=categorical)
+        if frames['bronze_csv'].empty:
+            raise RuntimeError("No CSV data was extracted.")
+        return dataset['csv_rows'], len(frames['bronze_csv'])
+
+    def extract_parquet():
+        frames['bronze_parquet'] = extractor.extract_parquet(dataset['parquet_key'], typed=typed)
+        if frames['bronze_parquet'].empty:
+            raise RuntimeError("No Parquet data was extracted.")
+        return dataset['parquet_rows'], len(frames['bronze_parquet'])
+
+    def clean_csv():
+        if csv_clean_workers is None:
+            frames['silver_csv'] = transformer.clean_csv(frames['bronze_csv'], typed=typed, categorical=categorical)
+        else:
+            frames['silver_csv'] = transformer.clean_csv_parallel(frames['bronze_csv'], max_workers=csv_clean_workers,
+                                                                  typed=typed, categorical=categorical)
+        return len(frames['bronze_csv']), len(frames['silver_csv'])
+
+    def compare_date_normalization():
+        # Both parsers get the dates as `clean_csv` parses them (after the general cleaning, which is not timed),
+        # and the first `date_baseline_rows` rows of each column must match
+        bronze_csv = transformer.pre_clean_csv(frames['bronze_csv'].copy())
+        baseline_rows = min(len(bronze_csv), date_baseline_rows)
+        report['date_normalization'] = {}
+        for column, date_formats, parser, missing_value in BENCHMARK_DATE_COLUMNS:
+            values = bronze_csv[column].astype(object)
+
+            start = time.perf_counter()
+            vectorized = normalize_dates(values, date_formats, parser, missing_value)
+            vectorized_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            row_by_row = values.iloc[:baseline_rows].apply(parser)
+            row_by_row_seconds = time.perf_counter() - start
+
+            if not vectorized.iloc[:baseline_rows].astype(str).equals(row_by_row.astype(object).astype(str)):
+                raise RuntimeError(f"normalize_dates and Series.apply({parser.__name__}) differ on '{column}'.")
+            # The row-by-row time is extrapolated to the whole column
+            row_by_row_all_seconds = row_by_row_seconds * len(values) / baseline_rows if baseline_rows else None
+            report['date_normalization'][column] = {
+                'rows': len(values),
+                'vectorized_seconds': vectorized_seconds,
+                'baseline_rows': baseline_rows,
+                'row_by_row_seconds': row_by_row_seconds,
+                'speedup': row_by_row_all_seconds / vectorized_seconds if row_by_row_all_seconds and vectorized_seconds > 0 else None,
+            }
+            logging.info(f"normalize_dates({column}): {vectorized_seconds:.2f}s for {len(values)} rows, "
+                         f"Series.apply: {row_by_row_seconds:.2f}s for {baseline_rows} rows "
+                         f"(x{report['date_normalization'][column]['speedup'] or 0:.0f})")
+        return len(bronze_csv), len(bronze_csv)
+
+    def clean_parquet():
+        frames['silver_parquet'] = transformer.clean_parquet(frames['bronze_parquet'], typed=typed)
+        return len(frames['bronze_parquet']), len(frames['silver_parquet'])
+
+    def load():
+        engine = get_db_engine()
+        loader = DataLoader(engine=engine)
+        create_benchmark_tables(engine, benchmark_schema, typed=typed)
+        rows = 0
+        for table_name, _, frame_name, partitioned in BENCHMARK_TABLES:
+            df = frames[frame_name]
+            if table_name.endswith('csv_snapshots'):
+                loaded = loader.load_csv_to_postgres(df, table_name, benchmark_schema, method=load_method,
+                                                     partitioned=partitioned)
+            else:
+                loaded = loader.load_parquet_to_postgres(df, table_name, benchmark_schema, method=load_method)
+            if not loaded:
+                raise RuntimeError(f"Failed to load '{frame_name}' into '{benchmark_schema}.{table_name}'.")
+            rows += len(df)
+        return rows, rows
+
+    def gold_matching():
+        matcher = LeadMatcher(frames['silver_parquet'])
+        frames['gold'] = matcher.match(frames['silver_csv'])
+        return len(frames['silver_csv']), len(frames['gold'])
+
+    stage_functions = {
+        'extract_csv': extract_csv,
+        'extract_parquet': extract_parquet,
+        'clean_csv': clean_csv,
+        'normalize_dates': compare_date_normalization,
+        'clean_parquet': clean_parquet,
+        'load': load,
+        'gold_matching': gold_matching,
+    }
+
+    metrics.reset()
+    benchmark_start = time.perf_counter()
+    try:
+        for stage in BENCHMARK_STAGES:
+            if stage not in selected:
+                continue
+            failed_dependencies = [dep for dep in BENCHMARK_STAGES[stage] if report['stages'][dep]['status'] != 'succeeded']
+            if failed_dependencies:
+                logging.warning(f"Skipping {stage}: it depends on {failed_dependencies}, which did not succeed.")
+                report['stages'][stage] = {'status': 'skipped'}
+                continue
+
+            logging.info(f"Running benchmark stage: {stage}")
+            start = time.perf_counter()
+            try:
+                rows_in, rows_out = stage_functions[stage]()
+            except Exception as e:
+                logging.error(f"Benchmark stage {stage} failed: {e}", exc_info=e)
+                report['stages'][stage] = {'status': 'failed', 'seconds': time.perf_counter() - start, 'error': str(e)}
+                continue
+            seconds = time.perf_counter() - start
+            report['stages'][stage] = {
+                'status': 'succeeded',
+                'seconds': seconds,
+                'rows_in': rows_in,
+                'rows_out': rows_out,
+                'rows_per_second': rows_in / seconds if seconds > 0 else None,
+            }
+            logging.info(f"{stage:<16} {seconds:8.2f}s  {rows_in} rows in, {rows_out} rows out")
+    finally:
+        if 'load' in selected and not keep_tables:
+            try:
+                drop_benchmark_schema(get_db_engine(), benchmark_schema)
+            except Exception as e:
+                logging.warning(f"Could not drop the benchmark schema '{benchmark_schema}': {e}")
+
+    report['total_seconds'] = time.perf_counter() - benchmark_start
+    report['metrics'] = metrics.summary()
+    return report
+
+def compare_reports(baseline: dict, report: dict, tolerance: float = 0.2, min_seconds: float = 0.5) -> list:
+    """
+    Compares the stage times of a benchmark report with a baseline report (e.g. from the main branch).
+
+    Args:
+        baseline (dict): The baseline report (see `run_benchmark`).
+        report (dict): The new report.
+        tolerance (float): A stage regressed when it is more than this ratio slower than in the baseline...
+        min_seconds (float): ...and more than this many seconds slower (ignores the noise of the very short stages).
+
+    Returns:
+        list: (stage, baseline seconds, seconds) for every stage that regressed.
+    """
+    if baseline['benchmark']['num_rows'] != report['benchmark']['num_rows']:
+        logging.warning(f"The baseline ran on {baseline['benchmark']['num_rows']} rows and this run on "
+                        f"{report['benchmark']['num_rows']}: the stage times are not comparable.")
+
+    regressions = []
+    for stage, stage_report in report['stages'].items():
+        baseline_stage = baseline['stages'].get(stage, {})
+        if stage_report['status'] != 'succeeded' or baseline_stage.get('status') != 'succeeded':
+            continue
+        slowdown = stage_report['seconds'] - baseline_stage['seconds']
+        if slowdown > baseline_stage['seconds'] * tolerance and slowdown > min_seconds:
+            regressions.append((stage, baseline_stage['seconds'], stage_report['seconds']))
+            logging.warning(f"Regression in {stage}: {baseline_stage['seconds']:.2f}s -> {stage_report['seconds']:.2f}s")
+    return regressions
+
+# Main block for running the script directly
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on a synthetic dataset.")
+    parser.add_argument('stages', nargs='*', metavar='stage',
+                        help=f"Stages to run, among {list(BENCHMARK_STAGES)} (default: all the stages).")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Total number of CSV rows.")
+    parser.add_argument('--files', type=int, default=REAL_CSV_FILES, help="Number of daily CSV files.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the data generator.")
+    parser.add_argument('--data-dir', default='/tmp/etl_benchmark', help="Folder of the synthetic dataset.")
+    parser.add_argument('--report', default='benchmark_report.json', help="Path of the JSON report.")
+    parser.add_argument('--baseline', help="JSON report to compare with: exits with 1 when a stage regressed.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown ratio against the baseline.")
+    parser.add_argument('--typed', action='store_true', help="Run the extraction and the cleaning in typed mode.")
+    parser.add_argument('--categorical', action='store_true', help="Carry the low-cardinality CSV columns as categoricals.")
+    parser.add_argument('--load-method', default='copy', choices=['insert', 'copy'], help="Load method.")
+    parser.add_argument('--csv-fetch-workers', type=int, default=8, help="Number of CSV files extracted concurrently.")
+    parser.add_argument('--csv-clean-workers', type=int, help="Clean the CSV data in that many worker processes.")
+    parser.add_argument('--keep-tables', action='store_true', help="Keep the tables of the 'load' stage.")
+    parser.add_argument('--date-baseline-rows', type=int, default=20_000,
+                        help="Rows parsed row by row (Series.apply) by the 'normalize_dates' stage.")
+    args = parser.parse_args()
+
+    try:
+        report = run_benchmark(args.data_dir, args.rows, num_files=args.files, seed=args.seed, stages=args.stages or None,
+                               typed=args.typed, load_method=args.load_method, csv_fetch_workers=args.csv_fetch_workers,
+                               csv_clean_workers=args.csv_clean_workers, keep_tables=args.keep_tables,
+                               categorical=args.categorical, date_baseline_rows=args.date_baseline_rows)
+    finally:
+        dispose_connections()
+
+    with open(args.report, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    logging.info(f"Benchmark report written to {args.report}")
+
+    failed = any(stage_report['status'] != 'succeeded' for stage_report in report['stages'].values())
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            failed = bool(compare_reports(json.load(baseline_file), report, tolerance=args.tolerance)) or failed
+    if failed:
+        sys.exit(1)
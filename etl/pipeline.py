@@ -0,0 +1,220 @@
+# Modifying sys.path to include '/workspace/etl' and '/workspace/etl/utils' in the list of paths
+import sys
+sys.path.append('/workspace/etl')
+sys.path.append('/workspace/etl/utils')
+
+# Importing Modules
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+from pipeline_context import PipelineContext
+from instrumentation import metrics
+import step1_postgres_data_definition
+import step2_load_to_postgres
+import step3_partition_and_load_all_csv
+import step4_data_types_postgres
+import step5_create_gold_tables
+import step6_insert_into_gold_tables
+
+class PipelineNode:
+    """A unit of work of the pipeline DAG: a run(context) function and the names of the nodes it depends on."""
+
+    def __init__(self, name: str, run, depends_on: list = None):
+        """
+        Initialize parameters.
+
+        Args:
+            name (str): The name of the node.
+            run: The function running the node, called with the shared PipelineContext.
+            depends_on (list): The names of the nodes that must succeed before this one starts.
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = list(depends_on or [])
+
+# Node registry: the pipeline DAG. Nodes without a path between them run concurrently.
+# Every step also keeps its own CLI entry point (e.g. `python etl/step2_load_to_postgres.py`).
+PIPELINE_NODES = [
+    PipelineNode('data_definition', step1_postgres_data_definition.run_step),
+    PipelineNode('load_parquet', partial(step2_load_to_postgres.run_step, sources=('parquet',)), ['data_definition']),
+    PipelineNode('load_csv', partial(step2_load_to_postgres.run_step, sources=('csv',)), ['data_definition']),
+    PipelineNode('partition_csv', step3_partition_and_load_all_csv.run_step, ['load_csv']),
+    PipelineNode('data_types', step4_data_types_postgres.run_step, ['load_parquet', 'load_csv', 'partition_csv']),
+    PipelineNode('create_gold_tables', step5_create_gold_tables.run_step, ['data_definition']),
+    PipelineNode('insert_into_gold_tables', step6_insert_into_gold_tables.run_step, ['data_types', 'create_gold_tables']),
+]
+
+def sort_nodes(nodes: list) -> list:
+    """
+    Sorts the nodes so that every node comes after its dependencies (dependencies outside `nodes` are ignored).
+
+    Raises:
+        ValueError: If the dependencies contain a cycle.
+    """
+    node_names = {node.name for node in nodes}
+    sorted_nodes, sorted_names = [], set()
+    remaining = list(nodes)
+    while remaining:
+        ready = [node for node in remaining if all(dep in sorted_names or dep not in node_names for dep in node.depends_on)]
+        if not ready:
+            raise ValueError(f"The pipeline dependencies contain a cycle between {[node.name for node in remaining]}")
+        sorted_nodes.extend(ready)
+        sorted_names.update(node.name for node in ready)
+        remaining = [node for node in remaining if node.name not in sorted_names]
+    return sorted_nodes
+
+def get_critical_path(nodes: list, node_reports: dict) -> tuple:
+    """
+    Finds the chain of dependent nodes with the longest total run time, i.e. the lower bound of the pipeline
+    wall time however many workers are used.
+
+    Returns:
+        tuple: (list of node names, total seconds).
+    """
+    path_seconds, previous = {}, {}
+    for node in sort_nodes(nodes):
+        seconds = node_reports[node.name]['seconds']
+        if seconds is None:  # Not run
+            continue
+        deps = [dep for dep in node.depends_on if dep in path_seconds]
+        previous[node.name] = max(deps, key=lambda dep: path_seconds[dep]) if deps else None
+        path_seconds[node.name] = seconds + (path_seconds[previous[node.name]] if deps else 0.0)
+
+    if not path_seconds:
+        return [], 0.0
+    name = max(path_seconds, key=path_seconds.get)
+    total_seconds = path_seconds[name]
+    critical_path = []
+    while name is not None:
+        critical_path.append(name)
+        name = previous[name]
+    return critical_path[::-1], total_seconds
+
+def run_pipeline(node_names: list = None, context: PipelineContext = None, max_workers: int = 4) -> dict:
+    """
+    Runs the pipeline DAG in the same process: every node starts as soon as all its dependencies succeeded,
+    and independent nodes run concurrently in a thread pool, sharing one engine, one S3 client and in-memory
+    DataFrames. When a node fails, the nodes depending on it (directly or not) are skipped, while the
+    independent nodes still run.
+
+    Args:
+        node_names (list): The nodes to run (optional, defaults to all the nodes). Dependencies on nodes that
+            are not selected are considered satisfied.
+        context (PipelineContext): The shared resources (optional, a new context is created otherwise).
+        max_workers (int): Number of nodes running concurrently (1 runs them one after the other).
+
+    Returns:
+        dict: The run report: 'nodes' (status 'succeeded' / 'failed' / 'skipped', start and end offsets and
+        run time in seconds, per node), 'wall_seconds', 'critical_path', 'critical_path_seconds' and 'metrics'
+        (the instrumented stages, see `MetricsRecorder.summary`). The stage metrics are also written to
+        ETL_METRICS_FILE / ETL_METRICS_TABLE when set.
+    """
+    registry = {node.name: node for node in PIPELINE_NODES}
+    node_names = node_names or list(registry)
+    unknown_nodes = [node_name for node_name in node_names if node_name not in registry]
+    if unknown_nodes:
+        raise ValueError(f"Unknown pipeline nodes {unknown_nodes}. Expected some of: {list(registry)}")
+    nodes = sort_nodes([node for node in PIPELINE_NODES if node.name in node_names])
+    selected = {node.name for node in nodes}
+
+    metrics.reset()  # The stage metrics of this run only
+    own_context = context is None
+    context = context or PipelineContext()
+    node_reports = {node.name: {'status': 'pending', 'start': None, 'end': None, 'seconds': None} for node in nodes}
+    waiting_on = {node.name: {dep for dep in node.depends_on if dep in selected} for node in nodes}
+    pipeline_start = time.perf_counter()
+
+    def run_node(node: PipelineNode):
+        # Runs in a worker thread; start/end are offsets from the pipeline start
+        node_reports[node.name]['start'] = time.perf_counter() - pipeline_start
+        try:
+            with metrics.stage(f'pipeline.{node.name}'):
+                node.run(context)
+        finally:
+            node_reports[node.name]['end'] = time.perf_counter() - pipeline_start
+            node_reports[node.name]['seconds'] = node_reports[node.name]['end'] - node_reports[node.name]['start']
+
+    def skip_downstream(failed_name: str):
+        # Skip every waiting node that depends (directly or not) on the failed node
+        to_skip = [failed_name]
+        while to_skip:
+            name = to_skip.pop()
+            for node in nodes:
+                if name in node.depends_on and node.name in waiting_on:
+                    del waiting_on[node.name]
+                    node_reports[node.name]['status'] = 'skipped'
+                    logging.warning(f"Skipping {node.name}: it depends on {name}, which did not succeed.")
+                    to_skip.append(node.name)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+
+            def submit_ready_nodes():
+                for node in nodes:
+                    if node.name in waiting_on and not waiting_on[node.name]:
+                        del waiting_on[node.name]
+                        node_reports[node.name]['status'] = 'running'
+                        logging.info(f"Running node: {node.name}")
+                        running[executor.submit(run_node, node)] = node.name
+
+            submit_ready_nodes()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        node_reports[name]['status'] = 'succeeded'
+                        logging.info(f"Successfully completed: {name} ({node_reports[name]['seconds']:.2f}s)")
+                        for dependencies in waiting_on.values():
+                            dependencies.discard(name)
+                    except Exception as e:
+                        node_reports[name]['status'] = 'failed'
+                        logging.error(f"Error occurred while running {name}: {e}", exc_info=e)
+                        skip_downstream(name)
+                submit_ready_nodes()
+        metrics.flush(context.engine)
+    finally:
+        if own_context:
+            context.dispose()
+
+    wall_seconds = time.perf_counter() - pipeline_start
+    critical_path, critical_path_seconds = get_critical_path(nodes, node_reports)
+
+    # Report
+    for node in nodes:
+        node_report = node_reports[node.name]
+        if node_report['seconds'] is None:
+            logging.info(f"{node.name:<25} {node_report['status']}")
+        else:
+            logging.info(f"{node.name:<25} {node_report['status']:<10} start {node_report['start']:8.2f}s  "
+                         f"end {node_report['end']:8.2f}s  ({node_report['seconds']:.2f}s)")
+    logging.info(f"Critical path: {' -> '.join(critical_path)} = {critical_path_seconds:.2f}s "
+                 f"(pipeline wall time: {wall_seconds:.2f}s)")
+    logging.info("Slowest instrumented stages:")
+    metrics.log_summary()
+
+    return {
+        'nodes': node_reports,
+        'wall_seconds': wall_seconds,
+        'critical_path': critical_path,
+        'critical_path_seconds': critical_path_seconds,
+        'metrics': metrics.summary()
+    }
+
+# Main block for running the script directly
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Run the ETL pipeline DAG in a single process.")
+    parser.add_argument('nodes', nargs='*', metavar='node',
+                        help=f"Nodes to run, among {[node.name for node in PIPELINE_NODES]} (default: all the nodes).")
+    parser.add_argument('--max-workers', type=int, default=4, help="Number of nodes running concurrently.")
+    args = parser.parse_args()
+
+    report = run_pipeline(args.nodes or None, max_workers=args.max_workers)
+    if any(node_report['status'] != 'succeeded' for node_report in report['nodes'].values()):
+        sys.exit(1)
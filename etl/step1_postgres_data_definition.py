@@ -9,40 +9,16 @@ print(sys.path)
 import logging
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from utils_connection import create_db_engine, get_connection_uri
-from subprocess import call
-
-# Function to run SQL script using shell command and get connection details from utils_connection.py
-def run_sql_script(script_name):
-    """
-    Execute a SQL script using the connection details from utils_connection.py.
-
-    Args:
-        script_name (str): The name of the SQL script file.
-    """
-    # Get the SQL script path and connection URI
-    script_path = f"/workspace/sql_scripts/{script_name}"
-    connection_uri = get_connection_uri()  # Get the connection URI from utils_connection
-
-    # Construct the psql command with the connection URI
-    command = f"psql {connection_uri} -f {script_path}"
-
-    try:
-        # Execute the command
-        result = call(command, shell=True)
-        if result == 0:
-            print(f"SQL script {script_name} executed successfully.")
-        else:
-            print(f"Failed to execute the script {script_name}.")
-        return result
-    except Exception as e:
-        print(f"An error occurred while running the SQL script: {e}")
-        return None
+from utils_connection import get_db_engine
+from utils_checks_db import invalidate_schema_cache
+from partitions import migrate_to_daily_partitions
+from pipeline_context import PipelineContext
+from sql_runner import run_sql_script, run_sql_scripts_parallel
 
 # Function to check schema existence
-def check_schema_existence(connection_uri, schema_names):
+def check_schema_existence(connection_uri, schema_names, engine=None):
     try:
-        db_engine = create_db_engine(connection_uri)
+        db_engine = engine or get_db_engine(connection_uri)  # Reuse the given engine, or the process-wide one
         if db_engine is None:
             print("Failed to create the database engine.")
             return
@@ -67,9 +43,9 @@ def check_schema_existence(connection_uri, schema_names):
         print(f"An unexpected error occurred: {str(e)}")
 
 # Function to check table existence
-def check_table_existence(connection_uri, schema_name, table_names):
+def check_table_existence(connection_uri, schema_name, table_names, engine=None):
     try:
-        db_engine = create_db_engine(connection_uri)
+        db_engine = engine or get_db_engine(connection_uri)  # Reuse the given engine, or the process-wide one
         if db_engine is None:
             print("Failed to create the database engine.")
             return
@@ -93,10 +69,21 @@ def check_table_existence(connection_uri, schema_name, table_names):
     except Exception as e:
         print(f"An unexpected error occurred: {str(e)}")
 
-# Main block for running the script directly
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    
+def run_step(context: PipelineContext):
+    """
+    Creates the Bronze and Silver schemas and tables, then checks that they exist.
+
+    A STG_CSV_SNAPSHOTS created before the daily partitions (left as it is by CREATE TABLE IF NOT EXISTS) is
+    migrated to a partitioned table, keeping its rows.
+
+    Args:
+        context (PipelineContext): The resources shared by the pipeline steps.
+
+    Raises:
+        RuntimeError: If a SQL script failed (so the steps depending on this one are not run).
+    """
+    failed_scripts = []
+
     # Ingestion Parameters for Bronze, Silver, and Gold Layers
     schema_names = ['bronze', 'silver', 'gold']
     bronze_schema = 'bronze'
@@ -108,36 +95,53 @@ if __name__ == "__main__":
     create_silver_tables_script_path = 'silver/create_silver_tables.sql'
 
     # Table names per Schema
-    tables_in_bronze = ['leads_parquet', 'csv_snapshots']
+    tables_in_bronze = ['leads_parquet', 'csv_snapshots', 'ingestion_state']
     tables_in_silver = ['stg_leads_parquet', 'stg_csv_snapshots']
 
     # 1) Run create_schemas.sql 
     print("----- Creating SCHEMAS in PostgreSQL -----")
-    result = run_sql_script(create_schemas_script_path)
+    result = run_sql_script(create_schemas_script_path, engine=context.engine)
     if result == 0:
         print("Schemas created successfully.")
     else:
         print("Failed to create schemas.")
+        failed_scripts.append(create_schemas_script_path)
     
     # 2) Check schema existence
-    check_schema_existence(get_connection_uri(), schema_names)
+    check_schema_existence(context.connection_uri, schema_names, engine=context.engine)
 
-    # 3) Run create_bronze_tables.sql 
-    print("----- Creating BRONZE Tables in PostgreSQL -----")
-    result = run_sql_script(create_bronze_tables_script_path)
-    if result == 0:
+    # 3) and 4) Run create_bronze_tables.sql and create_silver_tables.sql (independent: run concurrently)
+    print("----- Creating BRONZE and SILVER Tables in PostgreSQL -----")
+    results = run_sql_scripts_parallel([create_bronze_tables_script_path, create_silver_tables_script_path], engine=context.engine)
+    if results[create_bronze_tables_script_path] == 0:
         print("Bronze tables created successfully.")
     else:
         print("Failed to create bronze tables.")
-    
-    # 4) Run create_silver_tables.sql 
-    print("----- Creating SILVER Tables in PostgreSQL -----")
-    result = run_sql_script(create_silver_tables_script_path)
-    if result == 0:
+        failed_scripts.append(create_bronze_tables_script_path)
+    if results[create_silver_tables_script_path] == 0:
         print("Silver tables created successfully.")
     else:
         print("Failed to create silver tables.")
+        failed_scripts.append(create_silver_tables_script_path)
+
+    # The tables may have changed: forget the cached columns
+    invalidate_schema_cache()
+
+    # Migrate an unpartitioned STG_CSV_SNAPSHOTS (from a deployment older than the daily partitions), in one transaction
+    if create_silver_tables_script_path not in failed_scripts:
+        with context.engine.begin() as connection:
+            migrated_rows = migrate_to_daily_partitions(connection, silver_schema, 'stg_csv_snapshots')
+        if migrated_rows:
+            print(f"Migrated {migrated_rows} rows of {silver_schema}.stg_csv_snapshots to daily partitions.")
 
     # 5) Check table existence for Bronze and Silver
-    check_table_existence(get_connection_uri(), bronze_schema, tables_in_bronze)
-    check_table_existence(get_connection_uri(), silver_schema, tables_in_silver)
\ No newline at end of file
+    check_table_existence(context.connection_uri, bronze_schema, tables_in_bronze, engine=context.engine)
+    check_table_existence(context.connection_uri, silver_schema, tables_in_silver, engine=context.engine)
+
+    if failed_scripts:
+        raise RuntimeError(f"Failed to execute the SQL scripts {failed_scripts}.")
+
+# Main block for running the script directly
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_step(PipelineContext())
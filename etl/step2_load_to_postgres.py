@@ -6,38 +6,72 @@ print(sys.path)
 
 # Importing Modules
 import logging
+from contextlib import contextmanager
+from typing import Iterable
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import text, bindparam
 from sqlalchemy.exc import SQLAlchemyError
 from extract import DataExtractor
 from transform import DataTransformer
-from utils_connection import get_s3_parquet_file_key, get_connection_uri
+from utils_connection import get_s3_parquet_file_key, get_connection_uri, get_db_engine
 from utils_checks_db import get_schema_table_columns
+from load import write_df_to_postgres, quote_identifier
+from partitions import create_daily_partitions
+from silver_sql import insert_csv_silver, insert_parquet_silver
+from ingestion_state import IngestionState
+from instrumentation import instrumented
+from pipeline_context import PipelineContext
 
 class DataLoader:
-    def __init__(self):
+    def __init__(self, engine=None):
         self.connection_uri = get_connection_uri()  # Fetch connection URI
-        self.engine = create_engine(self.connection_uri)
+        self.engine = engine or get_db_engine(self.connection_uri)  # Reuse the given engine, or the process-wide one
 
-    def load_parquet_to_postgres(self, parquet_df: pd.DataFrame, table_name: str, schema: str):
-        """Loads a Parquet DataFrame into the specified Postgres table with schema validation."""
+    @contextmanager
+    def begin(self, conn=None):
+        """A new transaction on the engine, or the given connection as it is (the load is then part of the caller's transaction)."""
+        if conn is not None:
+            yield conn
+        else:
+            with self.engine.begin() as conn:
+                yield conn
+
+    @instrumented('load.load_parquet_to_postgres')
+    def load_parquet_to_postgres(self, parquet_df: pd.DataFrame, table_name: str, schema: str, method: str = 'insert', chunksize: int = None,
+                                 conn=None):
+        """
+        Loads a Parquet DataFrame into the specified Postgres table with schema validation.
+
+        Args:
+            parquet_df (pd.DataFrame): The DataFrame to load.
+            table_name (str): The name of the target table.
+            schema (str): The schema of the target table.
+            method (str): 'insert' (DataFrame.to_sql) or 'copy' (COPY FROM STDIN, much faster for large loads).
+            chunksize (int): Number of rows sent per batch (optional).
+            conn: An open connection to load the data in (optional, e.g. to load several tables in one transaction).
+                By default, the data is loaded in a transaction of its own.
+
+        Returns:
+            bool: True if the data was loaded, False otherwise.
+        """
         try:
             # Validate schema before loading
-            schema_table_columns = get_schema_table_columns(self.connection_uri, schema, [table_name])
+            schema_table_columns = get_schema_table_columns(self.connection_uri, schema, [table_name], engine=self.engine)
             schema_columns = schema_table_columns.get(table_name, [])
 
             if not schema_columns:
                 logging.error(f"No columns found for table '{schema}.{table_name}' in schema.")
-                return
+                return False
 
             # Reorder DataFrame columns to match schema (optional)
             parquet_df = parquet_df[schema_columns]  # Keep only schema columns, discard others
 
             # Check if DataFrame columns match schema columns
             if all(column in parquet_df.columns for column in schema_columns):
-                with self.engine.begin() as conn:
-                    parquet_df.to_sql(table_name, conn, schema=schema, if_exists='append', index=False)
-                    logging.info(f"Successfully loaded Parquet data to '{schema}.{table_name}'.")
+                with self.begin(conn) as conn:
+                    write_df_to_postgres(conn, parquet_df, table_name, schema, method=method, chunksize=chunksize)
+                    logging.info(f"Successfully loaded Parquet data to '{schema}.{table_name}' (method: {method}).")
+                    return True
             else:
                 logging.error(f"DataFrame columns do not match the schema columns for '{schema}.{table_name}': {schema_columns}")
         
@@ -45,26 +79,48 @@ class DataLoader:
             logging.error(f"SQLAlchemyError while loading Parquet data to '{schema}.{table_name}': {str(e)}")
         except Exception as e:
             logging.error(f"An error occurred: {str(e)}") 
+        return False
+
+    @instrumented('load.load_csv_to_postgres')
+    def load_csv_to_postgres(self, csv_df: pd.DataFrame, table_name: str, schema: str, method: str = 'insert', chunksize: int = None,
+                             partitioned: bool = False, conn=None):
+        """
+        Loads a CSV DataFrame into the specified Postgres table with schema validation.
+
+        Args:
+            csv_df (pd.DataFrame): The DataFrame to load.
+            table_name (str): The name of the target table.
+            schema (str): The schema of the target table.
+            method (str): 'insert' (DataFrame.to_sql) or 'copy' (COPY FROM STDIN, much faster for large loads).
+            chunksize (int): Number of rows sent per batch (optional).
+            partitioned (bool): The table is partitioned by range on '_partition_date': the missing daily partitions
+                are created first, in the same transaction as the load.
+            conn: An open connection to load the data in (optional, e.g. to load several tables in one transaction).
+                By default, the data is loaded in a transaction of its own.
 
-    def load_csv_to_postgres(self, csv_df: pd.DataFrame, table_name: str, schema: str):
-        """Loads a CSV DataFrame into the specified Postgres table with schema validation."""
+        Returns:
+            bool: True if the data was loaded, False otherwise.
+        """
         try:
             # Validate schema before loading
-            schema_table_columns = get_schema_table_columns(self.connection_uri, schema, [table_name])
+            schema_table_columns = get_schema_table_columns(self.connection_uri, schema, [table_name], engine=self.engine)
             schema_columns = schema_table_columns.get(table_name, [])
 
             if not schema_columns:
                 logging.error(f"No columns found for table '{schema}.{table_name}' in schema.")
-                return
+                return False
 
             # Reorder DataFrame columns to match schema (optional)
             csv_df = csv_df[schema_columns]  # Keep only schema columns, discard others
 
             # Check if DataFrame columns match schema columns
             if all(column in csv_df.columns for column in schema_columns):
-                with self.engine.begin() as conn:
-                    csv_df.to_sql(table_name, conn, schema=schema, if_exists='append', index=False)
-                    logging.info(f"Successfully loaded CSV data to '{schema}.{table_name}'.")
+                with self.begin(conn) as conn:
+                    if partitioned:
+                        create_daily_partitions(conn, schema, table_name, csv_df['_partition_date'])
+                    write_df_to_postgres(conn, csv_df, table_name, schema, method=method, chunksize=chunksize)
+                    logging.info(f"Successfully loaded CSV data to '{schema}.{table_name}' (method: {method}).")
+                    return True
             else:
                 logging.error(f"DataFrame columns do not match the schema columns for '{schema}.{table_name}': {schema_columns}")
         
@@ -72,66 +128,464 @@ class DataLoader:
             logging.error(f"SQLAlchemyError while loading CSV data to '{schema}.{table_name}': {str(e)}")
         except Exception as e:
             logging.error(f"An error occurred: {str(e)}") 
+        return False
+
+    def load_csv_chunks_to_postgres(self, csv_chunks: Iterable[pd.DataFrame], table_name: str, schema: str, method: str = 'insert',
+                                    partitioned: bool = False, conn=None) -> int:
+        """
+        Loads an iterable of CSV DataFrame chunks (e.g. from DataExtractor.iter_csv_chunks) into the specified Postgres table, one chunk at a time
+        (each in a transaction of its own, or all of them in `conn`).
+
+        Returns:
+            int: The number of rows loaded.
+
+        Raises:
+            RuntimeError: On the first chunk that could not be loaded (the chunks loaded before it are kept, unless they
+                were loaded in `conn`, whose transaction the caller rolls back).
+        """
+        total_rows = 0
+        for chunk_number, chunk in enumerate(csv_chunks, start=1):
+            if not self.load_csv_to_postgres(chunk, table_name, schema, method=method, partitioned=partitioned, conn=conn):
+                raise RuntimeError(f"Failed to load chunk {chunk_number} of CSV data into '{schema}.{table_name}' "
+                                   f"({total_rows} rows loaded before it).")
+            total_rows += len(chunk)
+        logging.info(f"Streamed {total_rows} rows of CSV data to '{schema}.{table_name}'.")
+        return total_rows
+
+    def load_parquet_chunks_to_postgres(self, parquet_chunks: Iterable[pd.DataFrame], table_name: str, schema: str, method: str = 'insert',
+                                        conn=None) -> int:
+        """
+        Loads an iterable of Parquet DataFrame chunks into the specified Postgres table, one chunk at a time
+        (each in a transaction of its own, or all of them in `conn`).
+
+        Returns:
+            int: The number of rows loaded.
+
+        Raises:
+            RuntimeError: On the first chunk that could not be loaded (the chunks loaded before it are kept, unless they
+                were loaded in `conn`, whose transaction the caller rolls back).
+        """
+        total_rows = 0
+        for chunk_number, chunk in enumerate(parquet_chunks, start=1):
+            if not self.load_parquet_to_postgres(chunk, table_name, schema, method=method, conn=conn):
+                raise RuntimeError(f"Failed to load chunk {chunk_number} of Parquet data into '{schema}.{table_name}' "
+                                   f"({total_rows} rows loaded before it).")
+            total_rows += len(chunk)
+        logging.info(f"Streamed {total_rows} rows of Parquet data to '{schema}.{table_name}'.")
+        return total_rows
+
+    def delete_rows(self, conn, table_name: str, schema: str, partition_dates: list = None):
+        """
+        Deletes previously loaded rows from the specified Postgres table, before an S3 object is (re)loaded.
+
+        Args:
+            conn: An open connection, whose transaction also reloads the rows (so a failed reload keeps the old rows).
+            table_name (str): The name of the table.
+            schema (str): The schema of the table.
+            partition_dates (list): If set, only rows with one of these '_partition_date' values ('YYYY-MM-DD') are deleted.
+                Otherwise, all rows are deleted.
+        """
+        query = f"DELETE FROM {quote_identifier(schema)}.{quote_identifier(table_name)}"
+        try:
+            if partition_dates is None:
+                result = conn.execute(text(query))
+            else:
+                query = text(f'{query} WHERE "_partition_date" IN :partition_dates').bindparams(
+                    bindparam('partition_dates', value=[str(partition_date) for partition_date in partition_dates], expanding=True))
+                result = conn.execute(query)
+            logging.info(f"Deleted {result.rowcount} rows from '{schema}.{table_name}'.")
+        except SQLAlchemyError as e:
+            logging.error(f"SQLAlchemyError while deleting rows from '{schema}.{table_name}': {str(e)}")
+            raise
+
+# Sources loaded by step2; each one is independent of the other, so they can run concurrently (see etl/pipeline.py)
+SOURCES = ('parquet', 'csv')
+
+# Engines building Silver from Bronze: 'pandas' (DataTransformer) or 'sql' (INSERT ... SELECT inside Postgres, see silver_sql.py)
+SILVER_ENGINES = ('pandas', 'sql')
+
+def clean_csv_data(transformer: DataTransformer, csv_df: pd.DataFrame, typed: bool = False,
+                   csv_clean_workers: int = None, categorical: bool = False) -> pd.DataFrame:
+    """Cleans the CSV data in this process, or by partition date in `csv_clean_workers` worker processes."""
+    if csv_clean_workers is None:
+        return transformer.clean_csv(csv_df, typed=typed, categorical=categorical)
+    return transformer.clean_csv_parallel(csv_df, max_workers=csv_clean_workers, typed=typed, categorical=categorical)
+
+def build_silver_in_postgres(loader: DataLoader, source: str, typed: bool = False, partition_dates: list = None,
+                             conn=None) -> int:
+    """
+    Builds the Silver rows of a source from its Bronze table inside Postgres (the 'sql' Silver engine).
+
+    Args:
+        loader (DataLoader): The loader holding the engine.
+        source (str): 'parquet' or 'csv'.
+        typed (bool): Keep NULLs instead of the string sentinels of the untyped mode.
+        partition_dates (list): Only build the CSV rows of these '_partition_date' values (all by default).
+        conn: An open connection to build the rows in (optional). By default, a transaction of its own.
+
+    Returns:
+        int: The number of Silver rows inserted.
+    """
+    try:
+        with loader.begin(conn) as conn:
+            if source == 'parquet':
+                return insert_parquet_silver(conn)
+            return insert_csv_silver(conn, typed=typed, partition_dates=partition_dates)
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Failed to build the Silver {source} data in Postgres: {str(e)}") from e
+
+def run_full_parquet_load(extractor: DataExtractor, loader: DataLoader, transformer: DataTransformer,
+                          load_method: str, typed: bool = False, silver_engine: str = 'pandas',
+                          read_chunksize: int = None) -> pd.DataFrame:
+    """
+    Extracts the Parquet file, appends it to Bronze, then rebuilds Silver from the whole Bronze table.
+    With the 'sql' Silver engine, Silver is built inside Postgres and nothing is read back.
+    With `read_chunksize`, Bronze is read back, cleaned and loaded into Silver chunk by chunk.
+
+    Returns:
+        pd.DataFrame: The Silver DataFrame built from the whole Bronze table (None with the 'sql' Silver engine or
+        `read_chunksize`, as Silver is never held in memory).
+    """
+    bronze_schema = 'bronze'
+    silver_schema = 'silver'
+
+    # Get Parquet file and load it into Bronze in Postgres
+    parquet_key = get_s3_parquet_file_key()  # Retrieve the Parquet file key
+    parquet_df = extractor.extract_parquet(parquet_key, typed=typed)
+    if not loader.load_parquet_to_postgres(parquet_df, 'leads_parquet', bronze_schema, method=load_method):
+        raise RuntimeError(f"Failed to load the Parquet data into '{bronze_schema}.leads_parquet'.")
+
+    if silver_engine == 'sql':
+        build_silver_in_postgres(loader, 'parquet', typed=typed)
+        return None
+
+    if read_chunksize is not None:
+        bronze_chunks = transformer.iter_data_from_postgres(bronze_schema, 'leads_parquet', chunksize=read_chunksize)
+        silver_chunks = transformer.clean_parquet_batches(bronze_chunks, typed=typed)
+        if loader.load_parquet_chunks_to_postgres(silver_chunks, 'stg_leads_parquet', silver_schema, method=load_method) == 0:
+            raise RuntimeError(f"Failed to load the Parquet data into '{silver_schema}.stg_leads_parquet'.")
+        return None
+
+    # Get data from Bronze in Postgres and Apply transformations
+    parquet_data = transformer.get_data_from_postgres_to_pd(bronze_schema, 'leads_parquet')
+    silver_parquet_data = transformer.clean_parquet(parquet_data, typed=typed)
+
+    # Debugging: Preview the transformed DataFrame and its columns (diagnostics mode only)
+    transformer.diagnostics.preview('silver.stg_leads_parquet', silver_parquet_data)
+
+    # Load data into Silver in Postgres
+    print("Initiated Load into Postgres (Silver.stg_leads_parquet):")
+    if not loader.load_parquet_to_postgres(silver_parquet_data, 'stg_leads_parquet', silver_schema, method=load_method):
+        raise RuntimeError(f"Failed to load the Parquet data into '{silver_schema}.stg_leads_parquet'.")
+    return silver_parquet_data
+
+def run_full_csv_load(extractor: DataExtractor, loader: DataLoader, transformer: DataTransformer,
+                      csv_fetch_workers: int, csv_chunksize: int, load_method: str, typed: bool = False,
+                      csv_clean_workers: int = None, silver_engine: str = 'pandas', read_chunksize: int = None,
+                      categorical: bool = False) -> pd.DataFrame:
+    """
+    Extracts all CSV files, appends them to Bronze, then rebuilds Silver from the whole Bronze table.
+    With `csv_clean_workers`, the CSV data is cleaned by partition date in that many worker processes.
+    With `categorical`, the low-cardinality columns are carried as categoricals until they are loaded.
+    With the 'sql' Silver engine, Silver is built inside Postgres and nothing is read back.
+    With `read_chunksize`, Bronze is read back, cleaned and loaded into Silver chunk by chunk (the cleaning is
+    row by row, so the result is the same).
+
+    Returns:
+        pd.DataFrame: The Silver DataFrame built from the whole Bronze table (None with the 'sql' Silver engine or
+        `read_chunksize`, as Silver is never held in memory).
+    """
+    bronze_schema = 'bronze'
+    silver_schema = 'silver'
+
+    # Get all CSV files and load them into Bronze in Postgres (streamed in chunks when csv_chunksize is set)
+    if csv_chunksize is None:
+        csv_df = extractor.extract_all_csv(max_workers=csv_fetch_workers, typed=typed, categorical=categorical)
+        if not loader.load_csv_to_postgres(csv_df, 'csv_snapshots', bronze_schema, method=load_method):
+            raise RuntimeError(f"Failed to load the CSV data into '{bronze_schema}.csv_snapshots'.")
+    else:
+        csv_chunks = extractor.iter_csv_chunks(csv_chunksize, typed=typed)
+        if loader.load_csv_chunks_to_postgres(csv_chunks, 'csv_snapshots', bronze_schema, method=load_method) == 0:
+            raise RuntimeError(f"Failed to load the CSV data into '{bronze_schema}.csv_snapshots'.")
+
+    if silver_engine == 'sql':
+        build_silver_in_postgres(loader, 'csv', typed=typed)
+        return None
+
+    if read_chunksize is not None:
+        bronze_chunks = transformer.iter_data_from_postgres(bronze_schema, 'csv_snapshots', chunksize=read_chunksize)
+        silver_chunks = (clean_csv_data(transformer, chunk, typed=typed, csv_clean_workers=csv_clean_workers,
+                                        categorical=categorical)
+                         for chunk in bronze_chunks)
+        if loader.load_csv_chunks_to_postgres(silver_chunks, 'stg_csv_snapshots', silver_schema, method=load_method,
+                                              partitioned=True) == 0:
+            raise RuntimeError(f"Failed to load the CSV data into '{silver_schema}.stg_csv_snapshots'.")
+        return None
+
+    # Get data from Bronze in Postgres and Apply transformations
+    csv_data = transformer.get_data_from_postgres_to_pd(bronze_schema, 'csv_snapshots')
+    silver_csv_data = clean_csv_data(transformer, csv_data, typed=typed, csv_clean_workers=csv_clean_workers,
+                                     categorical=categorical)
+
+    # Debugging: Preview the transformed DataFrame and its columns (diagnostics mode only)
+    transformer.diagnostics.preview('silver.stg_csv_snapshots', silver_csv_data)
+
+    # Load data into Silver in Postgres
+    print("Initiated Load into Postgres (Silver.stg_csv_snapshots):")
+    if not loader.load_csv_to_postgres(silver_csv_data, 'stg_csv_snapshots', silver_schema, method=load_method, partitioned=True):
+        raise RuntimeError(f"Failed to load the CSV data into '{silver_schema}.stg_csv_snapshots'.")
+    return silver_csv_data
+
+def load_parquet_in_batches(extractor: DataExtractor, loader: DataLoader, transformer: DataTransformer,
+                            parquet_key: str, batch_size: int, load_method: str, typed: bool = False, conn=None) -> tuple[int, int]:
+    """
+    Streams the Parquet file from S3 into Bronze and Silver batch by batch, so memory is bounded by `batch_size`
+    (all the batches are loaded in `conn` if given, i.e. in one transaction).
+
+    Returns:
+        tuple: The number of rows loaded into (Bronze, Silver).
+
+    Raises:
+        RuntimeError: On the first batch that could not be loaded into Bronze or Silver.
+    """
+    bronze_rows = 0
+
+    def bronze_batches():
+        # Each extracted batch is loaded into Bronze, then handed to the Silver cleaning
+        nonlocal bronze_rows
+        for batch_number, batch_df in enumerate(extractor.iter_parquet_chunks(parquet_key, batch_size=batch_size, typed=typed), start=1):
+            if not loader.load_parquet_to_postgres(batch_df, 'leads_parquet', 'bronze', method=load_method, conn=conn):
+                raise RuntimeError(f"Failed to load batch {batch_number} of the Parquet file '{parquet_key}' into Bronze "
+                                   f"({bronze_rows} rows loaded before it).")
+            bronze_rows += len(batch_df)
+            yield batch_df.copy()
+
+    silver_batches = transformer.clean_parquet_batches(bronze_batches(), typed=typed)
+    silver_rows = loader.load_parquet_chunks_to_postgres(silver_batches, 'stg_leads_parquet', 'silver', method=load_method, conn=conn)
+    return bronze_rows, silver_rows
+
+def run_incremental_parquet_load(extractor: DataExtractor, loader: DataLoader, transformer: DataTransformer,
+                                 load_method: str, typed: bool = False, parquet_batch_size: int = None,
+                                 silver_engine: str = 'pandas'):
+    """
+    Extracts, transforms and appends the Parquet file only if it is new or changed since the last run.
+
+    The S3 metadata (ETag, size, last-modified) of every loaded object is kept in bronze.ingestion_state.
+    The Parquet file is a single object: if it is new or changed, all the rows of Bronze and Silver are replaced with
+    its rows, and its state is recorded, in one transaction. A run failing halfway leaves the tables and the state
+    as they were, so the next run loads the file again without duplicating it.
+    With the 'sql' Silver engine, only Bronze is loaded from the file, and Silver is built from it inside Postgres.
+    """
+    bronze_schema = 'bronze'
+    silver_schema = 'silver'
+    state = IngestionState(loader.engine, schema=bronze_schema)
+
+    parquet_key = get_s3_parquet_file_key()  # Retrieve the Parquet file key
+    parquet_objects = extractor.get_s3_objects_metadata(parquet_key)
+    parquet_objects = {key: metadata for key, metadata in parquet_objects.items() if key == parquet_key}
+    new_keys, changed_keys = state.get_pending_objects(parquet_objects)
+
+    if not (new_keys or changed_keys):
+        logging.info(f"Parquet file '{parquet_key}' is unchanged. Skipping...")
+        return
+
+    # Extract (and clean) the whole file before the transaction starts, unless it is streamed in batches
+    if parquet_batch_size is None:
+        parquet_df = extractor.extract_parquet(parquet_key, typed=typed)
+        if silver_engine != 'sql':
+            silver_parquet_data = transformer.clean_parquet(parquet_df.copy(), typed=typed)
+
+    with loader.engine.begin() as conn:
+        loader.delete_rows(conn, 'leads_parquet', bronze_schema)
+        loader.delete_rows(conn, 'stg_leads_parquet', silver_schema)
+
+        if silver_engine == 'sql':
+            if parquet_batch_size is not None:
+                parquet_batches = extractor.iter_parquet_chunks(parquet_key, batch_size=parquet_batch_size, typed=typed)
+                bronze_rows = loader.load_parquet_chunks_to_postgres(parquet_batches, 'leads_parquet', bronze_schema,
+                                                                     method=load_method, conn=conn)
+            else:
+                bronze_rows = len(parquet_df) if loader.load_parquet_to_postgres(parquet_df, 'leads_parquet', bronze_schema,
+                                                                                 method=load_method, conn=conn) else 0
+            if bronze_rows == 0:
+                raise RuntimeError(f"Failed to load the Parquet file '{parquet_key}'.")
+            build_silver_in_postgres(loader, 'parquet', typed=typed, conn=conn)
+        elif parquet_batch_size is not None:
+            bronze_rows, silver_rows = load_parquet_in_batches(extractor, loader, transformer, parquet_key,
+                                                               parquet_batch_size, load_method, typed=typed, conn=conn)
+            if not (bronze_rows > 0 and silver_rows > 0):
+                raise RuntimeError(f"Failed to load the Parquet file '{parquet_key}'.")
+        else:
+            if not (loader.load_parquet_to_postgres(parquet_df, 'leads_parquet', bronze_schema, method=load_method, conn=conn) and
+                    loader.load_parquet_to_postgres(silver_parquet_data, 'stg_leads_parquet', silver_schema, method=load_method,
+                                                    conn=conn)):
+                raise RuntimeError(f"Failed to load the Parquet file '{parquet_key}'.")
+            bronze_rows = len(parquet_df)
+        state.record_loaded_object(parquet_key, parquet_objects[parquet_key], bronze_rows, connection=conn)
+
+def run_incremental_csv_load(extractor: DataExtractor, loader: DataLoader, transformer: DataTransformer,
+                             csv_fetch_workers: int, load_method: str, typed: bool = False, csv_clean_workers: int = None,
+                             silver_engine: str = 'pandas', categorical: bool = False):
+    """
+    Extracts, transforms and appends only the CSV files that are new or changed since the last run.
+
+    The S3 metadata (ETag, size, last-modified) of every loaded object is kept in bronze.ingestion_state.
+    Silver is built from the extracted delta in memory, instead of re-reading the whole Bronze layer, so the
+    runtime scales with the daily delta and not with the total history. There is one CSV file per partition
+    date: the rows of the partitions of the new or changed files are deleted from Bronze and Silver, the files
+    are loaded, and their state is recorded, in one transaction. A run failing halfway leaves the tables and
+    the state as they were, so the next run loads the same files again without duplicating them.
+    Once step4 (apply_silver_types.sql) has typed Silver, the missing values of the untyped mode ('<NA>', 'NaT')
+    are appended as NULL to its typed columns (see `write_df_to_postgres`).
+    With `csv_clean_workers`, the delta is cleaned by partition date in that many worker processes.
+    With the 'sql' Silver engine, the Silver rows of the loaded partitions are built from Bronze inside Postgres.
+    With `categorical`, the low-cardinality columns of the delta are carried as categoricals until they are loaded.
+    """
+    bronze_schema = 'bronze'
+    silver_schema = 'silver'
+    state = IngestionState(loader.engine, schema=bronze_schema)
+
+    csv_partitions = extractor.get_csv_partitions()
+    csv_objects = extractor.get_s3_objects_metadata(extractor.sftp_prefix)
+    csv_objects = {file_key: csv_objects[file_key] for file_key, _ in csv_partitions if file_key in csv_objects}
+    new_keys, changed_keys = state.get_pending_objects(csv_objects)
+
+    pending_keys = set(new_keys) | set(changed_keys)
+    pending_partitions = [(file_key, partition_date) for file_key, partition_date in csv_partitions if file_key in pending_keys]
+    if not pending_partitions:
+        logging.info("All CSV files are unchanged. Skipping...")
+        return
+
+    csv_df = extractor.extract_all_csv(max_workers=csv_fetch_workers, csv_partitions=pending_partitions, typed=typed,
+                                       categorical=categorical)
+    if csv_df.empty:
+        raise RuntimeError("No CSV data extracted for the new or changed files.")
+    rows_per_partition = csv_df['_partition_date'].value_counts()
+    if silver_engine != 'sql':
+        silver_csv_data = clean_csv_data(transformer, csv_df.copy(), typed=typed, csv_clean_workers=csv_clean_workers,
+                                         categorical=categorical)
+
+    partition_dates = [partition_date for _, partition_date in pending_partitions]
+    with loader.engine.begin() as conn:
+        loader.delete_rows(conn, 'csv_snapshots', bronze_schema, partition_dates)
+        loader.delete_rows(conn, 'stg_csv_snapshots', silver_schema, partition_dates)
+
+        if not loader.load_csv_to_postgres(csv_df, 'csv_snapshots', bronze_schema, method=load_method, conn=conn):
+            raise RuntimeError("Failed to load the new or changed CSV files.")
+        if silver_engine == 'sql':
+            build_silver_in_postgres(loader, 'csv', typed=typed, partition_dates=partition_dates, conn=conn)
+        elif not loader.load_csv_to_postgres(silver_csv_data, 'stg_csv_snapshots', silver_schema, method=load_method,
+                                             partitioned=True, conn=conn):
+            raise RuntimeError("Failed to load the new or changed CSV files.")
+        for file_key, partition_date in pending_partitions:
+            state.record_loaded_object(file_key, csv_objects[file_key], rows_per_partition.get(partition_date, 0),
+                                       connection=conn)
+
+def run_step(context: PipelineContext, incremental_load: bool = True, csv_fetch_workers: int = 8, csv_chunksize: int = None,
+             load_method: str = 'copy', typed: bool = False, parquet_batch_size: int = None, sources: tuple = SOURCES,
+             csv_clean_workers: int = None, silver_engine: str = 'pandas', read_chunksize: int = None,
+             categorical: bool = False):
+    """
+    Loads the S3 objects into Bronze and Silver, using the engine and S3 client shared by the pipeline steps.
+
+    After a full load, the Silver DataFrames are kept in the context, so the next steps don't read them back
+    from Postgres. After an incremental load only the delta is in memory, so the next steps read Postgres
+    (and so do they with the 'sql' Silver engine, which never holds Silver in memory).
+
+    Args:
+        context (PipelineContext): The resources shared by the pipeline steps.
+        incremental_load (bool): Only extract, transform and append the S3 objects that are new or changed.
+        csv_fetch_workers (int): Number of CSV files fetched concurrently from S3.
+        csv_chunksize (int): Stream the CSV files into Bronze in chunks of this many rows (full load only).
+        load_method (str): 'copy' (COPY FROM STDIN) or 'insert' (DataFrame.to_sql).
+        typed (bool): Keep typed columns end-to-end instead of converting everything to strings.
+        parquet_batch_size (int): Stream the Parquet file in batches of this many rows (incremental load only).
+        sources (tuple): The sources to load, among SOURCES ('parquet' and/or 'csv').
+        csv_clean_workers (int): Clean the CSV data by partition date in this many worker processes (optional).
+        silver_engine (str): Build Silver with 'pandas' (DataTransformer) or with 'sql' (INSERT ... SELECT from
+            Bronze inside Postgres, see utils/silver_sql.py).
+        read_chunksize (int): Read Bronze back from Postgres, clean it and load it into Silver in chunks of this
+            many rows, through a server-side cursor (full load with the 'pandas' Silver engine only).
+        categorical (bool): Carry the low-cardinality CSV columns ('STATE', 'CITY', 'Dispo', '_partition_date'...) as
+            pandas categoricals from the extraction to the load (they are only decoded when written to Postgres).
+
+    Raises:
+        RuntimeError: If a source could not be loaded (so the steps depending on it are not run).
+    """
+    unknown_sources = [source for source in sources if source not in SOURCES]
+    if unknown_sources:
+        raise ValueError(f"Unknown sources {unknown_sources}. Expected some of: {SOURCES}")
+    if silver_engine not in SILVER_ENGINES:
+        raise ValueError(f"Unknown Silver engine '{silver_engine}'. Expected one of: {SILVER_ENGINES}")
+
+    # Instantiate the DataExtractor, DataLoader, and DataTransformer on the shared S3 client and engine
+    extractor = DataExtractor(s3_client=context.s3_client)
+    loader = DataLoader(engine=context.engine)
+    transformer = DataTransformer(engine=context.engine)
+
+    silver_schema = 'silver'
+    if 'parquet' in sources:
+        context.drop_frame(silver_schema, 'stg_leads_parquet')
+        if incremental_load:
+            run_incremental_parquet_load(extractor, loader, transformer, load_method, typed=typed,
+                                         parquet_batch_size=parquet_batch_size, silver_engine=silver_engine)
+        else:
+            silver_parquet_data = run_full_parquet_load(extractor, loader, transformer, load_method, typed=typed,
+                                                        silver_engine=silver_engine, read_chunksize=read_chunksize)
+            if silver_parquet_data is not None:
+                context.put_frame(silver_schema, 'stg_leads_parquet', silver_parquet_data)
+
+    if 'csv' in sources:
+        context.drop_frame(silver_schema, 'stg_csv_snapshots')
+        if incremental_load:
+            run_incremental_csv_load(extractor, loader, transformer, csv_fetch_workers, load_method, typed=typed,
+                                     csv_clean_workers=csv_clean_workers, silver_engine=silver_engine,
+                                     categorical=categorical)
+        else:
+            silver_csv_data = run_full_csv_load(extractor, loader, transformer, csv_fetch_workers, csv_chunksize,
+                                                load_method, typed=typed, csv_clean_workers=csv_clean_workers,
+                                                silver_engine=silver_engine, read_chunksize=read_chunksize,
+                                                categorical=categorical)
+            if silver_csv_data is not None:
+                context.put_frame(silver_schema, 'stg_csv_snapshots', silver_csv_data)
+
 
 # Main block for running the script directly
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
 
-    # Table names per Schema
-    schema_names = ['bronze', 'silver']
-    bronze_table_names = ['leads_parquet', 'csv_snapshots']
-    silver_table_names =  ['stg_leads_parquet', 'stg_csv_snapshots']
-    
-    # Instantiate the DataExtractor, DataLoader, and DataTransformer
-    extractor = DataExtractor()
-    loader = DataLoader()
-    transformer = DataTransformer()
+    # Only extract, transform and append S3 objects that are new or changed (tracked in bronze.ingestion_state)
+    incremental_load = True
 
-    # Get Parquet file
-    parquet_key = get_s3_parquet_file_key()  # Retrieve the Parquet file key
-    parquet_df = extractor.extract_parquet(parquet_key)
+    # Number of CSV files fetched concurrently from S3 (keep it <= S3_MAX_POOL_CONNECTIONS, the S3 client connection pool size)
+    csv_fetch_workers = 8
 
-    # Get all CSV files
-    csv_df = extractor.extract_all_csv()
+    # Set to a row count to stream the CSV files into Bronze in chunks of that size (bounded memory, full load only)
+    csv_chunksize = None
 
-    # Get Bronze Schema
-    bronze_schema = schema_names[0]
+    # Load method for Bronze and Silver tables: 'copy' (COPY FROM STDIN) or 'insert' (DataFrame.to_sql)
+    load_method = 'copy'
 
-    # Load data into Bronze in Postgres
-    for table_name in bronze_table_names:
-        if table_name == 'leads_parquet':
-            loader.load_parquet_to_postgres(parquet_df, table_name, bronze_schema)
-        elif table_name == 'csv_snapshots':
-            loader.load_csv_to_postgres(csv_df, table_name, bronze_schema)
+    # Keep typed columns (pandas nullable / Arrow-backed dtypes, real NULLs) end-to-end instead of converting everything to strings
+    typed_mode = False
 
-    # Get Silver Schema
-    silver_schema = schema_names[1]
+    # Set to a row count to stream the Parquet file (projected columns, row group by row group) in batches of that size (incremental load only)
+    parquet_batch_size = None
 
-    # Get data from Bronze in Postgres and Apply transformations
-    for table_name in bronze_table_names:
-        if table_name == 'leads_parquet':
-            parquet_data = transformer.get_data_from_postgres_to_pd(bronze_schema, 'leads_parquet')
-            silver_parquet_data = transformer.clean_parquet(parquet_data)
-
-            # Debugging: Print the columns of the transformed DataFrame
-            print("Transformed and Renamed Parquet Data:")
-            print(silver_parquet_data.head())
-            print("Columns after mapping:", silver_parquet_data.columns.tolist())
-
-        elif table_name == 'csv_snapshots':
-            csv_data = transformer.get_data_from_postgres_to_pd(bronze_schema, 'csv_snapshots')
-            silver_csv_data = transformer.clean_csv(csv_data)
-
-            # Debugging: Print the columns of the transformed DataFrame
-            print("Transformed and Renamed CSV Data:")
-            print(silver_csv_data.head())
-            print("Columns after mapping:", silver_csv_data.columns.tolist())
+    # Set to a number of worker processes to clean the CSV data by partition date on several cores (None: in this process)
+    csv_clean_workers = None
+
+    # Engine building Silver from Bronze: 'pandas' (DataTransformer) or 'sql' (INSERT ... SELECT inside Postgres, no pandas round-trip)
+    silver_engine = 'pandas'
+
+    # Set to a row count to read Bronze back through a server-side cursor and build Silver chunk by chunk (bounded memory, full load only)
+    read_chunksize = None
+
+    # Carry the low-cardinality CSV columns (STATE, CITY, Dispo, _partition_date...) as pandas categoricals until they are loaded
+    categorical = False
     
-    # Load data into Silver in Postgres
-    for table_name in silver_table_names:
-        if table_name == 'stg_leads_parquet':
-            print("Initiated Load into Postgres (Silver.stg_leads_parquet):")
-            loader.load_parquet_to_postgres(silver_parquet_data, table_name, silver_schema)
-        elif table_name == 'stg_csv_snapshots':
-            print("Initiated Load into Postgres (Silver.stg_csv_snapshots):")
-            loader.load_csv_to_postgres(silver_csv_data, table_name, silver_schema)
\ No newline at end of file
+    run_step(PipelineContext(), incremental_load=incremental_load, csv_fetch_workers=csv_fetch_workers,
+             csv_chunksize=csv_chunksize, load_method=load_method, typed=typed_mode,
+             parquet_batch_size=parquet_batch_size, csv_clean_workers=csv_clean_workers, silver_engine=silver_engine,
+             read_chunksize=read_chunksize, categorical=categorical)
+
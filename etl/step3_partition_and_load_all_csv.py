@@ -6,39 +6,59 @@ print(sys.path)
 
 # Importing Modules
 import logging
+import datetime
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from utils_connection import get_connection_uri
-from utils_checks_db import get_schema_table_columns
+from utils_connection import get_connection_uri, get_db_engine
+from utils_checks_db import get_schema_table_columns, invalidate_schema_cache
+from load import write_df_to_postgres, quote_identifier
+from partitions import get_daily_partitions, detach_daily_partitions
+from postgres_reader import DEFAULT_READ_CHUNKSIZE, iter_table_chunks
+from pipeline_context import PipelineContext
 
 class DataLoader:
-    def __init__(self):
+    def __init__(self, engine=None):
         self.connection_uri = get_connection_uri()  # Fetch connection URI
-        self.engine = create_engine(self.connection_uri)
+        self.engine = engine or get_db_engine(self.connection_uri)  # Reuse the given engine, or the process-wide one
 
-    def load_csv_to_postgres(self, csv_df: pd.DataFrame, table_name: str, schema: str):
-        """Loads a CSV DataFrame into the specified Postgres table with schema validation."""
+    def load_csv_to_postgres(self, csv_df: pd.DataFrame, table_name: str, schema: str, method: str = 'insert', chunksize: int = None,
+                             replace: bool = False):
+        """
+        Loads a CSV DataFrame into the specified Postgres table with schema validation.
+
+        Args:
+            csv_df (pd.DataFrame): The DataFrame to load.
+            table_name (str): The name of the target table.
+            schema (str): The schema of the target table.
+            method (str): 'insert' (DataFrame.to_sql) or 'copy' (COPY FROM STDIN, much faster for large loads).
+            chunksize (int): Number of rows sent per batch (optional).
+            replace (bool): If True, the rows already in the table are deleted first (in the same transaction).
+
+        Returns:
+            bool: True if the data was loaded, False otherwise.
+        """
         try:
             # Validate schema before loading
-            schema_table_columns = get_schema_table_columns(self.connection_uri, schema, [table_name])
+            schema_table_columns = get_schema_table_columns(self.connection_uri, schema, [table_name], engine=self.engine)
             schema_columns = schema_table_columns.get(table_name, [])
 
             if not schema_columns:
                 logging.error(f"No columns found for table '{schema}.{table_name}' in schema.")
-                return
+                return False
 
             # Reorder DataFrame columns to match schema (optional)
             csv_df = csv_df[schema_columns]  # Keep only schema columns, discard others
 
-            # Convert all columns to string before loading
-            csv_df = csv_df.astype(str)
-
             # Check if DataFrame columns match schema columns
             if all(column in csv_df.columns for column in schema_columns):
                 with self.engine.begin() as conn:
-                    csv_df.to_sql(table_name, conn, schema=schema, if_exists='append', index=False)
-                    logging.info(f"Successfully loaded CSV data to '{schema}.{table_name}'.")
+                    if replace:
+                        conn.execute(text(f"DELETE FROM {quote_identifier(schema)}.{quote_identifier(table_name)}"))
+                    write_df_to_postgres(conn, csv_df, table_name, schema, method=method, chunksize=chunksize)
+                    logging.info(f"Successfully loaded CSV data to '{schema}.{table_name}' (method: {method}).")
+                    return True
             else:
                 logging.error(f"DataFrame columns do not match the schema columns for '{schema}.{table_name}': {schema_columns}")
 
@@ -46,38 +66,206 @@ class DataLoader:
             logging.error(f"SQLAlchemyError while loading CSV data to '{schema}.{table_name}': {str(e)}")
         except Exception as e:
             logging.error(f"An error occurred: {str(e)}")
+        return False
 
-# Main block for running the script directly
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
+# Day 01 of the legacy per-day tables: stg_csv_data_01 holds 2024-10-01, stg_csv_data_05 holds 2024-10-05, etc.
+LEGACY_TABLES_START_DATE = datetime.date(2024, 10, 1)
+
+def get_partition_table_name(partition_date) -> str:
+    """
+    Name of the per-day copy of a partition date, numbered by calendar day from LEGACY_TABLES_START_DATE
+    (e.g. 'stg_csv_data_05' for 2024-10-05, whichever days are in the data), or None for an earlier date.
+    """
+    day_number = (pd.Timestamp(partition_date).date() - LEGACY_TABLES_START_DATE).days + 1
+    if day_number < 1:
+        return None
+    return f"stg_csv_data_{day_number:02}"  # This ensures leading zero is added
+
+def get_partition_loads(partition_dates: list) -> list:
+    """The (partition date, per-day table name) pairs of the partition dates that have a per-day table."""
+    partition_loads = []
+    for partition_date in partition_dates:
+        table_name = get_partition_table_name(partition_date)
+        if table_name is None:
+            logging.warning(f"No per-day table for date '{partition_date}' (before {LEGACY_TABLES_START_DATE}), skipping it.")
+        else:
+            partition_loads.append((partition_date, table_name))
+    return partition_loads
+
+def create_partition_tables(connection, schema: str, source_table_name: str, table_names: list):
+    """Creates the missing per-day copies with the columns of the source table."""
+    source_table = f"{quote_identifier(schema)}.{quote_identifier(source_table_name)}"
+    for table_name in table_names:
+        connection.execute(text(f"CREATE TABLE IF NOT EXISTS {quote_identifier(schema)}.{quote_identifier(table_name)} (LIKE {source_table})"))
+    invalidate_schema_cache(schema)
+
+def partition_with_sql(connection, schema: str, source_table_name: str) -> dict:
+    """
+    Copies the source table into one table per partition date on the server, with one INSERT ... SELECT per partition
+    (the rows never leave Postgres).
+
+    The partition dates are the distinct '_partition_date' values of the source table, and each one is copied into
+    the per-day table of its calendar day (see `get_partition_table_name`). Missing per-day tables are created like
+    the source table, and every per-day table is emptied before it is filled, so running the step again does not
+    duplicate rows.
+
+    Args:
+        connection: An open SQLAlchemy connection (e.g. from `engine.begin()`), so all partitions are replaced atomically.
+        schema (str): The schema of the source and per-day tables.
+        source_table_name (str): The table to split.
+
+    Returns:
+        dict: The number of rows inserted, keyed by per-day table name.
+    """
+    source_table = f"{quote_identifier(schema)}.{quote_identifier(source_table_name)}"
+    partition_dates = get_partition_dates(connection, schema, source_table_name)
+
+    columns = get_schema_table_columns(None, schema, [source_table_name], engine=connection.engine)[source_table_name]
+    column_list = ', '.join(quote_identifier(column) for column in columns)
+
+    partition_loads = get_partition_loads(partition_dates)
+    create_partition_tables(connection, schema, source_table_name, [table_name for _, table_name in partition_loads])
+
+    rows_per_table = {}
+    for partition_date, table_name in partition_loads:
+        partition_table = f"{quote_identifier(schema)}.{quote_identifier(table_name)}"
+        logging.info(f"Loading data into '{schema}.{table_name}' for date '{partition_date}'...")
+
+        connection.execute(text(f"DELETE FROM {partition_table}"))
+        result = connection.execute(
+            text(f"INSERT INTO {partition_table} ({column_list}) "
+                 f"SELECT {column_list} FROM {source_table} WHERE _partition_date = :partition_date"),
+            {"partition_date": partition_date}
+        )
+        rows_per_table[table_name] = result.rowcount
+    return rows_per_table
+
+def get_partition_dates(connection, schema: str, table_name: str) -> list:
+    """The distinct, non-null '_partition_date' values of a table, in date order."""
+    return connection.execute(text(
+        f"SELECT DISTINCT _partition_date FROM {quote_identifier(schema)}.{quote_identifier(table_name)} "
+        f"WHERE _partition_date IS NOT NULL ORDER BY _partition_date"
+    )).scalars().all()
+
+def copy_partitions(context: PipelineContext, loader: DataLoader, schema: str, source_table_name: str,
+                    load_method: str = 'copy', max_workers: int = 4, server_side: bool = True,
+                    read_chunksize: int = DEFAULT_READ_CHUNKSIZE):
+    """
+    Copies the Silver CSV snapshots into one table per partition date (the legacy stg_csv_data_NN tables).
 
+    By default the copy runs on the server (see `partition_with_sql`). Otherwise, if the Silver DataFrame was kept
+    in memory by the previous step, it is split in a single groupby pass; if not, each day is streamed from
+    Postgres through a server-side cursor, in chunks of `read_chunksize` rows, so only one chunk per worker is held
+    in memory. The days are loaded concurrently (each load uses its own pooled connection).
+
+    Raises:
+        RuntimeError: If a per-day table could not be loaded.
+    """
+    if server_side:
+        try:
+            with loader.engine.begin() as conn:
+                rows_per_table = partition_with_sql(conn, schema, source_table_name)
+        except SQLAlchemyError as e:
+            raise RuntimeError(f"Failed to split '{schema}.{source_table_name}' into per-day tables: {str(e)}")
+        logging.info(f"Loaded {sum(rows_per_table.values())} rows into {len(rows_per_table)} per-day tables.")
+        return
+
+    csv_df = context.get_frame(schema, source_table_name)
+    if csv_df is not None:
+        # Split the in-memory DataFrame by partition date in a single pass
+        partition_frames = dict(list(csv_df.groupby('_partition_date', sort=True, observed=True)))
+        partition_dates = list(partition_frames)
+    else:
+        with loader.engine.connect() as conn:
+            partition_dates = get_partition_dates(conn, schema, source_table_name)
+
+    partition_loads = get_partition_loads(partition_dates)
+
+    with loader.engine.begin() as conn:
+        create_partition_tables(conn, schema, source_table_name, [table_name for _, table_name in partition_loads])
+
+    def load_partition(partition_load):
+        partition_date, table_name = partition_load
+        logging.info(f"Loading data into '{schema}.{table_name}' for date '{partition_date}'...")
+        if csv_df is not None:
+            return loader.load_csv_to_postgres(partition_frames[partition_date], table_name, schema, method=load_method, replace=True)
+
+        # The first chunk replaces the rows of the per-day table, the next ones are appended
+        chunks = iter_table_chunks(loader.engine, schema, source_table_name, chunksize=read_chunksize,
+                                   partition_dates=[partition_date])
+        return all([loader.load_csv_to_postgres(chunk, table_name, schema, method=load_method, replace=position == 0)
+                    for position, chunk in enumerate(chunks)])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(load_partition, partition_loads))
+
+    failed_tables = [table_name for (_, table_name), loaded in zip(partition_loads, results) if not loaded]
+    if failed_tables:
+        raise RuntimeError(f"Failed to load the per-day tables {failed_tables}.")
+
+def run_step(context: PipelineContext, detach_before: str = None, drop_detached: bool = False, legacy_tables: bool = False,
+             load_method: str = 'copy', max_workers: int = 4, server_side: bool = True,
+             read_chunksize: int = DEFAULT_READ_CHUNKSIZE):
+    """
+    Maintains the daily partitions of silver.stg_csv_snapshots (range-partitioned on '_partition_date').
+
+    The loader creates the partition of each new day on ingest, so this step only reports the partitions and, with
+    `detach_before`, detaches the old days instead of deleting their rows. With `legacy_tables`, it also copies
+    each day into the former stg_csv_data_NN tables, for the queries that still use them.
+
+    Args:
+        context (PipelineContext): The resources shared by the pipeline steps.
+        detach_before (str): Detach the partitions of the days before this date ('YYYY-MM-DD', optional).
+        drop_detached (bool): Drop the detached partitions instead of keeping them as standalone tables.
+        legacy_tables (bool): Also copy each day into the stg_csv_data_NN tables.
+        load_method (str): 'copy' (COPY FROM STDIN) or 'insert' (DataFrame.to_sql), for the pandas legacy copy.
+        max_workers (int): Number of per-day tables loaded concurrently, for the pandas legacy copy.
+        server_side (bool): Make the legacy copies with INSERT ... SELECT statements instead of going through pandas.
+        read_chunksize (int): Number of rows read per chunk from Postgres, for the pandas legacy copy.
+
+    Raises:
+        RuntimeError: If the partitions could not be maintained or a per-day table could not be loaded.
+    """
     # Define Silver Schema and CSV Table
     silver_schema = 'silver'
     source_table_name = 'stg_csv_snapshots'  # The silver table with cleaned data
 
-    # Instantiate the DataLoader
-    loader = DataLoader()
+    # Instantiate the DataLoader on the shared engine
+    loader = DataLoader(engine=context.engine)
+
+    try:
+        with loader.engine.begin() as conn:
+            if detach_before is not None:
+                detach_daily_partitions(conn, silver_schema, source_table_name, detach_before, drop=drop_detached)
+            partitions = get_daily_partitions(conn, silver_schema, source_table_name)
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Failed to maintain the partitions of '{silver_schema}.{source_table_name}': {str(e)}")
 
-    # Load all data from the silver table into a DataFrame
-    with loader.engine.connect() as conn:
-        query = f"SELECT * FROM {silver_schema}.{source_table_name}"
-        csv_df = pd.read_sql(query, conn)
+    if partitions:
+        logging.info(f"'{silver_schema}.{source_table_name}' has {len(partitions)} daily partitions, "
+                     f"from {min(partitions)} to {max(partitions)}.")
+    else:
+        logging.warning(f"'{silver_schema}.{source_table_name}' has no daily partitions.")
 
-    # Define the range of partition dates as strings
-    start_date = "2024-10-01"
-    end_date = "2024-10-22"
-    partition_dates = pd.date_range(start=start_date, end=end_date).date.astype(str)  # Create a list of string dates
+    if legacy_tables:
+        # The in-memory frame may include detached days: only use it when nothing was detached
+        if detach_before is not None:
+            context.drop_frame(silver_schema, source_table_name)
+        copy_partitions(context, loader, silver_schema, source_table_name, load_method=load_method,
+                        max_workers=max_workers, server_side=server_side, read_chunksize=read_chunksize)
 
-    # Load each partition date into separate tables
-    for i, partition_date in enumerate(partition_dates, start=1):  # Start enumeration from 1
-        partition_df = csv_df[csv_df['_partition_date'] == partition_date]  # Filter for the specific partition
+# Main block for running the script directly
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
 
-        # Define the new table name for this partition with leading zero
-        table_name = f"stg_csv_data_{i:02}"  # This ensures leading zero is added
+    detach_before = None  # Set to a date ('YYYY-MM-DD') to detach the daily partitions of the days before it
+    drop_detached = False  # Drop the detached partitions instead of keeping them as standalone tables
+    legacy_tables = False  # Also copy each day into the former stg_csv_data_NN tables
 
-        # Load each partition DataFrame into its respective table
-        if not partition_df.empty:  # Only load if the partition DataFrame is not empty
-            logging.info(f"Loading data into '{silver_schema}.{table_name}' for date '{partition_date}'...")
-            loader.load_csv_to_postgres(partition_df, table_name, silver_schema)
-        else:
-            logging.warning(f"No data found for date '{partition_date}', skipping '{silver_schema}.{table_name}'.")
\ No newline at end of file
+    load_method = 'copy'  # 'copy' (COPY FROM STDIN) or 'insert' (DataFrame.to_sql), for the pandas legacy copy
+    max_workers = 4  # Number of per-day tables loaded concurrently (pandas legacy copy)
+    server_side = True  # Make the legacy copies in Postgres with INSERT ... SELECT (no pandas round-trip)
+    read_chunksize = 50000  # Rows read per chunk through a server-side cursor (pandas legacy copy)
+
+    run_step(PipelineContext(), detach_before=detach_before, drop_detached=drop_detached, legacy_tables=legacy_tables,
+             load_method=load_method, max_workers=max_workers, server_side=server_side, read_chunksize=read_chunksize)
@@ -6,42 +6,22 @@ print(sys.path)
 
 # Importing Modules
 import logging
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
-from utils_connection import get_connection_uri
-from subprocess import call
+from utils_checks_db import invalidate_schema_cache
+from pipeline_context import PipelineContext
+from sql_runner import run_sql_script
 
-# Function to run SQL script using shell command and get connection details from utils_connection.py
-def run_sql_script(script_name):
+def run_step(context: PipelineContext):
     """
-    Execute a SQL script using the connection details from utils_connection.py.
+    Applies the Silver data types (apply_silver_types.sql).
 
     Args:
-        script_name (str): The name of the SQL script file.
+        context (PipelineContext): The resources shared by the pipeline steps.
+
+    Raises:
+        RuntimeError: If a SQL script failed (so the steps depending on this one are not run).
     """
-    # Get the SQL script path and connection URI
-    script_path = f"/workspace/sql_scripts/{script_name}"
-    connection_uri = get_connection_uri()  # Get the connection URI from utils_connection
-
-    # Construct the psql command with the connection URI
-    command = f"psql {connection_uri} -f {script_path}"
-
-    try:
-        # Execute the command
-        result = call(command, shell=True)
-        if result == 0:
-            logging.info(f"SQL script {script_name} executed successfully.")
-        else:
-            logging.error(f"Failed to execute the script {script_name}. Return code: {result}")
-        return result
-    except Exception as e:
-        logging.exception(f"An error occurred while running the SQL script: {e}")
-        return None
+    failed_scripts = []
 
-# Main block for running the script directly
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    
     # Define Silver Schema
     silver_schema = 'silver'
     
@@ -53,8 +33,20 @@ if __name__ == "__main__":
 
     # 1) Run apply_silver_types.sql 
     logging.info("----- Applying Types to Silver Tables in PostgreSQL -----")
-    result = run_sql_script(apply_silver_types_script_path)
+    result = run_sql_script(apply_silver_types_script_path, engine=context.engine)
     if result == 0:
         logging.info("Types have been applied successfully.")
     else:
-        logging.error("Failed to apply types.")
\ No newline at end of file
+        logging.error("Failed to apply types.")
+        failed_scripts.append(apply_silver_types_script_path)
+
+    # The Silver tables changed: forget their cached columns
+    invalidate_schema_cache(silver_schema)
+
+    if failed_scripts:
+        raise RuntimeError(f"Failed to execute the SQL scripts {failed_scripts}.")
+
+# Main block for running the script directly
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_step(PipelineContext())
@@ -9,40 +9,15 @@ print(sys.path)
 import logging
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from utils_connection import create_db_engine, get_connection_uri
-from subprocess import call
-
-# Function to run SQL script using shell command and get connection details from utils_connection.py
-def run_sql_script(script_name):
-    """
-    Execute a SQL script using the connection details from utils_connection.py.
-
-    Args:
-        script_name (str): The name of the SQL script file.
-    """
-    # Get the SQL script path and connection URI
-    script_path = f"/workspace/sql_scripts/{script_name}"
-    connection_uri = get_connection_uri()  # Get the connection URI from utils_connection
-
-    # Construct the psql command with the connection URI
-    command = f"psql {connection_uri} -f {script_path}"
-
-    try:
-        # Execute the command
-        result = call(command, shell=True)
-        if result == 0:
-            print(f"SQL script {script_name} executed successfully.")
-        else:
-            print(f"Failed to execute the script {script_name}.")
-        return result
-    except Exception as e:
-        print(f"An error occurred while running the SQL script: {e}")
-        return None
+from pipeline_context import PipelineContext
+from utils_checks_db import invalidate_schema_cache
+from utils_connection import get_db_engine
+from sql_runner import run_sql_script
 
 # Function to check schema existence
-def check_schema_existence(connection_uri, schema_names):
+def check_schema_existence(connection_uri, schema_names, engine=None):
     try:
-        db_engine = create_db_engine(connection_uri)
+        db_engine = engine or get_db_engine(connection_uri)  # Reuse the given engine, or the process-wide one
         if db_engine is None:
             print("Failed to create the database engine.")
             return
@@ -67,9 +42,9 @@ def check_schema_existence(connection_uri, schema_names):
         print(f"An unexpected error occurred: {str(e)}")
 
 # Function to check table existence
-def check_table_existence(connection_uri, schema_name, table_names):
+def check_table_existence(connection_uri, schema_name, table_names, engine=None):
     try:
-        db_engine = create_db_engine(connection_uri)
+        db_engine = engine or get_db_engine(connection_uri)  # Reuse the given engine, or the process-wide one
         if db_engine is None:
             print("Failed to create the database engine.")
             return
@@ -93,10 +68,18 @@ def check_table_existence(connection_uri, schema_name, table_names):
     except Exception as e:
         print(f"An unexpected error occurred: {str(e)}")
 
-# Main block for running the script directly
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    
+def run_step(context: PipelineContext):
+    """
+    Creates the Gold tables, then checks that they exist.
+
+    Args:
+        context (PipelineContext): The resources shared by the pipeline steps.
+
+    Raises:
+        RuntimeError: If a SQL script failed (so the steps depending on this one are not run).
+    """
+    failed_scripts = []
+
     # Ingestion Parameters for Bronze, Silver, and Gold Layers
     schema_name = ['gold']
     gold_schema   = 'gold'
@@ -107,15 +90,27 @@ if __name__ == "__main__":
     tables_in_gold = ['lead_quality_matching']
     
     # 2) Check schema existence
-    check_schema_existence(get_connection_uri(), schema_name)
+    check_schema_existence(context.connection_uri, schema_name, engine=context.engine)
     
     # 4) Run create_silver_tables.sql 
     print("----- Creating GOLD Tables in PostgreSQL -----")
-    result = run_sql_script(create_gold_tables_script_path)
+    result = run_sql_script(create_gold_tables_script_path, engine=context.engine)
     if result == 0:
         print("Gold tables created successfully.")
     else:
         print("Failed to create silver tables.")
+        failed_scripts.append(create_gold_tables_script_path)
+
+    # The Gold tables may have changed: forget their cached columns
+    invalidate_schema_cache(gold_schema)
 
     # 5) Check table existence for Gold Schema
-    check_table_existence(get_connection_uri(), gold_schema, tables_in_gold)
\ No newline at end of file
+    check_table_existence(context.connection_uri, gold_schema, tables_in_gold, engine=context.engine)
+
+    if failed_scripts:
+        raise RuntimeError(f"Failed to execute the SQL scripts {failed_scripts}.")
+
+# Main block for running the script directly
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_step(PipelineContext())
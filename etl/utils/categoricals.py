@@ -0,0 +1,108 @@
+# categoricals.py
+
+import numpy as np
+import pandas as pd
+
+# Low-cardinality columns of the CSV snapshots (Bronze names) that can be carried as categoricals
+CSV_CATEGORICAL_COLUMNS = ['STATE', 'CITY', 'Dispo', 'JOB_STATUS', 'Set', 'Demo', '_partition_date', '_extraction_date']
+
+def is_categorical(values: pd.Series) -> bool:
+    """Whether a Series is a pandas categorical."""
+    return isinstance(values.dtype, pd.CategoricalDtype)
+
+def to_categorical(values: pd.Series) -> pd.Series:
+    """The values as a categorical Series (unchanged if they already are one)."""
+    if is_categorical(values):
+        return values
+    return values.astype('category')
+
+def map_categories(values: pd.Series, function) -> pd.Series:
+    """
+    Applies a vectorized function to the categories of a categorical Series (one operation per distinct value,
+    not per row). Categories that become equal are merged, and categories mapped to a missing value become missing.
+
+    Args:
+        values (pd.Series): A categorical Series.
+        function (callable): Takes the categories (pd.Index) and returns the new values (same length).
+
+    Returns:
+        pd.Series: The mapped categorical Series.
+    """
+    mapped_codes, mapped_categories = pd.factorize(pd.Index(function(values.cat.categories)))
+    # The missing values (code -1) pick the -1 appended at the end
+    codes = np.append(mapped_codes, -1)[values.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=mapped_categories), index=values.index, name=values.name)
+
+def fill_missing_category(values: pd.Series, fill_value) -> pd.Series:
+    """Replaces the missing values of a categorical Series with `fill_value` (added to the categories if needed)."""
+    if not values.isna().any():
+        return values
+    if fill_value not in values.cat.categories:
+        values = values.cat.add_categories([fill_value])
+    return values.fillna(fill_value)
+
+def to_string_categorical(values: pd.Series) -> pd.Series:
+    """
+    Same values as `values.astype(str).astype('category')`, but only the distinct values are converted to strings
+    (the rows are never converted one by one). Missing values become their string ('nan' for the NaN of read_csv).
+    """
+    categorical = to_categorical(values)
+    missing_values = values.to_numpy()[categorical.cat.codes.to_numpy() < 0]
+    missing_strings = pd.Series(pd.unique(missing_values), dtype=object).astype(str).unique()
+    if len(missing_strings) > 1:  # E.g. None and NaN: they are only told apart row by row
+        return to_categorical(values.astype(str))
+    categorical = map_categories(categorical, lambda categories: categories.astype(str))
+    return fill_missing_category(categorical, missing_strings[0]) if len(missing_strings) else categorical
+
+def encode_categoricals(df: pd.DataFrame, columns: list = CSV_CATEGORICAL_COLUMNS) -> pd.DataFrame:
+    """Converts the given columns (those present in the DataFrame) to categoricals."""
+    return df.assign(**{column: to_categorical(df[column]) for column in columns if column in df.columns})
+
+def decode_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts the categorical columns back to object columns of strings, with pd.NA for missing values."""
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if is_categorical(values):
+            values = values.astype(object).where(values.notna(), pd.NA)
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+def to_string_columns(df: pd.DataFrame, keep_categoricals: bool = False) -> pd.DataFrame:
+    """
+    Converts all the columns to strings, like `decode_categoricals(df).astype(str)` (missing values of the
+    categorical columns become '<NA>').
+
+    Args:
+        df (pd.DataFrame): The DataFrame to convert.
+        keep_categoricals (bool): Keep the categorical columns as categoricals of strings (only their categories
+            are converted) instead of decoding them.
+
+    Returns:
+        pd.DataFrame: The DataFrame of strings.
+    """
+    if not keep_categoricals:
+        return decode_categoricals(df).astype(str)
+
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if is_categorical(values):
+            columns[column] = fill_missing_category(map_categories(values, lambda categories: categories.astype(str)), '<NA>')
+        else:
+            columns[column] = values.astype(str)
+    return pd.DataFrame(columns, index=df.index)
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    """
+    Concatenates DataFrames like `pd.concat`, except that the columns that are categorical in every frame stay
+    categorical (pd.concat decodes them to objects when their categories differ): their categories are unified first.
+    """
+    frames = list(frames)
+    if len(frames) > 1:
+        for column in frames[0].columns:
+            if not all(column in frame.columns and is_categorical(frame[column]) for frame in frames):
+                continue
+            categories = frames[0][column].cat.categories.append([frame[column].cat.categories for frame in frames[1:]]).unique()
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames)
@@ -0,0 +1,105 @@
+# diagnostics.py
+
+import json
+import logging
+import os
+import pandas as pd
+
+# Diagnostics settings (overridable with environment variables)
+# DIAGNOSTICS_ENABLED: profile the data at the cleaning steps (each profile is an extra pass, so it is off by default)
+# DIAGNOSTICS_SAMPLE_RATE: fraction of the rows profiled (1.0: all of them)
+# DIAGNOSTICS_MAX_ROWS: maximum number of example rows logged by a profile (preview, duplicates)
+# DIAGNOSTICS_MAX_VALUES: maximum number of distinct values logged by a profile
+DIAGNOSTICS_ENABLED = os.getenv('ETL_DIAGNOSTICS_ENABLED', 'false').lower() == 'true'
+DIAGNOSTICS_SAMPLE_RATE = float(os.getenv('ETL_DIAGNOSTICS_SAMPLE_RATE', '1.0'))
+DIAGNOSTICS_MAX_ROWS = int(os.getenv('ETL_DIAGNOSTICS_MAX_ROWS', '5'))
+DIAGNOSTICS_MAX_VALUES = int(os.getenv('ETL_DIAGNOSTICS_MAX_VALUES', '100'))
+
+class DataDiagnostics:
+    """
+    Profiles of the data at the cleaning steps (distinct values of a column, preview of a frame, duplicated rows),
+    logged as JSON with the name of the step.
+
+    When disabled (the default), every method returns at once: the callers pass the data as it is, so the
+    profiles cost nothing. When enabled, they are computed on a random sample of `sample_rate` of the rows
+    (the duplicates are then only those within the sample), and kept in `profiles`.
+    """
+
+    def __init__(self, enabled: bool = DIAGNOSTICS_ENABLED, sample_rate: float = DIAGNOSTICS_SAMPLE_RATE,
+                 max_rows: int = DIAGNOSTICS_MAX_ROWS, max_values: int = DIAGNOSTICS_MAX_VALUES, seed: int = 0):
+        """
+        Initialize parameters.
+
+        Args:
+            enabled (bool): Compute and log the profiles.
+            sample_rate (float): Fraction of the rows profiled, in (0, 1].
+            max_rows (int): Maximum number of example rows per profile.
+            max_values (int): Maximum number of distinct values per profile.
+            seed (int): Seed of the row sampling (the same rows are sampled on every run).
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f"The diagnostics sample rate must be in (0, 1], got {sample_rate}")
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_rows = max_rows
+        self.max_values = max_values
+        self.seed = seed
+        self.profiles = []
+
+    def sample(self, data):
+        """A random sample of `sample_rate` of the rows of a DataFrame or Series (all of them at 1.0)."""
+        if self.sample_rate >= 1:
+            return data
+        return data.sample(frac=self.sample_rate, random_state=self.seed)
+
+    def log(self, step: str, profile: str, **fields) -> dict:
+        """Logs a profile (and keeps it in `profiles`)."""
+        record = {'step': step, 'profile': profile, 'sample_rate': self.sample_rate, **fields}
+        self.profiles.append(record)
+        logging.info(f"Diagnostics {json.dumps(record, default=str)}")
+        return record
+
+    def values(self, step: str, values: pd.Series) -> dict:
+        """
+        Profiles the values of a column: sampled rows, missing values and distinct values (sorted, missing last).
+
+        Args:
+            step (str): The name of the step, e.g. 'clean_csv.state_before'.
+            values (pd.Series): The column.
+
+        Returns:
+            dict: The logged profile (None when disabled).
+        """
+        if not self.enabled:
+            return None
+        sample = self.sample(values)
+        distinct_values = pd.unique(sample.dropna().to_numpy(dtype=object))
+        return self.log(step, 'values', column=values.name, rows=len(values), sampled_rows=len(sample),
+                        missing=int(sample.isna().sum()), distinct=len(distinct_values),
+                        values=sorted(map(str, distinct_values))[:self.max_values])
+
+    def preview(self, step: str, df: pd.DataFrame) -> dict:
+        """Profiles a DataFrame: its shape and its first `max_rows` rows (the sample rate does not apply)."""
+        if not self.enabled:
+            return None
+        return self.log(step, 'preview', rows=len(df), columns=df.columns.tolist(),
+                        head=df.head(self.max_rows).to_dict(orient='records'))
+
+    def duplicates(self, step: str, df: pd.DataFrame, subset: list) -> dict:
+        """
+        Profiles the rows of a DataFrame duplicated on some columns: their number and the first `max_rows` of them.
+
+        Args:
+            step (str): The name of the step, e.g. 'clean_parquet.email_phone_duplicates'.
+            df (pd.DataFrame): The rows.
+            subset (list): The columns identifying a duplicate.
+
+        Returns:
+            dict: The logged profile (None when disabled).
+        """
+        if not self.enabled:
+            return None
+        sample = self.sample(df)
+        duplicated = sample[sample.duplicated(subset=subset, keep=False)]
+        return self.log(step, 'duplicates', subset=list(subset), rows=len(df), sampled_rows=len(sample),
+                        duplicated_rows=len(duplicated), examples=duplicated.head(self.max_rows).to_dict(orient='records'))
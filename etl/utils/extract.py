@@ -9,17 +9,33 @@ import os
 import io
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 import pandas as pd
-from utils_connection import create_s3_client, get_s3_bucket_name, get_sftp_files_prefix, get_s3_parquet_file_key
+import pyarrow as pa
+import pyarrow.dataset as ds
+from utils_connection import get_s3_client, get_arrow_s3_filesystem, get_s3_bucket_name, get_sftp_files_prefix, get_s3_parquet_file_key
+from utils_checks_db import get_bronze_table_data_types, get_pandas_dtypes
+from instrumentation import metrics, instrumented
+from categoricals import CSV_CATEGORICAL_COLUMNS, encode_categoricals, to_string_categorical
+
+# Columns used from the leads Parquet file (any other column, e.g. the pandas index, is not read)
+PARQUET_COLUMNS = ['lead_UUID', 'phone_hash', 'email_hash']
 
 class DataExtractor:
-    def __init__(self):
-        """Initialize parameters."""
+    def __init__(self, s3_client=None):
+        """
+        Initialize parameters.
+
+        Args:
+            s3_client: An existing boto3 S3 client to reuse (optional, e.g. the one shared by the pipeline runner).
+        """
         try:
             self.bucket_name = get_s3_bucket_name()  # Use the utility function to get bucket name
             self.sftp_prefix = get_sftp_files_prefix()  # Use the utility function for SFTP prefix
             print(f"Using bucket: {self.bucket_name}, Prefix: {self.sftp_prefix}")
-            self.s3_client = create_s3_client()  # Create S3 client here
+            self.s3_client = s3_client or get_s3_client()  # Reuse the given S3 client, or the process-wide one
+            self.arrow_fs = None  # Arrow S3 filesystem, created on first use by iter_parquet_batches_from_s3
         except Exception as e:
             logging.error(f"Error initializing DataExtractor: {e}")
             raise
@@ -27,9 +43,12 @@ class DataExtractor:
     def get_parquet_from_s3_to_pd(self, parquet_key: str) -> tuple[pd.DataFrame, list, tuple, str]:
         """Fetch a parquet file from the S3 bucket."""
         try:
-            parquet_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=parquet_key)
-            parquet_buffer = io.BytesIO(parquet_obj['Body'].read())
-            parquet_df = pd.read_parquet(parquet_buffer)
+            with metrics.stage('extract.s3_fetch_parquet', key=parquet_key) as stage_metrics:
+                parquet_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=parquet_key)
+                parquet_buffer = io.BytesIO(parquet_obj['Body'].read())
+                parquet_df = pd.read_parquet(parquet_buffer)
+                stage_metrics.bytes = parquet_buffer.getbuffer().nbytes
+                stage_metrics.rows_out = len(parquet_df)
 
             # Get columns and shape for additional checks/logging
             columns = parquet_df.columns.tolist()
@@ -42,17 +61,103 @@ class DataExtractor:
             logging.error(f"Error loading parquet file: {parquet_key}. Error: {e}")
             raise
     
-    def load_csv_from_s3_to_pd(self, file_key: str) -> pd.DataFrame:
-        """Load a single CSV file from S3 into a Pandas DataFrame."""
+    def iter_parquet_batches_from_s3(self, parquet_key: str, columns: list = None, batch_size: int = 65536,
+                                     typed: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Stream a Parquet file from S3 as Pandas DataFrames, using a pyarrow dataset.
+
+        Only the projected columns are fetched and decoded, and row groups are read batch by batch through ranged
+        S3 requests, so the object is never held in memory as a whole (unlike `get_parquet_from_s3_to_pd`).
+
+        Args:
+            parquet_key (str): The S3 key for the Parquet file.
+            columns (list): The columns to read. Defaults to PARQUET_COLUMNS.
+            batch_size (int): Maximum number of rows per batch. Defaults to 65536.
+            typed (bool): If True, strings are kept as Arrow-backed strings instead of Python objects.
+
+        Yields:
+            pd.DataFrame: The next batch of the Parquet file.
+        """
         try:
-            csv_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
-            df = pd.read_csv(csv_obj['Body'])
+            if self.arrow_fs is None:
+                self.arrow_fs = get_arrow_s3_filesystem()
+            dataset = ds.dataset(f"{self.bucket_name}/{parquet_key}", format='parquet', filesystem=self.arrow_fs)
+
+            types_mapper = {pa.string(): pd.StringDtype('pyarrow')}.get if typed else None
+            num_rows = 0
+            for record_batch in dataset.to_batches(columns=columns or PARQUET_COLUMNS, batch_size=batch_size):
+                num_rows += record_batch.num_rows
+                yield record_batch.to_pandas(types_mapper=types_mapper)
+            logging.info(f"Successfully streamed parquet file: {os.path.basename(parquet_key)} ({num_rows} rows)")
+        except Exception as e:
+            logging.error(f"Error streaming parquet file: {parquet_key}. Error: {e}")
+            raise
+
+    def load_csv_from_s3_to_pd(self, file_key: str, dtype=None) -> pd.DataFrame:
+        """Load a single CSV file from S3 into a Pandas DataFrame (columns types are inferred unless `dtype` is given)."""
+        try:
+            with metrics.stage('extract.s3_fetch_csv', key=file_key) as stage_metrics:
+                csv_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+                df = pd.read_csv(csv_obj['Body'], dtype=dtype)
+                stage_metrics.bytes = csv_obj.get('ContentLength')
+                stage_metrics.rows_out = len(df)
             logging.info(f"Successfully loaded CSV file: {file_key} with shape: {df.shape}")
             return df
         except Exception as e:
             logging.error(f"Error loading CSV file: {file_key}. Error: {e}")
             raise
 
+    def stream_csv_from_s3_to_pd(self, file_key: str, chunksize: int, dtype=str) -> Iterator[pd.DataFrame]:
+        """
+        Stream a single CSV file from S3 into Pandas DataFrames of at most `chunksize` rows.
+
+        The S3 body is read incrementally, so only one chunk is held in memory at a time. All columns are read
+        as strings, so every chunk gets the same types regardless of where the chunk boundaries fall.
+
+        Args:
+            file_key (str): The S3 key for the CSV file.
+            chunksize (int): Maximum number of rows per chunk.
+            dtype: The dtype used to read all columns. Defaults to str.
+
+        Yields:
+            pd.DataFrame: The next chunk of the CSV file.
+        """
+        try:
+            csv_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+            with pd.read_csv(csv_obj['Body'], dtype=dtype, chunksize=chunksize) as reader:
+                for chunk in reader:
+                    yield chunk
+            logging.info(f"Successfully streamed CSV file: {file_key}")
+        except Exception as e:
+            logging.error(f"Error streaming CSV file: {file_key}. Error: {e}")
+            raise
+
+    def get_s3_objects_metadata(self, prefix: str) -> dict:
+        """
+        List the objects under a prefix in the S3 bucket with the metadata used to detect new or changed files.
+
+        Args:
+            prefix (str): The S3 key prefix (a full key also works, e.g. the Parquet file key).
+
+        Returns:
+            dict: A dictionary mapping each S3 key to its 'etag', 'size_bytes' and 'last_modified'.
+        """
+        objects = {}
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    objects[obj['Key']] = {
+                        'etag': obj['ETag'].strip('"'),
+                        'size_bytes': obj['Size'],
+                        'last_modified': obj['LastModified']
+                    }
+            logging.info(f"Found {len(objects)} objects under prefix: {prefix}")
+            return objects
+        except Exception as e:
+            logging.error(f"Error listing objects under prefix: {prefix}. Error: {e}")
+            raise
+
     def minimal_clean_csv(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Clean and standardize the DataFrame by performing minimal transformations after extraction:
@@ -95,7 +200,80 @@ class DataExtractor:
         logging.info(f"Partition date {partition_date} added to DataFrame.")
         return df
 
-    def extract_all_csv(self) -> pd.DataFrame:
+    def cast_to_bronze_types(self, df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+        """
+        Cast the DataFrame columns to the pandas dtypes of a Bronze table (see `get_bronze_table_data_types`).
+
+        Used by the typed mode: missing values stay NULL (pd.NA) instead of becoming the strings 'nan' / '<NA>'.
+
+        Args:
+            df (pd.DataFrame): The extracted DataFrame.
+            table_name (str): The Bronze table name ('csv_snapshots' or 'leads_parquet').
+
+        Returns:
+            pd.DataFrame: The DataFrame with typed columns.
+        """
+        bronze_dtypes = get_pandas_dtypes(get_bronze_table_data_types()[table_name])
+        return df.astype({column: dtype for column, dtype in bronze_dtypes.items() if column in df.columns})
+
+    def get_csv_partitions(self) -> list:
+        """
+        Build the list of CSV files to be processed, paired with their partition date.
+
+        The partition date is derived from the file index (data_1.csv -> 2024-10-01, ..., data_22.csv -> 2024-10-22),
+        so the mapping is always the same regardless of the order in which the files are fetched.
+
+        Returns:
+            list: A list of (file_key, partition_date) tuples, ordered by file index.
+        """
+        # Define the range of partition dates
+        start_date = datetime(2024, 10, 1)
+        end_date = datetime(2024, 10, 22)
+        date_range = pd.date_range(start=start_date, end=end_date)
+        partition_dates = [date.strftime('%Y-%m-%d') for date in date_range]
+
+        # List all CSV files to be processed
+        csv_files = [f"{self.sftp_prefix}{i}.csv" for i in range(1, 23)]
+
+        return [(file_key, partition_dates[i] if i < len(partition_dates) else None) for i, file_key in enumerate(csv_files)]
+
+    @instrumented('extract.extract_csv')
+    def extract_csv(self, file_key: str, partition_date: str, typed: bool = False) -> pd.DataFrame:
+        """
+        Extract a single CSV file from S3, clean it and add the extraction and partition dates.
+
+        Args:
+            file_key (str): The S3 key for the CSV file.
+            partition_date (str): The partition date assigned to this file (None to skip it).
+            typed (bool): If True, read all values as text and cast them to the Bronze types (see `cast_to_bronze_types`).
+
+        Returns:
+            pd.DataFrame: The processed DataFrame, or None if the file has no data.
+        """
+        # In typed mode, values are read as text (Bronze columns are TEXT), so no float/bool inference happens
+        df = self.load_csv_from_s3_to_pd(file_key, dtype=str if typed else None)
+        if df.empty:
+            logging.warning(f"No data found for {file_key}. Skipping...")
+            return None
+
+        df = self.minimal_clean_csv(df)
+
+        # Add extraction date
+        today = datetime.today().strftime('%Y-%m-%d')
+        df = self.add_extraction_date(df, today)
+
+        # Add partition date corresponding to the current file index
+        if partition_date:
+            df = self.add_partition_date(df, partition_date)
+
+        if typed:
+            df = self.cast_to_bronze_types(df, 'csv_snapshots')
+
+        return df
+
+    @instrumented('extract.extract_all_csv')
+    def extract_all_csv(self, max_workers: int = 1, csv_partitions: list = None, typed: bool = False,
+                        categorical: bool = False) -> pd.DataFrame:
         """
         Extract all relevant CSV files from S3, clean the data, and add partition and extraction dates.
 
@@ -105,44 +283,56 @@ class DataExtractor:
         - Adding an extraction date for tracking when the data was pulled.
         - Adding a partition date based on the file index to identify each CSV in the DataFrame.
 
+        When `max_workers` is greater than 1, the files are fetched concurrently by a bounded thread pool
+        (S3 requests are network bound, and boto3 clients are thread-safe). Results are collected in file
+        order, so the concatenated DataFrame is the same as the one produced by the serial path.
+
+        By default all values are converted to strings (missing values become 'nan'). In typed mode, the columns
+        keep the Bronze pandas dtypes (Arrow-backed strings) and missing values stay NULL, which uses much less
+        memory and avoids the stringify -> reparse cycle in `DataTransformer.clean_csv`.
+
+        In categorical mode, the low-cardinality columns (CSV_CATEGORICAL_COLUMNS: 'STATE', 'CITY', 'Dispo'...) are
+        returned as pandas categoricals: each distinct value is stored once, and every row only holds a small
+        integer code. The values are the same once decoded, and the loaders write them as they are.
+
+        Args:
+            max_workers (int): Maximum number of concurrent S3 fetches. Defaults to 1 (serial).
+            csv_partitions (list): Optional subset of `get_csv_partitions()` to extract (e.g. only new or changed files).
+            typed (bool): If True, keep typed columns instead of converting everything to strings.
+            categorical (bool): If True, return the low-cardinality columns as categoricals.
+
         Returns:
             A concatenated DataFrame containing all processed CSV files partitioned by '_partition_date'.
             If any errors occur, an empty DataFrame is returned.
         """
         try:
-            # Define the range of partition dates
-            start_date = datetime(2024, 10, 1)
-            end_date = datetime(2024, 10, 22)
-            date_range = pd.date_range(start=start_date, end=end_date)
-            partition_dates = [date.strftime('%Y-%m-%d') for date in date_range]
-
-            # List all CSV files to be processed
-            csv_files = [f"{self.sftp_prefix}{i}.csv" for i in range(1, 23)]
-            all_dfs = []
-
-            for i, file_key in enumerate(csv_files):
-                df = self.load_csv_from_s3_to_pd(file_key)
-                if df.empty:
-                    logging.warning(f"No data found for {file_key}. Skipping...")
-                    continue
-                
-                df = self.minimal_clean_csv(df)
-
-                # Add extraction date
-                today = datetime.today().strftime('%Y-%m-%d')
-                df = self.add_extraction_date(df, today)
+            if csv_partitions is None:
+                csv_partitions = self.get_csv_partitions()
 
-                # Add partition date corresponding to the current file index
-                partition_date = partition_dates[i] if i < len(partition_dates) else None
-                if partition_date:
-                    df = self.add_partition_date(df, partition_date)
+            if max_workers > 1:
+                logging.info(f"Fetching {len(csv_partitions)} CSV files with {max_workers} concurrent workers.")
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    # executor.map yields results in submission order, keeping the output deterministic
+                    results = list(executor.map(lambda partition: self.extract_csv(*partition, typed=typed), csv_partitions))
+            else:
+                results = [self.extract_csv(file_key, partition_date, typed=typed) for file_key, partition_date in csv_partitions]
 
-                all_dfs.append(df)
+            all_dfs = [df for df in results if df is not None]
 
             # Concatenate all DataFrames into a single DataFrame
             final_df = pd.concat(all_dfs, ignore_index=True)
-            # Convert all columns to string
-            final_df = final_df.astype(str)
+            if typed:
+                # Columns missing from some files (e.g. 'location') are filled with NULL by the concat
+                final_df = self.cast_to_bronze_types(final_df, 'csv_snapshots')
+                if categorical:
+                    final_df = encode_categoricals(final_df, CSV_CATEGORICAL_COLUMNS)
+            elif categorical:
+                # Convert all columns to string (only the distinct values of the categorical columns are converted)
+                final_df = pd.DataFrame({column: to_string_categorical(values) if column in CSV_CATEGORICAL_COLUMNS else values.astype(str)
+                                         for column, values in final_df.items()}, index=final_df.index)
+            else:
+                # Convert all columns to string
+                final_df = final_df.astype(str)
             logging.info(f"Extracted {len(all_dfs)} DataFrames.")
             return final_df
 
@@ -150,15 +340,52 @@ class DataExtractor:
             logging.error(f"Error extracting all CSV files: {e}")
             return pd.DataFrame()  # Return empty DataFrame if extraction fails
 
-    def extract_parquet(self, parquet_key: str) -> pd.DataFrame:
+    def iter_csv_chunks(self, chunksize: int = 50000, typed: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Stream all relevant CSV files from S3 as fixed-size chunks, with bounded memory.
+
+        This is the streaming counterpart of `extract_all_csv`: each chunk goes through `minimal_clean_csv`,
+        gets the extraction and partition dates and is converted to string, but the chunks are yielded one by
+        one instead of being concatenated. Peak memory is bounded by `chunksize`, not by the snapshot size.
+
+        Note: since columns are read as strings, numeric values keep their source text (e.g. a ZIP stays
+        '98311' even when the file has blank ZIPs, where `extract_all_csv` would infer a float and give '98311.0').
+
+        Args:
+            chunksize (int): Maximum number of rows per chunk. Defaults to 50000.
+            typed (bool): If True, yield chunks with the Bronze pandas dtypes instead of strings.
+
+        Yields:
+            pd.DataFrame: The next processed chunk, tagged with '_extraction_date' and '_partition_date'.
+        """
+        today = datetime.today().strftime('%Y-%m-%d')
+        for file_key, partition_date in self.get_csv_partitions():
+            for chunk in self.stream_csv_from_s3_to_pd(file_key, chunksize):
+                if chunk.empty:
+                    continue
+
+                chunk = self.minimal_clean_csv(chunk)
+                chunk = self.add_extraction_date(chunk, today)
+                if partition_date:
+                    chunk = self.add_partition_date(chunk, partition_date)
+
+                if typed:
+                    yield self.cast_to_bronze_types(chunk, 'csv_snapshots')
+                else:
+                    # Convert all columns to string
+                    yield chunk.astype(str)
+
+    @instrumented('extract.extract_parquet')
+    def extract_parquet(self, parquet_key: str, typed: bool = False) -> pd.DataFrame:
         """
         Extract and clean a Parquet file from S3, adding an extraction date.
 
         The function retrieves a Parquet file from S3 based on the provided key, 
-        adds an extraction date column, and converts all columns to strings.
+        adds an extraction date column, and converts all columns to strings (or to the Bronze types in typed mode).
 
         Args:
             parquet_key (str): The S3 key for the Parquet file to be processed.
+            typed (bool): If True, cast the columns to the Bronze pandas dtypes instead of strings.
 
         Returns:
             A Pandas DataFrame containing the processed Parquet file.
@@ -168,13 +395,37 @@ class DataExtractor:
             parquet_df, _, _, _ = self.get_parquet_from_s3_to_pd(parquet_key)  # Pass the known Parquet key here
             today = datetime.today().strftime('%Y-%m-%d')
             parquet_df = self.add_extraction_date(parquet_df, today)
-            # Convert all columns to string
-            parquet_df = parquet_df.astype(str)
+            if typed:
+                parquet_df = self.cast_to_bronze_types(parquet_df, 'leads_parquet')
+            else:
+                # Convert all columns to string
+                parquet_df = parquet_df.astype(str)
             return parquet_df
         except Exception as e:
             logging.error(f"Error processing daily Parquet file. Error: {e}")
             return pd.DataFrame()  # Return empty DataFrame if processing fails
 
+    def iter_parquet_chunks(self, parquet_key: str, batch_size: int = 65536, typed: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Stream a Parquet file from S3 batch by batch, adding an extraction date (streaming counterpart of `extract_parquet`).
+
+        Args:
+            parquet_key (str): The S3 key for the Parquet file to be processed.
+            batch_size (int): Maximum number of rows per batch. Defaults to 65536.
+            typed (bool): If True, cast the columns to the Bronze pandas dtypes instead of strings.
+
+        Yields:
+            pd.DataFrame: The next processed batch.
+        """
+        today = datetime.today().strftime('%Y-%m-%d')
+        for batch_df in self.iter_parquet_batches_from_s3(parquet_key, batch_size=batch_size, typed=typed):
+            batch_df = self.add_extraction_date(batch_df, today)
+            if typed:
+                yield self.cast_to_bronze_types(batch_df, 'leads_parquet')
+            else:
+                # Convert all columns to string
+                yield batch_df.astype(str)
+
 if __name__ == "__main__":
     extractor = DataExtractor()
 
@@ -0,0 +1,116 @@
+# ingestion_state.py
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+class IngestionState:
+    """
+    Tracks which S3 objects have already been loaded into the Bronze layer (table bronze.ingestion_state).
+
+    Each loaded object is stored with its ETag, size and last-modified timestamp, so that the next run only
+    extracts, transforms and appends the objects that are new or have changed since they were loaded.
+    """
+
+    def __init__(self, engine, schema: str = 'bronze', table_name: str = 'ingestion_state'):
+        """
+        Initialize parameters.
+
+        Args:
+            engine: The SQLAlchemy engine used to read and write the state table.
+            schema (str): The schema of the state table.
+            table_name (str): The name of the state table.
+        """
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+
+    def get_loaded_objects(self) -> dict:
+        """
+        Fetch the state of every object loaded so far.
+
+        Returns:
+            dict: A dictionary mapping each S3 key to its stored 'etag', 'size_bytes', 'last_modified' and 'rows_loaded'.
+        """
+        query = text(f"""
+            SELECT s3_key, etag, size_bytes, last_modified, rows_loaded
+            FROM {self.schema}.{self.table_name};
+        """)
+        with self.engine.connect() as connection:
+            result = connection.execute(query)
+            return {
+                row.s3_key: {
+                    'etag': row.etag,
+                    'size_bytes': row.size_bytes,
+                    'last_modified': row.last_modified,
+                    'rows_loaded': row.rows_loaded
+                }
+                for row in result
+            }
+
+    def get_pending_objects(self, s3_objects: dict) -> tuple[list, list]:
+        """
+        Compare the current S3 objects with the stored state.
+
+        Args:
+            s3_objects (dict): The current objects, as returned by `DataExtractor.get_s3_objects_metadata`.
+
+        Returns:
+            tuple: (new_keys, changed_keys). New keys were never loaded; changed keys were loaded before but their
+            ETag or size is different now, so their previously loaded rows must be replaced.
+        """
+        loaded_objects = self.get_loaded_objects()
+        new_keys, changed_keys = [], []
+
+        for s3_key, metadata in s3_objects.items():
+            loaded = loaded_objects.get(s3_key)
+            if loaded is None:
+                new_keys.append(s3_key)
+            elif loaded['etag'] != metadata['etag'] or loaded['size_bytes'] != metadata['size_bytes']:
+                changed_keys.append(s3_key)
+
+        logging.info(f"Ingestion state: {len(new_keys)} new, {len(changed_keys)} changed, "
+                     f"{len(s3_objects) - len(new_keys) - len(changed_keys)} unchanged objects.")
+        return new_keys, changed_keys
+
+    def record_loaded_object(self, s3_key: str, metadata: dict, rows_loaded: int, connection=None):
+        """
+        Insert or update the state of a loaded object.
+
+        Args:
+            s3_key (str): The S3 key of the loaded object.
+            metadata (dict): Its metadata, as returned by `DataExtractor.get_s3_objects_metadata`.
+            rows_loaded (int): The number of rows appended to Bronze for this object.
+            connection: An open connection to record the state in (optional, e.g. the transaction that loaded the
+                object, so the state is only recorded if the load commits). By default, a transaction of its own.
+
+        Raises:
+            SQLAlchemyError: If the state could not be recorded (the object would be loaded again by the next run).
+        """
+        query = text(f"""
+            INSERT INTO {self.schema}.{self.table_name} (s3_key, etag, size_bytes, last_modified, rows_loaded, loaded_at)
+            VALUES (:s3_key, :etag, :size_bytes, :last_modified, :rows_loaded, CURRENT_TIMESTAMP)
+            ON CONFLICT (s3_key) DO UPDATE SET
+                etag = EXCLUDED.etag,
+                size_bytes = EXCLUDED.size_bytes,
+                last_modified = EXCLUDED.last_modified,
+                rows_loaded = EXCLUDED.rows_loaded,
+                loaded_at = EXCLUDED.loaded_at;
+        """)
+        parameters = {
+            's3_key': s3_key,
+            'etag': metadata['etag'],
+            'size_bytes': metadata['size_bytes'],
+            'last_modified': metadata['last_modified'],
+            'rows_loaded': int(rows_loaded)
+        }
+        try:
+            if connection is None:
+                with self.engine.begin() as connection:
+                    connection.execute(query, parameters)
+            else:
+                connection.execute(query, parameters)
+            logging.info(f"Recorded ingestion state for '{s3_key}' ({rows_loaded} rows).")
+        except SQLAlchemyError as e:
+            logging.error(f"SQLAlchemyError while recording ingestion state for '{s3_key}': {str(e)}")
+            raise
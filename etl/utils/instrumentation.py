@@ -0,0 +1,275 @@
+# instrumentation.py
+
+import functools
+import json
+import logging
+import os
+import re
+import resource
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# Instrumentation settings (overridable with environment variables)
+# METRICS_ENABLED: record the stage metrics (the overhead is a few microseconds per stage)
+# METRICS_FILE: JSON Lines file the stage metrics of every run are appended to (optional)
+# METRICS_TABLE: '<schema>.<table>' the stage metrics of every run are inserted into (optional, e.g. 'bronze.stage_metrics')
+METRICS_ENABLED = os.getenv('ETL_METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_FILE = os.getenv('ETL_METRICS_FILE')
+METRICS_TABLE = os.getenv('ETL_METRICS_TABLE')
+
+PROC_STATUS = '/proc/self/status'
+PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+def read_proc_status(field: str) -> int:
+    """A memory field of /proc/self/status (e.g. 'VmRSS'), in bytes, or None if it cannot be read (not Linux)."""
+    try:
+        with open(PROC_STATUS, 'r') as status_file:
+            match = re.search(rf'^{field}:\s+(\d+) kB', status_file.read(), re.MULTILINE)
+        return int(match.group(1)) * 1024 if match else None
+    except OSError:
+        return None
+
+def get_rss_bytes() -> int:
+    """The current resident set size of the process, in bytes (None if unknown)."""
+    return read_proc_status('VmRSS')
+
+def get_peak_rss_bytes() -> int:
+    """The peak resident set size of the process since the last `reset_peak_rss`, in bytes."""
+    peak = read_proc_status('VmHWM')
+    if peak is None:  # Not Linux: peak of the whole process life (ru_maxrss is in kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+    return peak
+
+def reset_peak_rss() -> bool:
+    """Resets the peak resident set size to the current one (Linux only). Returns False if it is not supported."""
+    try:
+        with open(PROC_CLEAR_REFS, 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+class StageMetrics:
+    """The metrics of one run of an instrumented stage, filled in by `MetricsRecorder.stage`."""
+
+    def __init__(self, name: str, parent: str = None, rows_in: int = None, labels: dict = None):
+        """
+        Initialize parameters.
+
+        Args:
+            name (str): The name of the stage, e.g. 'transform.clean_csv.entry_date'.
+            parent (str): The name of the enclosing stage of the same thread (optional).
+            rows_in (int): The number of input rows (optional, can also be set while the stage runs).
+            labels (dict): Free-form details of this run, e.g. the S3 key or the target table (optional).
+        """
+        self.name = name
+        self.parent = parent
+        self.labels = labels or {}
+        self.status = 'running'
+        self.started_at = datetime.now()
+        self.seconds = None
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes = None
+        self.rss_start_bytes = None
+        self.rss_end_bytes = None
+        self.peak_rss_bytes = None
+
+    def to_dict(self) -> dict:
+        """The metrics as a JSON-serializable dictionary."""
+        return {
+            'name': self.name,
+            'parent': self.parent,
+            'labels': self.labels,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes': self.bytes,
+            'rss_start_bytes': self.rss_start_bytes,
+            'rss_end_bytes': self.rss_end_bytes,
+            'peak_rss_bytes': self.peak_rss_bytes,
+        }
+
+class MetricsRecorder:
+    """
+    Records the wall time, rows in/out, bytes and peak RSS of the instrumented stages (S3 fetches, transform
+    sub-steps, loads...) of a run.
+
+    Stages can be nested (the enclosing stage of the same thread is recorded as 'parent') and can run
+    concurrently in threads. The peak RSS of a stage is the peak of the whole process while it ran: on Linux, the
+    peak is reset (/proc/self/clear_refs) when a stage starts, after being credited to the stages still running.
+    Elsewhere, it is the peak since the process started.
+
+    Stages run in worker processes (e.g. `DataTransformer.clean_csv_parallel`) are not recorded.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        """
+        Initialize parameters.
+
+        Args:
+            enabled (bool): Record the metrics. When disabled, `stage` only runs the code.
+        """
+        self.enabled = enabled
+        self.run_id = uuid.uuid4().hex
+        self.records = []
+        self._running = []  # Stages running in any thread
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Stack of the running stages of each thread
+
+    def reset(self):
+        """Forget the recorded metrics and start a new run."""
+        with self._lock:
+            self.run_id = uuid.uuid4().hex
+            self.records = []
+
+    def _update_peaks(self):
+        # Credit the peak RSS since the last reset to every running stage (the lock is held)
+        peak_rss_bytes = get_peak_rss_bytes()
+        for record in self._running:
+            record.peak_rss_bytes = max(record.peak_rss_bytes or 0, peak_rss_bytes)
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int = None, **labels):
+        """
+        Measures a stage. The yielded StageMetrics can be completed by the stage (rows_out, bytes...).
+
+        Usage:
+            with metrics.stage('extract.s3_get_object', key=file_key) as stage_metrics:
+                ...
+                stage_metrics.bytes = content_length
+
+        Args:
+            name (str): The name of the stage.
+            rows_in (int): The number of input rows (optional).
+            **labels: Free-form details of this run (e.g. key='SFTP/data_1.csv').
+
+        Yields:
+            StageMetrics: The metrics of this run of the stage.
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        record = StageMetrics(name, parent=stack[-1].name if stack else None, rows_in=rows_in, labels=labels)
+        if not self.enabled:
+            yield record
+            return
+
+        with self._lock:
+            self._update_peaks()
+            reset_peak_rss()
+            self._running.append(record)
+        record.rss_start_bytes = get_rss_bytes()
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+            record.status = 'succeeded'
+        except BaseException:
+            record.status = 'failed'
+            raise
+        finally:
+            record.seconds = time.perf_counter() - start
+            stack.pop()
+            record.rss_end_bytes = get_rss_bytes()
+            with self._lock:
+                self._update_peaks()
+                self._running.remove(record)
+                self.records.append(record)
+            logging.debug(f"Stage {name}: {record.seconds:.3f}s, rows {record.rows_in} -> {record.rows_out}, "
+                          f"peak RSS {(record.peak_rss_bytes or 0) / 2**20:.0f} MB")
+
+    def current_stage(self) -> StageMetrics:
+        """The innermost stage running in this thread (None outside of any stage), e.g. to add the bytes it sent."""
+        stack = self._local.__dict__.get('stack')
+        return stack[-1] if stack else None
+
+    def summary(self) -> list:
+        """
+        Aggregates the recorded metrics by stage name.
+
+        Returns:
+            list: One dictionary per stage ('name', 'calls', 'seconds', 'max_seconds', 'rows_in', 'rows_out', 'bytes',
+            'peak_rss_bytes', 'failures'), the slowest stages first.
+        """
+        stages = {}
+        for record in list(self.records):
+            stage = stages.setdefault(record.name, {
+                'name': record.name, 'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows_in': None,
+                'rows_out': None, 'bytes': None, 'peak_rss_bytes': None, 'failures': 0
+            })
+            stage['calls'] += 1
+            stage['seconds'] += record.seconds
+            stage['max_seconds'] = max(stage['max_seconds'], record.seconds)
+            stage['failures'] += record.status == 'failed'
+            for field in ('rows_in', 'rows_out', 'bytes'):
+                if getattr(record, field) is not None:
+                    stage[field] = (stage[field] or 0) + getattr(record, field)
+            if record.peak_rss_bytes is not None:
+                stage['peak_rss_bytes'] = max(stage['peak_rss_bytes'] or 0, record.peak_rss_bytes)
+        return sorted(stages.values(), key=lambda stage: stage['seconds'], reverse=True)
+
+    def log_summary(self, top: int = 15):
+        """Logs the slowest stages of the run."""
+        for stage in self.summary()[:top]:
+            logging.info(f"{stage['name']:<40} {stage['calls']:>5} calls {stage['seconds']:9.2f}s  "
+                         f"rows {stage['rows_in']} -> {stage['rows_out']}  "
+                         f"peak RSS {(stage['peak_rss_bytes'] or 0) / 2**20:.0f} MB")
+
+    def write_json(self, path: str):
+        """Appends the recorded metrics to a JSON Lines file, one line per stage run, tagged with the run id."""
+        with open(path, 'a') as metrics_file:
+            for record in list(self.records):
+                metrics_file.write(json.dumps({'run_id': self.run_id, **record.to_dict()}, default=str) + '\n')
+        logging.info(f"Appended {len(self.records)} stage metrics to {path}")
+
+    def write_to_postgres(self, engine, schema: str = 'bronze', table_name: str = 'stage_metrics'):
+        """Inserts the recorded metrics into a Postgres table (see bronze.stage_metrics in create_bronze_tables.sql)."""
+        from load import write_df_to_postgres  # Imported here: load.py does not depend on this module
+
+        metrics_df = pd.DataFrame([{'run_id': self.run_id, **record.to_dict()} for record in list(self.records)])
+        if metrics_df.empty:
+            return
+        metrics_df['labels'] = metrics_df['labels'].map(lambda labels: json.dumps(labels, default=str))
+        integer_columns = ['rows_in', 'rows_out', 'bytes', 'rss_start_bytes', 'rss_end_bytes', 'peak_rss_bytes']
+        metrics_df[integer_columns] = metrics_df[integer_columns].astype('Int64')  # Not floats because of the NULLs
+        with engine.begin() as connection:
+            write_df_to_postgres(connection, metrics_df, table_name, schema, method='copy')
+        logging.info(f"Inserted {len(metrics_df)} stage metrics into '{schema}.{table_name}'")
+
+    def flush(self, engine=None):
+        """Writes the recorded metrics to METRICS_FILE and/or METRICS_TABLE, when they are set."""
+        if METRICS_FILE:
+            self.write_json(METRICS_FILE)
+        if METRICS_TABLE and engine is not None:
+            schema, table_name = METRICS_TABLE.split('.', 1)
+            try:
+                self.write_to_postgres(engine, schema, table_name)
+            except Exception as e:
+                logging.error(f"Failed to insert the stage metrics into '{METRICS_TABLE}': {e}")
+
+# Process-wide recorder, shared by DataExtractor, DataTransformer and DataLoader
+metrics = MetricsRecorder()
+
+def instrumented(name: str):
+    """
+    Decorator recording every call of a function as a stage of the process-wide recorder: rows_in is the length
+    of the first DataFrame argument, rows_out the length of the returned DataFrame (if any).
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            frames = [arg for arg in list(args) + list(kwargs.values()) if isinstance(arg, pd.DataFrame)]
+            with metrics.stage(name, rows_in=len(frames[0]) if frames else None) as stage_metrics:
+                result = function(*args, **kwargs)
+                if isinstance(result, pd.DataFrame):
+                    stage_metrics.rows_out = len(result)
+                return result
+        return wrapper
+    return decorator
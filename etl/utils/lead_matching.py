@@ -0,0 +1,207 @@
+# lead_matching.py
+
+import logging
+import numpy as np
+import pandas as pd
+
+# Columns of gold.lead_quality_matching (as created by create_gold_tables.sql), in table order
+GOLD_LEAD_QUALITY_COLUMNS = [
+    'lead_uuid', 'lead_number', 'email_hash', 'phone_hash', 'city', 'state', 'zip', 'appt_date', 'set', 'demo',
+    'dispo', 'job_status', 'location', 'appointment_scheduled', 'demo_scheduled', 'email_match', 'phone_match',
+    '_extraction_date', '_partition_date', 'conversion_rate', 'lead_quality_flag'
+]
+
+class HashIndex:
+    """
+    Hash index over one column of a DataFrame: maps each distinct non-null value to the positions of the rows
+    holding it, so that all the rows matching a set of lookup values are found with a few NumPy operations.
+
+    The distinct values are kept in a `pd.Index` (a hash table) and the row positions are grouped by value in a
+    CSR-like layout: the rows of the value with code `c` are `positions[offsets[c]:offsets[c + 1]]`.
+    """
+
+    def __init__(self, values: pd.Series):
+        """
+        Build the index.
+
+        Args:
+            values (pd.Series): The indexed column. Null values are not indexed (NULL never equals anything in SQL).
+        """
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)  # Nulls get code -1
+        self.keys = pd.Index(uniques)
+        indexed = codes >= 0
+        self.positions = np.flatnonzero(indexed)[np.argsort(codes[indexed], kind='stable')]
+        self.counts = np.bincount(codes[indexed], minlength=len(uniques))
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+
+    def lookup(self, values: pd.Series) -> tuple:
+        """
+        Find all the (lookup row, indexed row) pairs whose values are equal (an inner equi-join).
+
+        Args:
+            values (pd.Series): The lookup values.
+
+        Returns:
+            tuple: (left_positions, right_positions) as NumPy arrays, where left positions refer to `values`
+            (in ascending order) and right positions refer to the indexed column.
+        """
+        codes = self.keys.get_indexer(values)  # -1 for values not in the index (and nulls)
+        found = codes >= 0
+        counts = np.zeros(len(codes), dtype=np.int64)
+        counts[found] = self.counts[codes[found]]
+
+        left_positions = np.repeat(np.arange(len(codes)), counts)
+        # Rank of each pair within its lookup row: 0, 1, ... counts[row] - 1
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        ranks = np.arange(len(left_positions)) - starts
+        right_positions = self.positions[np.repeat(self.offsets[codes[found]], counts[found]) + ranks]
+        return left_positions, right_positions
+
+    def contains(self, values: pd.Series) -> np.ndarray:
+        """Boolean mask of the lookup values present in the index."""
+        return self.keys.get_indexer(values) >= 0
+
+class LeadMatcher:
+    """
+    In-process equivalent of the gold build (gold/insert_into_gold_tables.sql): matches the cleaned CSV snapshots
+    against the cleaned Parquet leads on email_hash OR phone_hash, without a round-trip through Postgres.
+
+    Hash indexes over the Parquet email_hash and phone_hash are built once, then any number of CSV DataFrames
+    (e.g. one per date range) can be matched against them.
+    """
+
+    def __init__(self, parquet_df: pd.DataFrame):
+        """
+        Build the hash indexes over the Parquet leads.
+
+        Args:
+            parquet_df (pd.DataFrame): The output of `DataTransformer.clean_parquet` (or silver.stg_leads_parquet).
+        """
+        self.parquet_df = parquet_df.reset_index(drop=True)
+        self.email_index = HashIndex(self.parquet_df['email_hash'])
+        self.phone_index = HashIndex(self.parquet_df['phone_hash'])
+        logging.info(f"Built lead matching indexes over {len(self.parquet_df)} Parquet leads "
+                     f"({len(self.email_index.keys)} emails, {len(self.phone_index.keys)} phones).")
+
+    def match_pairs(self, csv_df: pd.DataFrame) -> tuple:
+        """
+        Compute the (CSV row, Parquet row) pairs of the LEFT JOIN ... ON email OR phone.
+
+        Same three branches as the SQL: the email matches, the phone matches not already returned by the email
+        branch, and the CSV rows without any match (paired with -1).
+
+        Args:
+            csv_df (pd.DataFrame): The output of `DataTransformer.clean_csv` (or silver.stg_csv_snapshots).
+
+        Returns:
+            tuple: (csv_positions, parquet_positions) as NumPy arrays, ordered by CSV row.
+        """
+        csv_email = csv_df['email_hash'].reset_index(drop=True)
+        csv_phone = csv_df['phone_hash'].reset_index(drop=True)
+
+        # 1) Email branch
+        email_csv, email_parquet = self.email_index.lookup(csv_email)
+
+        # 2) Phone branch, skipping the pairs whose email_hash are equal (already in the email branch)
+        phone_csv, phone_parquet = self.phone_index.lookup(csv_phone)
+        left_email = csv_email.to_numpy(dtype=object)[phone_csv]
+        right_email = self.parquet_df['email_hash'].to_numpy(dtype=object)[phone_parquet]
+        same_email = ~pd.isna(left_email) & ~pd.isna(right_email)
+        same_email[same_email] = left_email[same_email] == right_email[same_email]
+        phone_csv, phone_parquet = phone_csv[~same_email], phone_parquet[~same_email]
+
+        # 3) No match
+        unmatched = ~(self.email_index.contains(csv_email) | self.phone_index.contains(csv_phone))
+        unmatched_csv = np.flatnonzero(unmatched)
+
+        csv_positions = np.concatenate([email_csv, phone_csv, unmatched_csv])
+        parquet_positions = np.concatenate([email_parquet, phone_parquet, np.full(len(unmatched_csv), -1)])
+        order = np.argsort(csv_positions, kind='stable')
+        return csv_positions[order], parquet_positions[order]
+
+    def match(self, csv_df: pd.DataFrame, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        Build the gold lead_quality_matching rows for the CSV snapshots.
+
+        Args:
+            csv_df (pd.DataFrame): The output of `DataTransformer.clean_csv` (or silver.stg_csv_snapshots).
+            start_date: Only match the rows whose _partition_date is on or after this date (optional).
+            end_date: Only match the rows whose _partition_date is on or before this date (optional).
+
+        Returns:
+            pd.DataFrame: The same columns as gold.lead_quality_matching, with the same email_match, phone_match
+            and lead_quality_flag values as insert_into_gold_tables.sql.
+        """
+        if start_date is not None or end_date is not None:
+            partition_dates = pd.to_datetime(csv_df['_partition_date'], errors='coerce')
+            in_range = pd.Series(True, index=csv_df.index)
+            if start_date is not None:
+                in_range &= partition_dates >= pd.Timestamp(start_date)
+            if end_date is not None:
+                in_range &= partition_dates <= pd.Timestamp(end_date)
+            csv_df = csv_df[in_range]
+
+        csv_positions, parquet_positions = self.match_pairs(csv_df)
+        matched = parquet_positions >= 0
+        matched_parquet = self.parquet_df.take(parquet_positions[matched])
+
+        gold_df = csv_df.take(csv_positions).reset_index(drop=True)
+        for column in ['lead_uuid', 'email_hash', 'phone_hash']:
+            parquet_values = pd.Series(pd.NA, index=gold_df.index, dtype=object)
+            parquet_values[matched] = matched_parquet[column].to_numpy(dtype=object)
+            gold_df[f'parquet_{column}'] = parquet_values
+
+        # set / demo are strings unless the silver DataFrame is typed
+        set_count = pd.to_numeric(gold_df['set'], errors='coerce')
+        demo = pd.to_numeric(gold_df['demo'], errors='coerce')
+
+        gold_df['lead_uuid'] = gold_df['parquet_lead_uuid']
+        gold_df['appointment_scheduled'] = (set_count == 1).to_numpy()
+        gold_df['demo_scheduled'] = (demo == 1).to_numpy()
+        gold_df['email_match'] = gold_df['parquet_email_hash'].notna().to_numpy()
+        gold_df['phone_match'] = gold_df['parquet_phone_hash'].notna().to_numpy()
+        gold_df['conversion_rate'] = np.nan  # Placeholder for conversion rate calculation
+        gold_df['lead_quality_flag'] = np.select(
+            [(set_count == 1) & (demo == 1), set_count == 1],
+            ['High Quality', 'Medium Quality'],
+            default='Low Quality'
+        )
+
+        logging.info(f"Matched {len(csv_df)} CSV leads into {len(gold_df)} gold rows "
+                     f"({int(matched.sum())} matched, {int((~matched).sum())} unmatched).")
+        return gold_df[GOLD_LEAD_QUALITY_COLUMNS]
+
+def compare_lead_matching(pandas_df: pd.DataFrame, sql_df: pd.DataFrame,
+                          columns: list = None) -> pd.DataFrame:
+    """
+    Cross-check the in-process matching against the SQL path (e.g. gold.lead_quality_matching read with read_sql).
+
+    Rows are compared as a multiset (row order is not defined in SQL) on the matching columns.
+
+    Args:
+        pandas_df (pd.DataFrame): The output of `LeadMatcher.match`.
+        sql_df (pd.DataFrame): The rows of gold.lead_quality_matching for the same CSV snapshots.
+        columns (list): The columns to compare. Defaults to the keys and the matching flags.
+
+    Returns:
+        pd.DataFrame: The differing rows with a 'difference' column ('pandas_only' / 'sql_only') and a 'count'
+        column (occurrences in excess); empty if both paths agree.
+    """
+    columns = columns or ['lead_number', 'lead_uuid', 'email_match', 'phone_match', 'lead_quality_flag']
+
+    def count_rows(df):
+        keys = df[columns].astype(object).where(df[columns].notna(), None).astype(str)
+        return keys.value_counts()
+
+    pandas_counts = count_rows(pandas_df)
+    sql_counts = count_rows(sql_df)
+    delta = pandas_counts.sub(sql_counts, fill_value=0)
+    delta = delta[delta != 0]
+
+    differences = delta.abs().rename('count').reset_index()
+    differences['difference'] = np.where(delta.to_numpy() > 0, 'pandas_only', 'sql_only')
+    if differences.empty:
+        logging.info(f"Lead matching parity OK: {len(pandas_df)} rows.")
+    else:
+        logging.error(f"Lead matching parity FAILED: {int(differences['count'].sum())} differing rows.")
+    return differences
@@ -0,0 +1,144 @@
+# load.py
+
+import io
+import logging
+import pandas as pd
+from sqlalchemy import text
+from instrumentation import metrics
+
+# Load methods supported by write_df_to_postgres
+LOAD_METHODS = ('insert', 'copy')
+
+# Postgres types holding any string (the untyped Silver tables are only made of these, until step4 types them)
+TEXT_TYPES = ('text', 'character varying')
+
+# Missing values as written by `astype(str)` in the untyped mode
+MISSING_VALUE_STRINGS = ['<NA>', 'NaT', 'nan', 'None']
+
+def quote_identifier(name: str) -> str:
+    """Quote a Postgres identifier (schema, table or column name), keeping its case."""
+    return '"' + name.replace('"', '""') + '"'
+
+def is_text_type(data_type: str) -> bool:
+    """Whether a Postgres type (as returned by `get_column_types`, e.g. 'character varying(255)') holds any string."""
+    return data_type.split('(')[0] in TEXT_TYPES
+
+def get_column_types(connection, schema: str, table_name: str) -> dict:
+    """
+    Fetches the current Postgres types of the columns of a table, e.g. 'text' while Silver is untyped, and 'date',
+    'integer' or 'character(2)' once step4 (apply_silver_types.sql) has run.
+
+    Args:
+        connection: An open SQLAlchemy connection.
+        schema (str): The schema of the table.
+        table_name (str): The table.
+
+    Returns:
+        dict: The column types (with their modifiers, as `format_type` writes them), keyed by column name in table
+        order; empty if the table does not exist.
+    """
+    query = text("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(:table_name) AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum;
+    """)
+    rows = connection.execute(query, {"table_name": f"{quote_identifier(schema)}.{quote_identifier(table_name)}"})
+    return dict(rows.fetchall())
+
+def nullify_missing_value_strings(df: pd.DataFrame, column_types: dict) -> pd.DataFrame:
+    """
+    Replaces the missing values written as strings by the untyped mode ('<NA>', 'NaT', ...) with NULL in the
+    columns whose Postgres type is not a text type, as apply_silver_types.sql does when it types the Silver
+    tables: Postgres would reject them (e.g. '<NA>' in a TIMESTAMP or CHAR(2) column).
+
+    Args:
+        df (pd.DataFrame): The DataFrame about to be loaded.
+        column_types (dict): The column types of the target table (see `get_column_types`).
+
+    Returns:
+        pd.DataFrame: The DataFrame, copied only if a column was changed.
+    """
+    columns = {}
+    for column, data_type in column_types.items():
+        if column not in df.columns or is_text_type(data_type):
+            continue
+        values = df[column]
+        if not (pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype)
+                or isinstance(values.dtype, pd.CategoricalDtype)):
+            continue  # Typed values (numbers, dates) are loaded as they are
+        missing = values.isin(MISSING_VALUE_STRINGS)
+        if missing.any():
+            columns[column] = values.astype(object).where(~missing, None)
+    return df.assign(**columns) if columns else df
+
+def copy_df_to_postgres(conn, df: pd.DataFrame, table_name: str, schema: str, chunksize: int = None) -> int:
+    """
+    Loads a DataFrame into a Postgres table with COPY FROM STDIN.
+
+    The DataFrame is written to an in-memory CSV buffer and streamed to Postgres through psycopg2's `copy_expert`,
+    which is much faster than the row-by-row INSERTs sent by `DataFrame.to_sql`. Missing values (NaN, None, pd.NA)
+    are sent as NULL, while empty strings stay empty strings, just like with `to_sql`. Categorical columns are
+    decoded chunk by chunk as they are written, so they are never expanded in memory.
+
+    Args:
+        conn: An open SQLAlchemy connection (e.g. from `engine.begin()`), so the COPY is part of its transaction.
+        df (pd.DataFrame): The DataFrame to load. Its columns must exist in the target table.
+        table_name (str): The name of the target table.
+        schema (str): The schema of the target table.
+        chunksize (int): If set, the DataFrame is copied in chunks of this many rows to bound the buffer size.
+
+    Returns:
+        int: The number of rows copied.
+    """
+    columns = ', '.join(quote_identifier(column) for column in df.columns)
+    copy_sql = (
+        f"COPY {quote_identifier(schema)}.{quote_identifier(table_name)} ({columns}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    )
+
+    step = chunksize or max(len(df), 1)
+    copied_bytes = 0
+    cursor = conn.connection.cursor()  # Raw psycopg2 cursor
+    try:
+        for start in range(0, len(df), step):
+            buffer = io.StringIO()
+            df.iloc[start:start + step].to_csv(buffer, index=False, header=False, na_rep='\\N')
+            copied_bytes += buffer.tell()
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+    finally:
+        cursor.close()
+
+    stage_metrics = metrics.current_stage()
+    if stage_metrics is not None:
+        stage_metrics.bytes = copied_bytes  # Characters of the CSV stream (bytes for ASCII data)
+
+    return len(df)
+
+def write_df_to_postgres(conn, df: pd.DataFrame, table_name: str, schema: str, method: str = 'insert', chunksize: int = None):
+    """
+    Appends a DataFrame to a Postgres table using the selected load method.
+
+    The missing values written as strings by the untyped mode are loaded as NULL into the columns that are no
+    longer text (see `nullify_missing_value_strings`), so appends keep working after step4 typed the table.
+
+    Args:
+        conn: An open SQLAlchemy connection (e.g. from `engine.begin()`).
+        df (pd.DataFrame): The DataFrame to load.
+        table_name (str): The name of the target table.
+        schema (str): The schema of the target table.
+        method (str): 'insert' uses `DataFrame.to_sql` (INSERT statements), 'copy' uses COPY FROM STDIN.
+        chunksize (int): Number of rows sent per batch (optional).
+    """
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method '{method}'. Expected one of: {LOAD_METHODS}")
+
+    with metrics.stage('load.write_df_to_postgres', rows_in=len(df), table=f"{schema}.{table_name}", method=method) as stage_metrics:
+        df = nullify_missing_value_strings(df, get_column_types(conn, schema, table_name))
+        if method == 'insert':
+            df.to_sql(table_name, conn, schema=schema, if_exists='append', index=False, chunksize=chunksize)
+        else:
+            copy_df_to_postgres(conn, df, table_name, schema, chunksize=chunksize)
+        stage_metrics.rows_out = len(df)
+    logging.debug(f"Wrote {len(df)} rows to '{schema}.{table_name}' using method '{method}'.")
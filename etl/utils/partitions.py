@@ -0,0 +1,199 @@
+# partitions.py
+
+import logging
+from datetime import date, datetime, timedelta
+import pandas as pd
+from sqlalchemy import text
+from load import quote_identifier, get_column_types
+from utils_checks_db import invalidate_schema_cache
+
+# Suffix of the daily partitions: <table_name>_<YYYYMMDD>
+PARTITION_SUFFIX_FORMAT = '%Y%m%d'
+
+# Partition key of the daily partitioned tables
+PARTITION_KEY = '_partition_date'
+
+# Suffix of an unpartitioned table while its rows are moved to the partitioned one (see migrate_to_daily_partitions)
+UNPARTITIONED_SUFFIX = '_unpartitioned'
+
+def get_partition_name(table_name: str, partition_date: date) -> str:
+    """Name of the daily partition of a table, e.g. 'stg_csv_snapshots_20241001'."""
+    return f"{table_name}_{partition_date.strftime(PARTITION_SUFFIX_FORMAT)}"
+
+def to_partition_dates(values) -> list:
+    """Distinct, sorted, non-null dates of a '_partition_date' column (strings 'YYYY-MM-DD', dates or timestamps)."""
+    dates = pd.to_datetime(pd.Series(values).dropna().unique())
+    return sorted({timestamp.date() for timestamp in dates})
+
+def is_partitioned_table(connection, schema: str, table_name: str) -> bool:
+    """Whether a table is partitioned (False if it is a plain table, or does not exist)."""
+    query = text("""
+        SELECT 1
+        FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+        JOIN pg_namespace ns ON ns.oid = pg_class.relnamespace
+        WHERE ns.nspname = :schema AND pg_class.relname = :table_name;
+    """)
+    return connection.execute(query, {"schema": schema, "table_name": table_name}).first() is not None
+
+def get_daily_partitions(connection, schema: str, table_name: str) -> dict:
+    """
+    Fetches the daily partitions attached to a table partitioned by range on '_partition_date'.
+
+    Args:
+        connection: An open SQLAlchemy connection.
+        schema (str): The schema of the partitioned table.
+        table_name (str): The partitioned table.
+
+    Returns:
+        dict: The partition table names, keyed by partition date.
+    """
+    query = text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+        WHERE ns.nspname = :schema AND parent.relname = :table_name;
+    """)
+    partitions = {}
+    for partition_name in connection.execute(query, {"schema": schema, "table_name": table_name}).scalars():
+        suffix = partition_name[len(table_name) + 1:]
+        try:
+            partitions[datetime.strptime(suffix, PARTITION_SUFFIX_FORMAT).date()] = partition_name
+        except ValueError:
+            logging.warning(f"Partition '{schema}.{partition_name}' is not a daily partition of '{schema}.{table_name}'. Ignoring...")
+    return partitions
+
+def create_daily_partitions(connection, schema: str, table_name: str, partition_dates) -> list:
+    """
+    Creates the missing daily partitions of a table partitioned by range on '_partition_date', so that rows of
+    new days can be loaded into it (Postgres routes every row to the partition of its day).
+
+    Args:
+        connection: An open SQLAlchemy connection (e.g. from `engine.begin()`, so the partitions are created in the
+            same transaction as the load).
+        schema (str): The schema of the partitioned table.
+        table_name (str): The partitioned table.
+        partition_dates: The '_partition_date' values about to be loaded (e.g. a DataFrame column).
+
+    Returns:
+        list: The names of the partitions created.
+
+    Raises:
+        RuntimeError: If the table is not partitioned (e.g. created before the daily partitions: step1 migrates it,
+            see `migrate_to_daily_partitions`).
+        sqlalchemy.exc.ProgrammingError: If a table with the name of a missing partition already exists (e.g. a
+            partition detached earlier and not dropped).
+    """
+    existing_partitions = get_daily_partitions(connection, schema, table_name)
+    parent_table = f"{quote_identifier(schema)}.{quote_identifier(table_name)}"
+    missing_dates = [partition_date for partition_date in to_partition_dates(partition_dates)
+                     if partition_date not in existing_partitions]
+    if missing_dates and not existing_partitions and not is_partitioned_table(connection, schema, table_name):
+        raise RuntimeError(f"'{schema}.{table_name}' is not partitioned by '{PARTITION_KEY}': run step1 "
+                           f"(step1_postgres_data_definition.py) to migrate it to daily partitions.")
+
+    created_partitions = []
+    for partition_date in missing_dates:
+        partition_name = get_partition_name(table_name, partition_date)
+        connection.execute(text(
+            f"CREATE TABLE {quote_identifier(schema)}.{quote_identifier(partition_name)} PARTITION OF {parent_table} "
+            f"FOR VALUES FROM ('{partition_date.isoformat()}') TO ('{(partition_date + timedelta(days=1)).isoformat()}')"
+        ))
+        created_partitions.append(partition_name)
+
+    if created_partitions:
+        invalidate_schema_cache(schema)
+        logging.info(f"Created {len(created_partitions)} daily partitions of '{schema}.{table_name}': {created_partitions}")
+    return created_partitions
+
+def detach_daily_partitions(connection, schema: str, table_name: str, before_date, drop: bool = False) -> list:
+    """
+    Detaches the daily partitions older than a date, instead of deleting their rows: the detached partitions
+    remain standalone tables (e.g. to be archived) unless `drop` is set.
+
+    Args:
+        connection: An open SQLAlchemy connection (e.g. from `engine.begin()`).
+        schema (str): The schema of the partitioned table.
+        table_name (str): The partitioned table.
+        before_date: The partitions of the days strictly before this date are detached ('YYYY-MM-DD' or a date).
+        drop (bool): Drop the detached partitions.
+
+    Returns:
+        list: The names of the detached partitions.
+    """
+    before_date = pd.Timestamp(before_date).date()
+    parent_table = f"{quote_identifier(schema)}.{quote_identifier(table_name)}"
+
+    detached_partitions = []
+    for partition_date, partition_name in sorted(get_daily_partitions(connection, schema, table_name).items()):
+        if partition_date >= before_date:
+            continue
+        partition_table = f"{quote_identifier(schema)}.{quote_identifier(partition_name)}"
+        connection.execute(text(f"ALTER TABLE {parent_table} DETACH PARTITION {partition_table}"))
+        if drop:
+            connection.execute(text(f"DROP TABLE {partition_table}"))
+        detached_partitions.append(partition_name)
+
+    if detached_partitions:
+        invalidate_schema_cache(schema)
+        logging.info(f"{'Dropped' if drop else 'Detached'} {len(detached_partitions)} daily partitions of "
+                     f"'{schema}.{table_name}' before {before_date}: {detached_partitions}")
+    return detached_partitions
+
+def migrate_to_daily_partitions(connection, schema: str, table_name: str) -> int:
+    """
+    Migrates a plain table to a table partitioned by range on '_partition_date', keeping its rows: tables created
+    before the daily partitions (e.g. kept on the Postgres volume of an existing deployment) are left as they are
+    by `CREATE TABLE IF NOT EXISTS`, and no partition can be attached to them.
+
+    The table is renamed, the partitioned table is created with the same columns and types ('_partition_date' as
+    DATE, the type of a partition key cannot be altered), the daily partitions of its rows are created, the rows
+    are copied, and the renamed table is dropped (with its indexes).
+
+    Args:
+        connection: An open SQLAlchemy connection (e.g. from `engine.begin()`, so a failed migration leaves the
+            table as it was).
+        schema (str): The schema of the table.
+        table_name (str): The table.
+
+    Returns:
+        int: The number of rows migrated (0 if the table is already partitioned or does not exist).
+
+    Raises:
+        RuntimeError: If rows have no '_partition_date' (no partition can hold them).
+    """
+    column_types = get_column_types(connection, schema, table_name)
+    if not column_types or is_partitioned_table(connection, schema, table_name):
+        return 0
+    if PARTITION_KEY not in column_types:
+        raise RuntimeError(f"Cannot partition '{schema}.{table_name}': it has no '{PARTITION_KEY}' column.")
+
+    table = f"{quote_identifier(schema)}.{quote_identifier(table_name)}"
+    missing_keys = connection.execute(text(f"SELECT count(*) FROM {table} WHERE {quote_identifier(PARTITION_KEY)} IS NULL")).scalar()
+    if missing_keys:
+        raise RuntimeError(f"Cannot partition '{schema}.{table_name}': {missing_keys} rows have no '{PARTITION_KEY}'.")
+
+    unpartitioned_name = f"{table_name}{UNPARTITIONED_SUFFIX}"
+    unpartitioned_table = f"{quote_identifier(schema)}.{quote_identifier(unpartitioned_name)}"
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {quote_identifier(unpartitioned_name)}"))
+
+    column_types[PARTITION_KEY] = 'date'
+    column_list = ', '.join(f"{quote_identifier(column)} {data_type}" for column, data_type in column_types.items())
+    connection.execute(text(f"CREATE TABLE {table} ({column_list}) PARTITION BY RANGE ({quote_identifier(PARTITION_KEY)})"))
+
+    partition_dates = connection.execute(text(
+        f"SELECT DISTINCT {quote_identifier(PARTITION_KEY)}::DATE FROM {unpartitioned_table}")).scalars().all()
+    create_daily_partitions(connection, schema, table_name, partition_dates)
+
+    columns = ', '.join(quote_identifier(column) for column in column_types)
+    select_columns = ', '.join(f"{quote_identifier(column)}::DATE" if column == PARTITION_KEY else quote_identifier(column)
+                               for column in column_types)
+    result = connection.execute(text(f"INSERT INTO {table} ({columns}) SELECT {select_columns} FROM {unpartitioned_table}"))
+    connection.execute(text(f"DROP TABLE {unpartitioned_table}"))
+
+    invalidate_schema_cache(schema)
+    logging.info(f"Migrated '{schema}.{table_name}' to daily partitions: {result.rowcount} rows in "
+                 f"{len(partition_dates)} partitions.")
+    return result.rowcount
@@ -0,0 +1,64 @@
+# pipeline_context.py
+
+import logging
+import threading
+import pandas as pd
+from utils_connection import get_db_engine, get_s3_client, get_connection_uri
+
+class PipelineContext:
+    """
+    Resources shared by the pipeline steps when they run in the same process (see etl/pipeline.py).
+
+    A single SQLAlchemy engine (and its connection pool) and a single S3 client are taken on first use from the
+    connection registry (utils_connection.get_db_engine / get_s3_client) and reused by every step, and DataFrames
+    produced by a step can be handed to the next steps in memory instead of being read back from Postgres. Steps may run concurrently in threads, so the shared resources
+    are created under a lock (SQLAlchemy engines and boto3 clients are thread-safe).
+    """
+
+    def __init__(self, engine=None, s3_client=None):
+        """
+        Initialize parameters.
+
+        Args:
+            engine: An existing SQLAlchemy engine to share (optional, the process-wide one otherwise).
+            s3_client: An existing boto3 S3 client to share (optional, the process-wide one otherwise).
+        """
+        self.connection_uri = get_connection_uri()
+        self._engine = engine
+        self._s3_client = s3_client
+        self.frames = {}  # In-memory DataFrames, keyed by '<schema>.<table_name>'
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        """The shared SQLAlchemy engine."""
+        with self._lock:
+            if self._engine is None:
+                self._engine = get_db_engine(self.connection_uri)
+        return self._engine
+
+    @property
+    def s3_client(self):
+        """The shared boto3 S3 client."""
+        with self._lock:
+            if self._s3_client is None:
+                self._s3_client = get_s3_client()
+        return self._s3_client
+
+    def put_frame(self, schema: str, table_name: str, df: pd.DataFrame):
+        """Keep the full content of a table in memory for the next steps."""
+        self.frames[f"{schema}.{table_name}"] = df
+        logging.info(f"Kept {len(df)} rows of '{schema}.{table_name}' in memory.")
+
+    def get_frame(self, schema: str, table_name: str) -> pd.DataFrame:
+        """Return the in-memory content of a table, or None if the table must be read from Postgres."""
+        return self.frames.get(f"{schema}.{table_name}")
+
+    def drop_frame(self, schema: str, table_name: str):
+        """Forget the in-memory content of a table (e.g. after it was changed in Postgres)."""
+        self.frames.pop(f"{schema}.{table_name}", None)
+
+    def dispose(self):
+        """Release the pooled database connections."""
+        if self._engine is not None:
+            self._engine.dispose()
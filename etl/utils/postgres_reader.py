@@ -0,0 +1,84 @@
+# postgres_reader.py
+
+import logging
+from typing import Iterator
+import pandas as pd
+from sqlalchemy import text, bindparam
+from load import quote_identifier
+from instrumentation import metrics
+
+# Default number of rows fetched per round-trip from a server-side cursor
+DEFAULT_READ_CHUNKSIZE = 50000
+
+def build_select_query(schema: str, table_name: str, columns: list = None, filter_partitions: bool = False) -> str:
+    """
+    Builds the SELECT reading a table, with quoted identifiers.
+
+    Args:
+        schema (str): The schema of the table.
+        table_name (str): The table to read.
+        columns (list): The columns to read (all by default).
+        filter_partitions (bool): Only read the rows whose '_partition_date' is in the :partition_dates parameter.
+
+    Returns:
+        str: The SELECT statement.
+    """
+    column_list = ', '.join(quote_identifier(column) for column in columns) if columns else '*'
+    query = f"SELECT {column_list} FROM {quote_identifier(schema)}.{quote_identifier(table_name)}"
+    if filter_partitions:
+        query += ' WHERE "_partition_date" IN :partition_dates'
+    return query
+
+def iter_table_chunks(engine, schema: str, table_name: str, chunksize: int = DEFAULT_READ_CHUNKSIZE,
+                      columns: list = None, partition_dates: list = None) -> Iterator[pd.DataFrame]:
+    """
+    Reads a table chunk by chunk through a server-side (named) cursor, so neither psycopg2 nor pandas ever holds
+    more than `chunksize` rows (a client-side cursor buffers the whole result before the first row is returned).
+
+    The connection stays checked out of the pool until the iterator is exhausted or closed.
+
+    Args:
+        engine: The SQLAlchemy engine.
+        schema (str): The schema of the table.
+        table_name (str): The table to read.
+        chunksize (int): Number of rows per DataFrame (and per round-trip to the server).
+        columns (list): The columns to read (all by default).
+        partition_dates (list): Only read the rows of these '_partition_date' values ('YYYY-MM-DD' strings or dates).
+
+    Yields:
+        pd.DataFrame: The rows of the table, `chunksize` at a time (a single empty DataFrame if there are none).
+    """
+    query = text(build_select_query(schema, table_name, columns, filter_partitions=partition_dates is not None))
+    if partition_dates is not None:
+        query = query.bindparams(bindparam('partition_dates', value=[str(partition_date) for partition_date in partition_dates],
+                                           expanding=True))
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(stream_results=True, max_row_buffer=chunksize)
+        chunks = pd.read_sql(query, connection, chunksize=chunksize)
+        total_rows = 0
+        while True:
+            # Only the fetch is measured: the consumer of the chunk runs outside of this stage
+            with metrics.stage('extract.postgres_read_chunk', table=f"{schema}.{table_name}") as stage_metrics:
+                chunk = next(chunks, None)
+                stage_metrics.rows_out = None if chunk is None else len(chunk)
+            if chunk is None:
+                break
+            total_rows += len(chunk)
+            yield chunk
+    logging.info(f"Read {total_rows} rows from '{schema}.{table_name}' in chunks of {chunksize}.")
+
+def read_table(engine, schema: str, table_name: str, columns: list = None, partition_dates: list = None,
+               chunksize: int = DEFAULT_READ_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Reads a table (or some of its columns and partition dates) into one DataFrame, through a server-side cursor
+    (see `iter_table_chunks`): the rows are only held once, as DataFrame chunks, before being concatenated.
+
+    Returns:
+        pd.DataFrame: The rows of the table.
+    """
+    chunks = list(iter_table_chunks(engine, schema, table_name, chunksize=chunksize, columns=columns,
+                                    partition_dates=partition_dates))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,386 @@
+# silver_sql.py
+
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+from load import quote_identifier, is_text_type, get_column_types
+from partitions import create_daily_partitions
+from instrumentation import metrics
+from transform import DataTransformer, NULL_SENTINELS
+from state_normalization import US_STATE_CODES
+
+# Set-based Silver transform: the rules of `DataTransformer.clean_csv` / `clean_parquet` written as one
+# INSERT ... SELECT per table, run inside Postgres, so the Bronze rows never make the round-trip through pandas.
+#
+# Differences with the pandas engine, reported by `check_silver_sql_parity`:
+# - Dates are parsed from the formats seen in the snapshots (MM/DD/YYYY, DD-MM-YYYY, YYYY-MM-DD and
+#   'MM/DD/YYYY  h:mmAM'). Values pandas would still parse with its free-form parser (e.g. 'Jan 5 2023') are NULL.
+# - Whitespace is stripped with the regex class \s (pandas' str.strip also strips the other Unicode spaces).
+# - Untyped mode: a Bronze NULL (only loaded by the typed extraction) is '<NA>', where pandas writes 'None' in the
+#   columns it does not clean (e.g. 'Dispo').
+
+# Bronze CSV columns, in Silver column order, with their Silver names
+CSV_COLUMNS = {
+    'ENTRYDATE': 'entry_date',
+    'LEADNUMBER': 'lead_number',
+    'email_hash': 'email_hash',
+    'phone_hash': 'phone_hash',
+    'CITY': 'city',
+    'STATE': 'state',
+    'ZIP': 'zip',
+    'APPT_DATE': 'appt_date',
+    'Set': 'set',
+    'Demo': 'demo',
+    'Dispo': 'dispo',
+    'JOB_STATUS': 'job_status',
+    'location': 'location',
+    '_extraction_date': '_extraction_date',
+    '_partition_date': '_partition_date'
+}
+
+# Bronze Parquet columns (the first three are the ID columns), with their Silver names
+PARQUET_COLUMNS = {
+    'lead_UUID': 'lead_uuid',
+    'phone_hash': 'phone_hash',
+    'email_hash': 'email_hash',
+    '_extraction_date': '_extraction_date'
+}
+
+# Silver CSV columns cast to integers by the typed mode (see `get_silver_table_data_types`)
+TYPED_INTEGER_COLUMNS = ['lead_number', 'set', 'demo']
+
+def cast_to_column_type_sql(expression: str, column: str, column_types: dict = None) -> str:
+    """
+    SQL expression of a Silver value (built as TEXT) cast to the current type of its target column, e.g. DATE once
+    step4 (apply_silver_types.sql) has typed the table: Postgres has no assignment cast from TEXT to DATE, TIMESTAMP
+    or INT. Values of text columns (and of unknown targets) are left as they are.
+    """
+    data_type = (column_types or {}).get(column, 'text')
+    if is_text_type(data_type):
+        return expression
+    return f"({expression})::{data_type}"
+
+def strip_sql(expression: str) -> str:
+    """SQL expression stripping the leading/trailing whitespace of a value (like Python's str.strip)."""
+    return f"regexp_replace({expression}, '^\\s+|\\s+$', '', 'g')"
+
+def null_sentinel_sql(column: str) -> str:
+    """SQL expression of a Bronze column with the null sentinels and whitespace-only values replaced with NULL."""
+    sentinels = ', '.join(f"'{sentinel}'" for sentinel in NULL_SENTINELS + [''])
+    column = quote_identifier(column)
+    return f"CASE WHEN {column} IN ({sentinels}) OR {column} ~ '^\\s+$' THEN NULL ELSE {column} END"
+
+# Date formats handled by the SQL engine, as (regex the whole value must match, separator, positions of the year,
+# month and day fields). Fields are read with split_part, cheaper than the capture groups of regexp_match.
+SQL_ENTRY_DATE_FORMATS = [
+    (r'^\d{1,2}/\d{1,2}/\d{4}$', '/', (3, 1, 2)),  # MM/DD/YYYY
+    (r'^\d{2}-\d{2}-\d{4}$', '-', (3, 2, 1)),  # DD-MM-YYYY
+    (r'^\d{4}-\d{2}-\d{2}$', '-', (1, 2, 3)),  # YYYY-MM-DD
+]
+SQL_APPT_TIME_PATTERN = r'^\d{1,2}/\d{1,2}/\d{4}\s+\d{1,2}:\d{2}[AP]M$'  # MM/DD/YYYY  h:mmAM
+SQL_APPT_DATE_FORMATS = [
+    (r'^\d{1,2}/\d{1,2}/\d{4}$', '/', (3, 1, 2)),  # MM/DD/YYYY
+    (SQL_APPT_TIME_PATTERN, '/', (3, 1, 2)),  # The time is checked separately (see build_csv_silver_query)
+    (r'^\d{4}-\d{2}-\d{2}$', '-', (1, 2, 3)),  # YYYY-MM-DD
+]
+
+def parse_date_sql(value: str, separator: str, positions: tuple) -> str:
+    """
+    SQL expression of the date held by `value` (already matched against its format), NULL if it does not exist.
+    A month and day that make no date are tried the other way round, like pandas' free-form parser does
+    (e.g. '13/01/2023' is January 13th), except for YYYY-MM-DD.
+    """
+    year, month, day = (f"split_part({value}, '{separator}', {position})" for position in positions)
+    year = f"left({year}, 4)::INT"  # The year may be followed by the time
+    parsed = f"SILVER.TRY_MAKE_DATE({year}, {month}::INT, {day}::INT)"
+    if positions[0] == 1:
+        return parsed
+    return f"COALESCE({parsed}, SILVER.TRY_MAKE_DATE({year}, {day}::INT, {month}::INT))"
+
+def normalize_date_sql(value: str, date_formats: list) -> str:
+    """SQL expression converting a date column to 'YYYY-MM-DD' (NULL if its format is unknown or the date invalid)."""
+    cases = '\n'.join(f"                    WHEN {value} ~ '{pattern}' THEN {parse_date_sql(value, separator, positions)}"
+                      for pattern, separator, positions in date_formats)
+    return f"to_char(CASE\n{cases}\n                END, 'YYYY-MM-DD')"
+
+def build_csv_silver_query(source_schema: str = 'bronze', source_table: str = 'csv_snapshots', typed: bool = False,
+                           filter_partitions: bool = False, column_types: dict = None) -> str:
+    """
+    Builds the SELECT turning Bronze CSV snapshots into Silver rows, with the rules of `DataTransformer.clean_csv`:
+
+    - Drops rows containing "-----" in any column, and rows with 'APPT_DATE' equal to "nu".
+    - Replaces null sentinels ('nan', 'None', '<NA>', 'nu' and whitespace-only values) with NULL.
+    - 'ENTRYDATE' and 'APPT_DATE' are converted to 'YYYY-MM-DD'. Invalid dates are set to NULL.
+    - A missing 'STATE' is inferred from the valid state code at the end of 'location' ('... | WA').
+    - 'ZIP' keeps valid 5-digit codes as integers (leading '0' dropped); rows with ZIP 0 are dropped.
+    - 'Demo' True/False values become '1'/'0'. 'location' is stripped.
+    - Untyped mode: missing values are written as '<NA>' ('NaT' for entry_date), as `astype(str)` does.
+      Typed mode: they stay NULL and the integer columns that are not integers are set to NULL.
+    - With `column_types`, the values are cast to the types of the target columns, and the missing values of the
+      columns that are no longer text are NULL in both modes (as apply_silver_types.sql sets them).
+
+    Args:
+        source_schema (str): The schema of the Bronze table.
+        source_table (str): The Bronze CSV table.
+        typed (bool): Keep NULLs and typed values instead of the string sentinels of the pandas untyped mode.
+        filter_partitions (bool): Only read the Bronze rows whose '_partition_date' is in the :partition_dates
+            parameter (a list of 'YYYY-MM-DD' strings).
+        column_types (dict): The current types of the target Silver columns (see `get_column_types`), e.g. after
+            step4 typed them. By default, every column is TEXT.
+
+    Returns:
+        str: The SELECT statement, returning the Silver columns in order.
+    """
+    source = f"{quote_identifier(source_schema)}.{quote_identifier(source_table)}"
+    raw_columns = ', '.join(quote_identifier(column) for column in CSV_COLUMNS)
+    source_columns = ',\n            '.join(f"{null_sentinel_sql(column)} AS {quote_identifier(column)}"
+                                              for column in CSV_COLUMNS)
+    partition_filter = 'AND "_partition_date" IN :partition_dates' if filter_partitions else ''
+    location = strip_sql('"location"')
+    state_codes = ', '.join(f"'{state_code}'" for state_code in US_STATE_CODES)
+
+    cleaned_query = f"""
+        WITH source AS MATERIALIZED (  -- Computed once: its columns are referenced several times below
+            SELECT
+            {source_columns}
+            FROM {source}
+            WHERE array_position(ARRAY[{raw_columns}], '-----') IS NULL
+              AND "APPT_DATE" IS DISTINCT FROM 'nu'
+              {partition_filter}
+        ),
+        cleaned AS (
+            SELECT
+                {normalize_date_sql('"ENTRYDATE"', SQL_ENTRY_DATE_FORMATS)} AS entry_date,
+                "LEADNUMBER" AS lead_number,
+                "email_hash" AS email_hash,
+                "phone_hash" AS phone_hash,
+                "CITY" AS city,
+                COALESCE("STATE", CASE WHEN {location} ~ '\\|\\s*[A-Z]{{2}}$' AND right({location}, 2) IN ({state_codes})
+                                       THEN right({location}, 2) END) AS state,
+                CASE WHEN "ZIP" ~ '^[0-9]{{5}}$' THEN "ZIP"::INT END AS zip,
+                CASE
+                    -- The time of 'MM/DD/YYYY  h:mmAM' values must be valid too (hour 0-12, minutes 0-59)
+                    WHEN "APPT_DATE" ~ '{SQL_APPT_TIME_PATTERN}' AND NOT (substr(split_part(split_part("APPT_DATE", ':', 1), '/', 3), 5)::INT <= 12
+                                                  AND left(split_part("APPT_DATE", ':', 2), 2)::INT < 60) THEN NULL
+                    ELSE {normalize_date_sql('"APPT_DATE"', SQL_APPT_DATE_FORMATS)}
+                END AS appt_date,
+                "Set" AS "set",
+                CASE "Demo" WHEN 'True' THEN '1' WHEN 'False' THEN '0' ELSE "Demo" END AS demo,
+                "Dispo" AS dispo,
+                "JOB_STATUS" AS job_status,
+                {location} AS location,
+                "_extraction_date" AS _extraction_date,
+                "_partition_date"::DATE AS _partition_date
+            FROM source
+        )"""
+
+    output_columns = []
+    for column in CSV_COLUMNS.values():
+        expression = quote_identifier(column)
+        if column == 'zip':
+            expression = f"{expression}::TEXT"
+        if typed and column in TYPED_INTEGER_COLUMNS:  # Values pandas' to_numeric cannot turn into integers are NULL
+            expression = f"CASE WHEN {expression} ~ '^\\s*[+-]?\\d+(\\.0*)?\\s*$' THEN {expression}::NUMERIC::BIGINT::TEXT END"
+        elif not typed and column != '_partition_date' and is_text_type((column_types or {}).get(column, 'text')):
+            # The DATE partition key is never NULL, and the typed columns keep their NULLs
+            expression = f"COALESCE({expression}, '{'NaT' if column == 'entry_date' else '<NA>'}')"
+        if column != '_partition_date':  # Already DATE
+            expression = cast_to_column_type_sql(expression, column, column_types)
+        output_columns.append(f"{expression} AS {quote_identifier(column)}")
+
+    select_columns = ',\n            '.join(output_columns)
+    return f"""{cleaned_query}
+        SELECT
+            {select_columns}
+        FROM cleaned
+        WHERE zip IS DISTINCT FROM 0"""
+
+def build_parquet_silver_query(source_schema: str = 'bronze', source_table: str = 'leads_parquet',
+                               column_types: dict = None) -> str:
+    """
+    Builds the SELECT turning the Bronze Parquet leads into Silver rows, with the rules of
+    `DataTransformer.clean_parquet`: rows with a missing ID column are dropped, the hashes are lowercased and
+    stripped, and the duplicates on the three ID columns are dropped (the first Bronze row is kept).
+
+    Args:
+        source_schema (str): The schema of the Bronze table.
+        source_table (str): The Bronze Parquet table.
+        column_types (dict): The current types of the target Silver columns (see `get_column_types`), e.g. after
+            step4 typed them. By default, every column is TEXT.
+
+    Returns:
+        str: The SELECT statement, returning the Silver columns in order.
+    """
+    source = f"{quote_identifier(source_schema)}.{quote_identifier(source_table)}"
+    select_columns = ', '.join(f"{cast_to_column_type_sql(quote_identifier(column), column, column_types)} AS {quote_identifier(column)}"
+                               for column in PARQUET_COLUMNS.values())
+    return f"""
+        SELECT {select_columns}
+        FROM (
+            SELECT DISTINCT ON ("lead_uuid", "phone_hash", "email_hash")
+                "lead_uuid", "phone_hash", "email_hash", "_extraction_date"
+            FROM (
+                SELECT
+                    "lead_UUID" AS "lead_uuid",
+                    lower({strip_sql('"phone_hash"')}) AS "phone_hash",
+                    lower({strip_sql('"email_hash"')}) AS "email_hash",
+                    "_extraction_date",
+                    ctid AS row_position
+                FROM {source}
+                WHERE "lead_UUID" IS NOT NULL AND "phone_hash" IS NOT NULL AND "email_hash" IS NOT NULL
+            ) AS normalized
+            ORDER BY "lead_uuid", "phone_hash", "email_hash", row_position
+        ) AS deduplicated"""
+
+def bind_partition_dates(statement: str, partition_dates: list = None):
+    """The statement as a SQLAlchemy text clause, with its :partition_dates parameter bound (if filtered)."""
+    query = text(statement)
+    if partition_dates is None:
+        return query
+    return query.bindparams(bindparam('partition_dates', value=[str(partition_date) for partition_date in partition_dates],
+                                       expanding=True))
+
+def insert_csv_silver(connection, typed: bool = False, partition_dates: list = None, source_schema: str = 'bronze',
+                      source_table: str = 'csv_snapshots', target_schema: str = 'silver',
+                      target_table: str = 'stg_csv_snapshots') -> int:
+    """
+    Transforms the Bronze CSV snapshots into Silver inside Postgres, with a single INSERT ... SELECT.
+
+    The daily partitions of the target table are created first, in the same transaction. The values are cast to
+    the current types of the target columns, so the insert also works after step4 typed them.
+
+    Args:
+        connection: An open SQLAlchemy connection (e.g. from `engine.begin()`).
+        typed (bool): Keep NULLs instead of the string sentinels of the untyped mode.
+        partition_dates (list): Only transform the Bronze rows of these '_partition_date' values (e.g. the partitions
+            of an incremental load). By default, the whole Bronze table is transformed.
+        source_schema (str): The schema of the Bronze table.
+        source_table (str): The Bronze CSV table.
+        target_schema (str): The schema of the Silver table.
+        target_table (str): The Silver CSV table (partitioned by range on '_partition_date').
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    with metrics.stage('transform.silver_sql.csv', table=f"{target_schema}.{target_table}") as stage_metrics:
+        source = f"{quote_identifier(source_schema)}.{quote_identifier(source_table)}"
+        dates_query = f'SELECT DISTINCT "_partition_date" FROM {source} WHERE "_partition_date" IS NOT NULL'
+        if partition_dates is None:
+            dates = connection.execute(text(dates_query)).scalars().all()
+        else:
+            dates = [str(partition_date) for partition_date in partition_dates]
+        create_daily_partitions(connection, target_schema, target_table, dates)
+
+        columns = ', '.join(quote_identifier(column) for column in CSV_COLUMNS.values())
+        select_query = build_csv_silver_query(source_schema, source_table, typed=typed,
+                                              filter_partitions=partition_dates is not None,
+                                              column_types=get_column_types(connection, target_schema, target_table))
+        result = connection.execute(bind_partition_dates(
+            f"INSERT INTO {quote_identifier(target_schema)}.{quote_identifier(target_table)} ({columns}) {select_query}",
+            partition_dates
+        ))
+        stage_metrics.rows_out = result.rowcount
+    logging.info(f"Inserted {result.rowcount} rows into '{target_schema}.{target_table}' from '{source_schema}.{source_table}' (SQL engine).")
+    return result.rowcount
+
+def insert_parquet_silver(connection, source_schema: str = 'bronze', source_table: str = 'leads_parquet',
+                          target_schema: str = 'silver', target_table: str = 'stg_leads_parquet') -> int:
+    """
+    Transforms the Bronze Parquet leads into Silver inside Postgres, with a single INSERT ... SELECT (cast to the
+    current types of the target columns).
+
+    Args:
+        connection: An open SQLAlchemy connection (e.g. from `engine.begin()`).
+        source_schema (str): The schema of the Bronze table.
+        source_table (str): The Bronze Parquet table.
+        target_schema (str): The schema of the Silver table.
+        target_table (str): The Silver Parquet table.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    with metrics.stage('transform.silver_sql.parquet', table=f"{target_schema}.{target_table}") as stage_metrics:
+        columns = ', '.join(quote_identifier(column) for column in PARQUET_COLUMNS.values())
+        column_types = get_column_types(connection, target_schema, target_table)
+        result = connection.execute(text(
+            f"INSERT INTO {quote_identifier(target_schema)}.{quote_identifier(target_table)} ({columns}) "
+            f"{build_parquet_silver_query(source_schema, source_table, column_types=column_types)}"
+        ))
+        stage_metrics.rows_out = result.rowcount
+    logging.info(f"Inserted {result.rowcount} rows into '{target_schema}.{target_table}' from '{source_schema}.{source_table}' (SQL engine).")
+    return result.rowcount
+
+def compare_silver_frames(pandas_df: pd.DataFrame, sql_df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    Compares the Silver rows built by the pandas engine with the ones built by the SQL engine.
+
+    Rows are compared as a multiset (row order is not defined in SQL), on their string representation:
+    dates are compared as 'YYYY-MM-DD' and missing values as NULL.
+
+    Args:
+        pandas_df (pd.DataFrame): The output of `DataTransformer.clean_csv` or `clean_parquet`.
+        sql_df (pd.DataFrame): The output of the SQL engine for the same Bronze rows (e.g. read with read_sql).
+        columns (list): The columns to compare. Defaults to the columns of `sql_df`.
+
+    Returns:
+        pd.DataFrame: The differing rows with a 'difference' column ('pandas_only' / 'sql_only') and a 'count'
+        column (occurrences in excess); empty if both engines agree.
+    """
+    columns = columns or sql_df.columns.tolist()
+
+    def count_rows(df):
+        keys = {}
+        for column in columns:
+            values = df[column]
+            if pd.api.types.is_datetime64_any_dtype(values.dtype):
+                values = values.dt.strftime('%Y-%m-%d')
+            values = values.astype(object)
+            keys[column] = values.where(values.notna(), None).astype(str)
+        return pd.DataFrame(keys).value_counts()
+
+    pandas_counts = count_rows(pandas_df)
+    sql_counts = count_rows(sql_df)
+    delta = pandas_counts.sub(sql_counts, fill_value=0)
+    delta = delta[delta != 0]
+
+    differences = delta.abs().rename('count').reset_index()
+    differences['difference'] = np.where(delta.to_numpy() > 0, 'pandas_only', 'sql_only')
+    if differences.empty:
+        logging.info(f"Silver engines parity OK: {len(pandas_df)} rows.")
+    else:
+        logging.error(f"Silver engines parity FAILED: {int(differences['count'].sum())} differing rows.")
+    return differences
+
+def check_silver_sql_parity(engine, source: str = 'csv', typed: bool = False, partition_dates: list = None,
+                            source_schema: str = 'bronze') -> pd.DataFrame:
+    """
+    Runs both Silver engines on the same Bronze rows and compares their output (nothing is written).
+
+    Args:
+        engine: The SQLAlchemy engine.
+        source (str): 'csv' (bronze.csv_snapshots) or 'parquet' (bronze.leads_parquet).
+        typed (bool): Compare the typed mode instead of the untyped one (CSV only: the Parquet cleaning is the same).
+        partition_dates (list): Only compare the Bronze CSV rows of these '_partition_date' values.
+        source_schema (str): The schema of the Bronze tables.
+
+    Returns:
+        pd.DataFrame: The differing rows (see `compare_silver_frames`); empty if both engines agree.
+    """
+    transformer = DataTransformer(engine=engine)
+    if source == 'csv':
+        bronze_query = f"SELECT * FROM {quote_identifier(source_schema)}.csv_snapshots"
+        if partition_dates is not None:
+            bronze_query += ' WHERE "_partition_date" IN :partition_dates'
+        sql_query = build_csv_silver_query(source_schema, typed=typed, filter_partitions=partition_dates is not None)
+        with engine.connect() as connection:
+            bronze_df = pd.read_sql(bind_partition_dates(bronze_query, partition_dates), connection)
+            sql_df = pd.read_sql(bind_partition_dates(sql_query, partition_dates), connection)
+        pandas_df = transformer.clean_csv(bronze_df, typed=typed)
+    elif source == 'parquet':
+        bronze_df = pd.read_sql(f"SELECT * FROM {quote_identifier(source_schema)}.leads_parquet", engine)
+        pandas_df = transformer.clean_parquet(bronze_df, typed=typed)
+        sql_df = pd.read_sql(text(build_parquet_silver_query(source_schema)), engine)
+    else:
+        raise ValueError(f"Unknown source '{source}'. Expected 'csv' or 'parquet'.")
+    return compare_silver_frames(pandas_df, sql_df)
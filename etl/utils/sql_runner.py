@@ -0,0 +1,166 @@
+# sql_runner.py
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils_connection import get_db_engine
+
+# Folder of the SQL scripts (script names are relative to it, e.g. 'silver/apply_silver_types.sql')
+SQL_SCRIPTS_DIR = '/workspace/sql_scripts'
+
+def split_sql_statements(sql: str) -> list:
+    """
+    Splits a SQL script into statements on the semicolons that are not inside a comment, a quoted string or
+    identifier, or a dollar-quoted body (e.g. the `DO $$ ... END $$;` blocks).
+
+    Args:
+        sql (str): The content of the SQL script.
+
+    Returns:
+        list: The statements, without their final semicolon. Comment-only statements are dropped.
+    """
+    statements = []
+    current = []  # Characters of the current statement
+    has_code = False  # The current statement holds more than whitespace and comments
+    i, length = 0, len(sql)
+
+    while i < length:
+        char = sql[i]
+
+        if sql.startswith('--', i):  # Line comment
+            end = sql.find('\n', i)
+            end = length if end == -1 else end
+        elif sql.startswith('/*', i):  # Block comment
+            end = sql.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+        elif char in ("'", '"'):  # Quoted string or identifier (a doubled quote is an escaped quote)
+            end = i + 1
+            while end < length:
+                if sql[end] == char:
+                    if end + 1 < length and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            end = min(end + 1, length)
+            has_code = True
+        elif char == '$':  # Dollar-quoted body: $$ ... $$ or $tag$ ... $tag$
+            tag_end = i + 1
+            while tag_end < length and (sql[tag_end].isalnum() or sql[tag_end] == '_'):
+                tag_end += 1
+            if tag_end < length and sql[tag_end] == '$' and not sql[i + 1:tag_end][:1].isdigit():
+                tag = sql[i:tag_end + 1]
+                end = sql.find(tag, tag_end + 1)
+                end = length if end == -1 else end + len(tag)
+            else:  # A positional parameter ($1) or part of an identifier
+                end = i + 1
+            has_code = True
+        elif char == ';':
+            if has_code:
+                statements.append(''.join(current).strip())
+            current, has_code = [], False
+            i += 1
+            continue
+        else:
+            end = i + 1
+            has_code = has_code or not char.isspace()
+
+        current.append(sql[i:end])
+        i = end
+
+    if has_code:
+        statements.append(''.join(current).strip())
+    return statements
+
+def describe_statement(statement: str, max_length: int = 80) -> str:
+    """First code line of a statement (after its leading comments), to report it in the logs."""
+    for line in statement.splitlines():
+        line = line.strip()
+        if line and not line.startswith('--'):
+            return line if len(line) <= max_length else line[:max_length - 3] + '...'
+    return statement[:max_length]
+
+def execute_sql_script(script_name: str, engine=None, transactional: bool = True) -> list:
+    """
+    Executes a SQL script on the shared engine, statement by statement, timing each statement.
+
+    Args:
+        script_name (str): The path of the script, relative to SQL_SCRIPTS_DIR.
+        engine: The SQLAlchemy engine to use (optional, defaults to the process-wide engine).
+        transactional (bool): Run the whole script in one transaction (nothing is applied if a statement fails).
+            Otherwise every statement is committed on its own (e.g. for VACUUM or CREATE INDEX CONCURRENTLY).
+
+    Returns:
+        list: (statement description, seconds) for every statement, in script order.
+
+    Raises:
+        Exception: The database error of the first statement that failed.
+    """
+    engine = engine or get_db_engine()
+    with open(f"{SQL_SCRIPTS_DIR}/{script_name}", 'r') as script_file:
+        statements = split_sql_statements(script_file.read())
+
+    timings = []
+
+    def execute_statements(connection):
+        # Raw DBAPI cursor: statements are sent as is, without parameter interpolation (e.g. '%s' in format())
+        cursor = connection.connection.cursor()
+        try:
+            for statement in statements:
+                start = time.perf_counter()
+                cursor.execute(statement)
+                timings.append((describe_statement(statement), time.perf_counter() - start))
+                logging.debug(f"{script_name}: {timings[-1][0]} ({timings[-1][1]:.3f}s)")
+        finally:
+            cursor.close()
+
+    if transactional:
+        with engine.begin() as connection:
+            execute_statements(connection)
+    else:
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            execute_statements(connection)
+    return timings
+
+def run_sql_script(script_name: str, engine=None, transactional: bool = True) -> int:
+    """
+    Execute a SQL script on the shared engine (see `execute_sql_script`) and log where the time went.
+
+    Args:
+        script_name (str): The name of the SQL script file, relative to SQL_SCRIPTS_DIR.
+        engine: The SQLAlchemy engine to use (optional, defaults to the process-wide engine).
+        transactional (bool): Run the whole script in one transaction.
+
+    Returns:
+        int: 0 if the script was executed successfully, 1 otherwise.
+    """
+    start = time.perf_counter()
+    try:
+        timings = execute_sql_script(script_name, engine=engine, transactional=transactional)
+    except Exception as e:
+        logging.error(f"Failed to execute the script {script_name}: {str(e)}")
+        return 1
+
+    logging.info(f"SQL script {script_name} executed successfully: {len(timings)} statements in "
+                 f"{time.perf_counter() - start:.2f}s.")
+    for description, seconds in sorted(timings, key=lambda timing: timing[1], reverse=True)[:3]:
+        logging.info(f"    {seconds:8.3f}s  {description}")
+    return 0
+
+def run_sql_scripts_parallel(script_names: list, engine=None, max_workers: int = 4, transactional: bool = True) -> dict:
+    """
+    Executes independent SQL scripts concurrently, each on its own pooled connection.
+
+    Args:
+        script_names (list): The scripts to run (they must not depend on each other).
+        engine: The SQLAlchemy engine to use (optional, defaults to the process-wide engine).
+        max_workers (int): Number of scripts running concurrently.
+        transactional (bool): Run each script in one transaction.
+
+    Returns:
+        dict: The result of `run_sql_script` (0 on success), keyed by script name.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda script_name: run_sql_script(script_name, engine=engine, transactional=transactional),
+                               script_names)
+        return dict(zip(script_names, results))
@@ -0,0 +1,96 @@
+# state_normalization.py
+
+import logging
+import numpy as np
+import pandas as pd
+from categoricals import to_categorical, map_categories
+
+# Valid state codes: the 50 states, the District of Columbia and the inhabited territories
+US_STATE_CODES = [
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME',
+    'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA',
+    'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+    'DC', 'AS', 'GU', 'MP', 'PR', 'VI'
+]
+
+# Precompiled lookup: parsing a value into this dtype maps it to its code, or to NULL if it is not a valid state
+STATE_DTYPE = pd.CategoricalDtype(US_STATE_CODES)
+
+# State code at the end of a 'City | ST' location
+LOCATION_STATE_PATTERN = r'\|\s*([A-Z]{2})\s*$'
+
+# STATE values meaning "no state" (besides NULL)
+STATE_SENTINELS = ['nan', 'nu', '<NA>', '  ']
+
+def strip_categories(values: pd.Series) -> pd.Series:
+    """
+    Strips the leading/trailing whitespace of a categorical Series of strings. Only the categories are stripped
+    (one string operation per distinct value); categories that become equal are merged.
+    """
+    return map_categories(values, lambda categories: categories.astype(str).str.strip())
+
+class StateNormalizer:
+    """
+    Normalizes the 'STATE' column of the CSV snapshots, inferring the missing states from 'location'.
+
+    The work is done on categoricals: the state codes are parsed once against a precompiled lookup of the valid
+    codes, 'location' is stripped and matched against LOCATION_STATE_PATTERN once per distinct value, and the
+    inferred codes are only looked up for the rows whose state is missing.
+    """
+
+    def __init__(self, valid_states: list = None, location_pattern: str = LOCATION_STATE_PATTERN):
+        """
+        Initialize parameters.
+
+        Args:
+            valid_states (list): The valid state codes (defaults to US_STATE_CODES).
+            location_pattern (str): Regex capturing the state code of a (stripped) location.
+        """
+        self.state_dtype = STATE_DTYPE if valid_states is None else pd.CategoricalDtype(valid_states)
+        self.location_pattern = location_pattern
+
+    def infer_location_states(self, location: pd.Series) -> np.ndarray:
+        """
+        The state code of every category of a stripped, categorical 'location', as codes of `state_dtype`
+        (-1 if the location does not end with a valid state code).
+        """
+        extracted = location.cat.categories.astype(str).str.extract(self.location_pattern, expand=False)
+        return pd.Categorical(extracted, dtype=self.state_dtype).codes
+
+    def normalize(self, state: pd.Series, location: pd.Series) -> tuple[pd.Series, pd.Series]:
+        """
+        Normalizes the states and locations of the CSV snapshots.
+
+        - 'location' is stripped.
+        - A missing 'STATE' (NULL, 'nan', 'nu', '<NA>' or blank) is replaced with the valid state code at the end of
+          'location' ('Seattle | WA' -> 'WA'), or NULL.
+        - Other 'STATE' values are kept. Values that are not valid codes are kept too (as extra categories), and
+          are reported in a warning.
+
+        Args:
+            state (pd.Series): The 'STATE' column.
+            location (pd.Series): The 'location' column (same index).
+
+        Returns:
+            tuple: The normalized (state, location), as categorical Series.
+        """
+        location = strip_categories(to_categorical(location))
+        state = to_categorical(state)
+        state = state.cat.remove_categories([value for value in STATE_SENTINELS if value in state.cat.categories])
+
+        # Valid codes first (so the inferred codes are valid output codes), then any unexpected value
+        # (the categories of a categorical input may include values of rows filtered out since)
+        unexpected_states = state.cat.remove_unused_categories().cat.categories.difference(self.state_dtype.categories)
+        if len(unexpected_states) > 0:
+            logging.warning(f"Unexpected STATE values kept as they are: {unexpected_states.tolist()[:20]}")
+        state = state.cat.set_categories(self.state_dtype.categories.append(unexpected_states))
+
+        # Only the rows with a missing state and a location are looked up
+        codes = state.cat.codes.to_numpy().copy()
+        location_codes = location.cat.codes.to_numpy()
+        repair_positions = np.flatnonzero((codes < 0) & (location_codes >= 0))
+        if len(repair_positions) > 0:
+            codes[repair_positions] = self.infer_location_states(location)[location_codes[repair_positions]]
+
+        state = pd.Series(pd.Categorical.from_codes(codes, dtype=state.dtype), index=state.index, name=state.name)
+        return state, location
@@ -0,0 +1,319 @@
+# synthetic_data.py
+
+import logging
+import os
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+# Header variants of the SFTP CSV files, in the order they appear in the real extracts (see `get_csv_layout`)
+CSV_COLUMNS_ORIGINAL = ['ENTRYDATE', 'LEADNUMBER', 'email_hash', 'phone_hash', 'CITY', 'STATE', 'ZIP', 'Appt Date',
+                        'Set', 'Demo', 'Dispo', 'Job Status']
+CSV_COLUMNS_SWAPPED = ['ENTRYDATE', 'LEADNUMBER', 'email_hash', 'phone_hash', 'STATE', 'CITY', 'ZIP', 'Appt Date',
+                       'Demo', 'Set', 'Dispo', 'Job Status']
+CSV_COLUMNS_CITY_NAME = ['ENTRYDATE', 'LEADNUMBER', 'email_hash', 'phone_hash', 'STATE', 'ZIP', 'Appt Date', 'Demo',
+                         'Set', 'Dispo', 'Job Status', 'CityName']
+CSV_COLUMNS_LOCATION = CSV_COLUMNS_CITY_NAME + ['location']
+
+# Number of files of the real extracts: file i of a synthetic dataset looks like file ((i - 1) % 22) + 1
+REAL_CSV_FILES = 22
+
+# Share of the leads showing each data quirk (measured on the real extracts, except the date formats, which are
+# all MM/DD/YYYY in the real files: a few other formats are mixed in to exercise the slow parsing paths)
+QUIRK_RATES = {
+    'nu': 0.001,               # STATE 'nu', ZIP '0', no city and location ' | nu'
+    'blank_state': 0.003,      # STATE '  '
+    'blank_zip': 0.0035,       # ZIP ''
+    'short_zip': 0.0005,       # ZIP '9831' (4 digits)
+    'padded_city': 0.35,       # CITY padded with trailing spaces to 28 characters
+    'blank_city': 0.002,       # CITY ''
+    'entry_date_dmy': 0.01,    # ENTRYDATE 'DD-MM-YYYY'
+    'entry_date_iso': 0.005,   # ENTRYDATE 'YYYY-MM-DD' (only parsed by the row-by-row fallback)
+    'entry_date_bad': 0.001,   # ENTRYDATE '13/45/2023' (invalid)
+    'appt_date': 0.22,         # Appt Date set ('MM/DD/YYYY  h:mmPM'), empty otherwise
+    'appt_date_nu': 0.0005,    # Appt Date 'nu' (the row is dropped by the cleaning)
+    'job_status': 0.035,       # Job Status set, empty otherwise
+    'set': 0.25,               # Set = 1
+    'demo': 0.12,              # Demo = 1 (or True)
+}
+
+# (city, state) pairs of the real extracts
+CITIES = [
+    ('Bremerton', 'WA'), ('Bellevue', 'WA'), ('Seattle', 'WA'), ('Tacoma', 'WA'), ('Spokane', 'WA'),
+    ('Everett', 'WA'), ('Kent', 'WA'), ('Olympia', 'WA'), ('Surprise', 'AZ'), ('Phoenix', 'AZ'), ('Mesa', 'AZ'),
+    ('Chandler', 'AZ'), ('Glendale', 'AZ'), ('Scottsdale', 'AZ'), ('Peoria', 'AZ'), ('Tucson', 'AZ'),
+    ('Las Vegas', 'NV'), ('Henderson', 'NV'), ('North Las Vegas', 'NV'), ('Reno', 'NV'), ('Sparks', 'NV'),
+    ('Portland', 'OR'), ('Salem', 'OR'), ('Beaverton', 'OR'), ('Gresham', 'OR'), ('Hillsboro', 'OR'),
+    ('Boise', 'ID'), ('Meridian', 'ID'), ('Nampa', 'ID'), ('Chicago', 'IL'),
+]
+CITY_WEIGHTS = np.array([8, 6, 6, 5, 3, 3, 3, 2, 8, 8, 6, 5, 5, 4, 3, 3, 12, 6, 4, 3, 2, 6, 3, 2, 2, 2, 1, 0.5, 0.5, 0.1])
+ZIP_PREFIXES = {'WA': 98, 'AZ': 85, 'NV': 89, 'OR': 97, 'ID': 83, 'IL': 60}
+
+DISPOS = ['Data', 'DQ-Wrong Number', 'DNC', 'DQ - R/P/C', 'DNS-P', 'DNS-Pro', 'Sale', 'DQ-Out of Area',
+          'DQ-Build a Home', 'DQ Bath - Condo', 'CXL-BT', 'DQ-Bought Comp', 'DQ-Product Only', 'DQ - Duplicate',
+          'DQ - ROBOCALL', 'DQ - Other']
+DISPO_WEIGHTS = np.array([1512, 399, 259, 199, 151, 144, 132, 112, 80, 80, 72, 69, 64, 60, 59, 50])
+JOB_STATUSES = ['Completed', 'Scheduled', 'Cancel In Rescission', 'Credit Decline', 'Ready to Schedule', 'New',
+                'Materials Ordered']
+JOB_STATUS_WEIGHTS = np.array([60, 13, 12, 11, 11, 6, 5])
+
+# Share of the CSV leads found in the Parquet leads, and how they match (email_hash and/or phone_hash)
+PARQUET_MATCH_RATE = 0.85
+PARQUET_MATCH_KINDS = {'both': 0.8, 'email': 0.1, 'phone': 0.1}
+PARQUET_EXTRA_RATE = 0.05       # Parquet leads without any CSV lead
+PARQUET_DUPLICATE_RATE = 0.005  # Duplicated Parquet rows (dropped by the cleaning)
+
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+def get_csv_layout(file_index: int) -> dict:
+    """
+    Describes the format of a synthetic CSV file, following the real extracts: the 22 files are reproduced in a cycle.
+
+    - Files 1-8 have the original header, 9-10 swap STATE/CITY and Set/Demo, 11-12 move the city to a 'CityName'
+      column and 13-22 add a 'location' column ('City | ST').
+    - Files 6-22 have a '-----' row right after the header.
+    - Files 11-20 write Demo as True/False instead of 0/1.
+    - Files 21-22 have an empty STATE column (the state can only be inferred from 'location').
+
+    Args:
+        file_index (int): The index of the file (data_1.csv -> 1).
+
+    Returns:
+        dict: 'columns' (the header), 'separator_row', 'demo_as_bool' and 'blank_state' (booleans).
+    """
+    position = (file_index - 1) % REAL_CSV_FILES + 1
+    if position <= 8:
+        columns = CSV_COLUMNS_ORIGINAL
+    elif position <= 10:
+        columns = CSV_COLUMNS_SWAPPED
+    elif position <= 12:
+        columns = CSV_COLUMNS_CITY_NAME
+    else:
+        columns = CSV_COLUMNS_LOCATION
+    return {
+        'columns': columns,
+        'separator_row': position >= 6,
+        'demo_as_bool': 11 <= position <= 20,
+        'blank_state': position >= 21,
+    }
+
+def random_hashes(rng: np.random.Generator, size: int, num_bytes: int = 20) -> np.ndarray:
+    """Random lowercase hex digests (40 characters for 20 bytes, like the SHA-1 hashes of the extracts)."""
+    raw = rng.integers(0, 256, size=(size, num_bytes), dtype=np.uint8)
+    hex_chars = np.empty((size, num_bytes * 2), dtype=np.uint8)
+    hex_chars[:, 0::2] = HEX_DIGITS[raw >> 4]
+    hex_chars[:, 1::2] = HEX_DIGITS[raw & 0x0F]
+    return hex_chars.view(f'S{num_bytes * 2}').ravel().astype(str).astype(object)
+
+def random_uuids(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Random UUID strings ('xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx')."""
+    digests = pd.Series(random_hashes(rng, size, num_bytes=16))
+    return (digests.str[:8] + '-' + digests.str[8:12] + '-' + digests.str[12:16] + '-' + digests.str[16:20] + '-'
+            + digests.str[20:]).to_numpy(dtype=object)
+
+def format_dates(days: np.ndarray, start: date, date_format: str) -> np.ndarray:
+    """Formats day offsets from `start`, formatting each distinct day once (there are only a few hundred)."""
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    formatted = np.array([(start + timedelta(days=int(day))).strftime(date_format) for day in unique_days], dtype=object)
+    return formatted[inverse]
+
+def choose(rng: np.random.Generator, values: list, weights: np.ndarray, size: int) -> np.ndarray:
+    """Weighted random choice of `size` values."""
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+def generate_leads(num_leads: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates a pool of CSV leads, with the data quirks of the real extracts (see QUIRK_RATES).
+
+    Every daily snapshot is a sample of this pool (see `generate_csv_snapshot`), so a lead keeps the same values
+    across files, like in the real extracts.
+
+    Args:
+        num_leads (int): The number of leads.
+        seed (int): The seed of the random generator: the same seed always gives the same leads.
+
+    Returns:
+        pd.DataFrame: The leads, with the columns of CSV_COLUMNS_LOCATION (all strings, '' for missing values).
+    """
+    rng = np.random.default_rng(seed)
+    rates = QUIRK_RATES
+
+    def sample(rate: float) -> np.ndarray:
+        return rng.random(num_leads) < rate
+
+    # ENTRYDATE: MM/DD/YYYY, with a few DD-MM-YYYY, YYYY-MM-DD and invalid dates
+    entry_days = rng.integers(0, 240, size=num_leads)
+    start = date(2022, 9, 1)
+    entry_date = format_dates(entry_days, start, '%m/%d/%Y')
+    for quirk, date_format in [('entry_date_dmy', '%d-%m-%Y'), ('entry_date_iso', '%Y-%m-%d')]:
+        mask = sample(rates[quirk])
+        entry_date[mask] = format_dates(entry_days[mask], start, date_format)
+    entry_date[sample(rates['entry_date_bad'])] = '13/45/2023'
+
+    # Appt Date: 'MM/DD/YYYY  h:mmPM' (the hour is padded with a space), a few days after the entry date
+    appt_date = np.full(num_leads, '', dtype=object)
+    has_appt = sample(rates['appt_date'])
+    num_appts = int(has_appt.sum())
+    appt_days = format_dates(entry_days[has_appt] + rng.integers(0, 30, size=num_appts), start, '%m/%d/%Y')
+    hours = rng.integers(8, 19, size=num_appts)
+    appt_times = (pd.Series(((hours - 1) % 12 + 1).astype(str)).str.rjust(2) + ':'
+                  + np.where(rng.random(num_appts) < 0.5, '00', '30') + np.where(hours < 12, 'AM', 'PM'))
+    appt_date[has_appt] = (pd.Series(appt_days) + ' ' + appt_times).to_numpy(dtype=object)
+    appt_date[sample(rates['appt_date_nu'])] = 'nu'
+
+    # CITY / STATE / ZIP / location
+    city_codes = rng.choice(len(CITIES), size=num_leads, p=CITY_WEIGHTS / CITY_WEIGHTS.sum())
+    cities = np.array([city for city, _ in CITIES], dtype=object)[city_codes]
+    states = np.array([state for _, state in CITIES], dtype=object)[city_codes]
+    zip_prefixes = np.array([ZIP_PREFIXES[state] for _, state in CITIES])[city_codes]
+    zips = pd.Series(zip_prefixes * 1000 + rng.integers(0, 1000, size=num_leads)).astype(str).to_numpy(dtype=object)
+
+    padded = sample(rates['padded_city'])
+    cities[padded] = pd.Series(cities[padded], dtype=object).str.ljust(28).to_numpy(dtype=object)
+    location = (pd.Series(cities).str.ljust(29).where(padded, pd.Series(cities) + ' ') + '| '
+                + pd.Series(states)).to_numpy(dtype=object)
+    cities[sample(rates['blank_city'])] = ''
+    states[sample(rates['blank_state'])] = '  '
+    zips[sample(rates['blank_zip'])] = ''
+    short_zip = sample(rates['short_zip'])
+    zips[short_zip] = pd.Series(zips[short_zip], dtype=object).str[:4].to_numpy(dtype=object)
+
+    nu = sample(rates['nu'])
+    states[nu], zips[nu], cities[nu], location[nu], appt_date[nu] = 'nu', '0', '', ' | nu', ''
+
+    # Statuses
+    set_flag = sample(rates['set'])
+    demo_flag = set_flag & sample(rates['demo'] / rates['set'])
+    job_status = np.full(num_leads, '', dtype=object)
+    has_job_status = sample(rates['job_status'])
+    job_status[has_job_status] = choose(rng, JOB_STATUSES, JOB_STATUS_WEIGHTS, int(has_job_status.sum()))
+
+    leads_df = pd.DataFrame({
+        'ENTRYDATE': entry_date,
+        'LEADNUMBER': (200000 + rng.permutation(num_leads * 2)[:num_leads]).astype(str),
+        'email_hash': random_hashes(rng, num_leads),
+        'phone_hash': random_hashes(rng, num_leads),
+        'STATE': states,
+        'ZIP': zips,
+        'Appt Date': appt_date,
+        'Demo': demo_flag.astype(int).astype(str),
+        'Set': set_flag.astype(int).astype(str),
+        'Dispo': choose(rng, DISPOS, DISPO_WEIGHTS, num_leads),
+        'Job Status': job_status,
+        'CityName': cities,
+        'location': location,
+    })
+    leads_df['CITY'] = leads_df['CityName']
+    return leads_df
+
+def generate_csv_snapshot(leads_df: pd.DataFrame, file_index: int, num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates one daily CSV snapshot: a sample of the leads, in the format of the file (see `get_csv_layout`).
+
+    Args:
+        leads_df (pd.DataFrame): The pool of leads (see `generate_leads`).
+        file_index (int): The index of the file (data_1.csv -> 1).
+        num_rows (int): The number of leads in the snapshot (at most the number of leads in the pool).
+        seed (int): The seed of the random generator (combined with the file index).
+
+    Returns:
+        pd.DataFrame: The rows of the file, as strings, with the header of the file (the '-----' row included).
+    """
+    rng = np.random.default_rng([seed, file_index])
+    layout = get_csv_layout(file_index)
+
+    positions = np.sort(rng.choice(len(leads_df), size=min(num_rows, len(leads_df)), replace=False))
+    snapshot_df = leads_df.take(positions)[layout['columns']].reset_index(drop=True)
+    if layout['demo_as_bool']:
+        snapshot_df['Demo'] = np.where(snapshot_df['Demo'] == '1', 'True', 'False')
+    if layout['blank_state']:
+        snapshot_df['STATE'] = ''
+    if layout['separator_row']:
+        separator_df = pd.DataFrame([['-----'] * len(layout['columns'])], columns=layout['columns'])
+        snapshot_df = pd.concat([separator_df, snapshot_df], ignore_index=True)
+    return snapshot_df
+
+def generate_parquet_leads(leads_df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates the Parquet leads matching the CSV leads (see PARQUET_MATCH_RATE and PARQUET_MATCH_KINDS), plus
+    leads without any CSV lead and duplicated rows.
+
+    Args:
+        leads_df (pd.DataFrame): The pool of CSV leads (see `generate_leads`).
+        seed (int): The seed of the random generator.
+
+    Returns:
+        pd.DataFrame: The 'lead_UUID', 'phone_hash' and 'email_hash' columns, like leads.parquet.
+    """
+    rng = np.random.default_rng([seed, 0])
+    matched = leads_df[rng.random(len(leads_df)) < PARQUET_MATCH_RATE]
+    num_matched = len(matched)
+    email_hash = matched['email_hash'].to_numpy(dtype=object).copy()
+    phone_hash = matched['phone_hash'].to_numpy(dtype=object).copy()
+
+    kinds = rng.choice(list(PARQUET_MATCH_KINDS), size=num_matched, p=list(PARQUET_MATCH_KINDS.values()))
+    phone_hash[kinds == 'email'] = random_hashes(rng, int((kinds == 'email').sum()))
+    email_hash[kinds == 'phone'] = random_hashes(rng, int((kinds == 'phone').sum()))
+
+    num_extra = int(len(leads_df) * PARQUET_EXTRA_RATE)
+    parquet_df = pd.DataFrame({
+        'lead_UUID': random_uuids(rng, num_matched + num_extra),
+        'phone_hash': np.concatenate([phone_hash, random_hashes(rng, num_extra)]),
+        'email_hash': np.concatenate([email_hash, random_hashes(rng, num_extra)]),
+    })
+    duplicates = rng.choice(len(parquet_df), size=int(len(parquet_df) * PARQUET_DUPLICATE_RATE), replace=False)
+    parquet_df = pd.concat([parquet_df, parquet_df.take(duplicates)], ignore_index=True)
+    return parquet_df.take(rng.permutation(len(parquet_df))).reset_index(drop=True)
+
+def write_synthetic_dataset(output_dir: str, num_rows: int, num_files: int = REAL_CSV_FILES, seed: int = 0,
+                            sftp_prefix: str = 'SFTP/data_', parquet_key: str = 'parquet/leads.parquet',
+                            start_date: str = '2024-10-01') -> dict:
+    """
+    Writes a synthetic copy of the S3 sources: `num_files` daily CSV snapshots and the Parquet leads, under the same
+    keys as in the bucket (e.g. `<output_dir>/SFTP/data_1.csv`), so the folder can also be uploaded to a bucket.
+
+    The snapshots are generated and written one at a time, so the memory used is bounded by the size of one file
+    (plus the pool of leads, about 1.15 times one file), whatever the total number of rows.
+
+    Args:
+        output_dir (str): The folder to write to.
+        num_rows (int): The total number of CSV rows, over all files.
+        num_files (int): The number of daily CSV files.
+        seed (int): The seed of the random generator: the same arguments always give the same files.
+        sftp_prefix (str): The key prefix of the CSV files (like S3_SFTP_FILES_PREFIX).
+        parquet_key (str): The key of the Parquet file (like S3_PARQUET_FILE).
+        start_date (str): The partition date of the first file ('YYYY-MM-DD').
+
+    Returns:
+        dict: 'csv_partitions' ((file key, partition date) pairs, see `DataExtractor.extract_all_csv`),
+        'parquet_key', 'csv_rows' and 'parquet_rows'.
+    """
+    rows_per_file = -(-num_rows // num_files)
+    leads_df = generate_leads(int(rows_per_file * 1.15) + 1, seed=seed)
+
+    csv_partitions, csv_rows = [], 0
+    for file_index in range(1, num_files + 1):
+        file_rows = min(rows_per_file, num_rows - csv_rows)
+        if file_rows <= 0:
+            break
+        file_key = f"{sftp_prefix}{file_index}.csv"
+        path = os.path.join(output_dir, file_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        generate_csv_snapshot(leads_df, file_index, file_rows, seed=seed).to_csv(path, index=False)
+        csv_rows += file_rows
+        partition_date = (pd.Timestamp(start_date) + pd.Timedelta(days=file_index - 1)).strftime('%Y-%m-%d')
+        csv_partitions.append((file_key, partition_date))
+        logging.info(f"Wrote {file_rows} rows to {path}")
+
+    parquet_df = generate_parquet_leads(leads_df, seed=seed)
+    path = os.path.join(output_dir, parquet_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    parquet_df.to_parquet(path, index=False)
+    logging.info(f"Wrote {len(parquet_df)} rows to {path}")
+
+    return {
+        'csv_partitions': csv_partitions,
+        'parquet_key': parquet_key,
+        'csv_rows': csv_rows,
+        'parquet_rows': len(parquet_df),
+    }
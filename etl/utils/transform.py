@@ -6,46 +6,297 @@ print(sys.path)
 
 # Importing Modules
 import logging
+import multiprocessing
+from typing import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import re
-from sqlalchemy import create_engine
+import pyarrow as pa
 from extract import DataExtractor
 # from step2_load_to_postgres import DataLoader # (Check comment on the last part: if __name__ == "__main__":)
-from utils_connection import get_s3_parquet_file_key, get_connection_uri
+from utils_connection import get_s3_parquet_file_key, get_connection_uri, get_db_engine
+from utils_checks_db import get_silver_table_data_types, get_pandas_dtypes
+from instrumentation import metrics, instrumented
+from postgres_reader import DEFAULT_READ_CHUNKSIZE, iter_table_chunks, read_table
+from state_normalization import StateNormalizer
+from diagnostics import DataDiagnostics
+from categoricals import (CSV_CATEGORICAL_COLUMNS, is_categorical, to_categorical, map_categories, encode_categoricals,
+                          to_string_columns, concat_frames)
+
+# Date formats observed in the CSV snapshots, as (regex the whole value must match, strptime format) pairs.
+# Values matching a pattern are parsed column-wide with `pd.to_datetime(format=...)`; anything else
+# (other formats, or values the format rejects) falls back to the row-by-row parser, so the output is unchanged.
+ENTRY_DATE_FORMATS = [
+    (r"\d{2}/\d{2}/\d{4}", '%m/%d/%Y'),  # MM/DD/YYYY
+    (r"\d{2}-\d{2}-\d{4}", '%d-%m-%Y'),  # DD-MM-YYYY (parsed with dayfirst=True by the row-by-row parser)
+]
+APPT_DATE_FORMATS = [
+    (r"\d{2}/\d{2}/\d{4}", '%m/%d/%Y'),  # MM/DD/YYYY
+    (r"\d{1,2}/\d{1,2}/\d{4}\s+\d{1,2}:\d{2}[AP]M", '%m/%d/%Y %I:%M%p'),  # MM/DD/YYYY  h:mmAM
+]
+
+# Values treated as NULL by the general cleaning (besides whitespace-only strings)
+NULL_SENTINELS = ['nan', 'None', '<NA>', 'nu']
+
+def clean_zip_codes(zip_codes: pd.Series) -> pd.Series:
+    """
+    Vectorized ZIP cleaning: valid 5-digit ZIP codes are converted to integers (dropping leading '0'),
+    anything else is set to NULL.
+
+    Args:
+        zip_codes (pd.Series): The ZIP code strings.
+
+    Returns:
+        pd.Series: The cleaned ZIP codes, as a nullable integer (Int64) column.
+    """
+    valid_mask = zip_codes.str.fullmatch(r"\d{5}", na=False).astype(bool)
+    return pd.to_numeric(zip_codes.where(valid_mask), errors='coerce').astype('Int64')
+
+def cast_to_dtypes(df: pd.DataFrame, dtypes: dict, keep_categoricals: bool = False) -> pd.DataFrame:
+    """
+    Cast DataFrame columns to pandas nullable dtypes (see `get_pandas_dtypes`). Values that cannot be converted become NULL.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to cast.
+        dtypes (dict): Column names mapped to pandas dtypes. Columns not in the dictionary are kept as they are.
+        keep_categoricals (bool): Keep the categorical columns cast to a string dtype as categoricals (only their
+            categories are cast). Numeric and date columns are fixed-width, so they are decoded anyway.
+
+    Returns:
+        pd.DataFrame: The DataFrame with typed columns.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        dtype = dtypes.get(column)
+        if dtype is None:
+            columns[column] = values
+        elif keep_categoricals and is_categorical(values) and pd.api.types.is_string_dtype(pd.api.types.pandas_dtype(dtype)):
+            columns[column] = map_categories(values, lambda categories: categories.astype(dtype))
+        elif dtype in ('Int64', 'Float64'):
+            columns[column] = pd.to_numeric(values.astype(object), errors='coerce').astype(dtype)
+        elif dtype.startswith('datetime64'):
+            columns[column] = pd.to_datetime(values, errors='coerce').astype(dtype)  # A categorical input gives a categorical
+        else:
+            columns[column] = values.astype(dtype)
+    return pd.DataFrame(columns, index=df.index)
+
+def normalize_entry_date(date_str):
+    """Convert a single 'ENTRYDATE' value to 'YYYY-MM-DD' (pd.NaT if invalid)."""
+    try:
+        # Convert to datetime in YYYY-MM-DD format
+        if re.match(r"\d{2}-\d{2}-\d{4}", date_str):  # MM-DD-YYYY or DD-MM-YYYY format
+            date = pd.to_datetime(date_str, dayfirst=True, errors='coerce')
+        else:
+            date = pd.to_datetime(date_str, errors='coerce')  # Assuming YYYY-MM-DD or invalid formats
+        
+        # Return date in YYYY-MM-DD format
+        return date.strftime('%Y-%m-%d') if pd.notnull(date) else pd.NaT
+    except Exception:
+        return pd.NaT  # Return Not a Time for invalid dates
+
+def normalize_appt_date(date_str):
+    """Convert a single 'APPT_DATE' value to 'YYYY-MM-DD' (pd.NA if invalid)."""
+    try:
+        date = pd.to_datetime(date_str, errors='coerce')  # Convert to datetime
+        # Return date as a string in YYYY-MM-DD format
+        return date.strftime('%Y-%m-%d') if pd.notnull(date) else pd.NA  # Change None to pd.NA
+    except Exception:
+        return pd.NA  # Return pd.NA for invalid dates
+
+def normalize_dates(series: pd.Series, date_formats: list, fallback, missing_value) -> pd.Series:
+    """
+    Vectorized date normalization to 'YYYY-MM-DD' strings.
+
+    Each (regex, format) pair is handled with one whole-column `pd.to_datetime(format=...)` pass over the values
+    matching the regex. Missing values get `missing_value`, and the remaining values (unknown formats or values
+    rejected by the format) go through the row-by-row `fallback` function, so the result is the same as
+    `series.apply(fallback)`.
+
+    Args:
+        series (pd.Series): The date strings to normalize.
+        date_formats (list): (regex, strptime format) pairs, e.g. ENTRY_DATE_FORMATS.
+        fallback (callable): The row-by-row parser, e.g. normalize_entry_date.
+        missing_value: The value returned by `fallback` for missing or invalid dates (pd.NaT or pd.NA).
+
+    Returns:
+        pd.Series: The normalized dates (object dtype), with the same index as `series`.
+    """
+    values = series.to_numpy(dtype=object)
+    result = np.full(len(values), missing_value, dtype=object)
+    pending = ~pd.isna(series).to_numpy()  # Missing values are already handled (the fallback returns missing_value)
+
+    strings = series.astype(object).astype(str)
+    for pattern, date_format in date_formats:
+        mask = pending & strings.str.fullmatch(pattern).to_numpy(dtype=bool)
+        if not mask.any():
+            continue
+        parsed = pd.to_datetime(strings[mask], format=date_format, errors='coerce')
+        parsed_ok = parsed.notna().to_numpy()
+        positions = np.flatnonzero(mask)[parsed_ok]
+        result[positions] = parsed[parsed_ok].dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+        pending[positions] = False
+
+    # Row-by-row fallback for anything the vectorized passes could not parse
+    for position in np.flatnonzero(pending):
+        result[position] = fallback(values[position])
+
+    return pd.Series(result, index=series.index, name=series.name, dtype=object)
+
+def dataframe_to_ipc(df: pd.DataFrame) -> bytes:
+    """Serializes a DataFrame (with its index and pandas dtypes) to an Arrow IPC stream, to hand it to another process."""
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def dataframe_from_ipc(ipc_bytes: bytes, dtypes: dict = None) -> pd.DataFrame:
+    """
+    Deserializes a DataFrame written by `dataframe_to_ipc`.
+
+    Args:
+        ipc_bytes (bytes): The Arrow IPC stream.
+        dtypes (dict): The pandas dtypes to restore (optional). Arrow keeps most pandas dtypes, but e.g. 'string[pyarrow]'
+            columns come back as 'string[python]'. Categorical columns travel as Arrow dictionaries and come back as
+            categoricals: they are kept as they are.
+    """
+    df = pa.ipc.open_stream(ipc_bytes).read_all().to_pandas()
+    if not dtypes:
+        return df
+    return df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns and not is_categorical(df[column])})
+
+# DataTransformer of a worker process of `DataTransformer.clean_csv_parallel` (created on its first shard)
+_shard_transformer = None
+
+def clean_csv_shard(ipc_bytes: bytes, dtypes: dict, typed: bool = False, categorical: bool = False) -> bytes:
+    """
+    Runs `DataTransformer.clean_csv` on one shard of Bronze CSV data, in a worker process.
+
+    Args:
+        ipc_bytes (bytes): The shard, as written by `dataframe_to_ipc`.
+        dtypes (dict): The pandas dtypes of the shard.
+        typed (bool): If True, return typed columns instead of strings.
+        categorical (bool): If True, return the low-cardinality columns as categoricals.
+
+    Returns:
+        bytes: The cleaned shard, as written by `dataframe_to_ipc`.
+    """
+    global _shard_transformer
+    if _shard_transformer is None:
+        _shard_transformer = DataTransformer()
+    return dataframe_to_ipc(_shard_transformer.clean_csv(dataframe_from_ipc(ipc_bytes, dtypes), typed=typed,
+                                                         categorical=categorical))
 
 class DataTransformer:
-    def __init__(self):
-        """Initialize the DataTransform class."""
-        self.engine = create_engine(get_connection_uri())
+    def __init__(self, engine=None, diagnostics: DataDiagnostics = None):
+        """
+        Initialize the DataTransform class.
+
+        Args:
+            engine: An existing SQLAlchemy engine to reuse (optional, e.g. the one shared by the pipeline runner).
+            diagnostics (DataDiagnostics): Profiles logged at the cleaning steps (defaults to the ETL_DIAGNOSTICS_*
+                settings: disabled unless ETL_DIAGNOSTICS_ENABLED=true).
+        """
+        self.engine = engine or get_db_engine(get_connection_uri())
+        self.state_normalizer = StateNormalizer()
+        self.diagnostics = diagnostics or DataDiagnostics()
 
-    def get_data_from_postgres_to_pd(self, schema_name: str, table_name: str) -> pd.DataFrame:
+    @instrumented('transform.read_postgres')
+    def get_data_from_postgres_to_pd(self, schema_name: str, table_name: str, columns: list = None,
+                                     partition_dates: list = None) -> pd.DataFrame:
         """
         Loads data from a PostgreSQL table in a given schema into a Pandas DataFrame.
 
+        The rows are fetched through a server-side cursor (see `postgres_reader.read_table`), so they are not
+        buffered by psycopg2 on top of the DataFrame.
+
         Args:
             schema_name (str): The name of the schema.
             table_name (str): The name of the table to load.
+            columns (list): The columns to load (all by default).
+            partition_dates (list): Only load the rows of these '_partition_date' values (all by default).
 
         Returns:
             pd.DataFrame: Data loaded from the specified schema and table.
         """
-        query = f"SELECT * FROM {schema_name}.{table_name}"
         try:
-            df = pd.read_sql(query, self.engine)
+            df = read_table(self.engine, schema_name, table_name, columns=columns, partition_dates=partition_dates)
             print(f"Data loaded successfully from {schema_name}.{table_name}")
             return df
         except Exception as e:
             print(f"Error loading data from {schema_name}.{table_name}: {e}")
             return None
 
-    def clean_csv(self, df: pd.DataFrame) -> pd.DataFrame:
+    def iter_data_from_postgres(self, schema_name: str, table_name: str, chunksize: int = DEFAULT_READ_CHUNKSIZE,
+                                columns: list = None, partition_dates: list = None) -> Iterator[pd.DataFrame]:
+        """
+        Streams a PostgreSQL table as DataFrame chunks of `chunksize` rows (see `postgres_reader.iter_table_chunks`),
+        e.g. to clean and load a large Bronze table chunk by chunk with bounded memory.
+
+        Args:
+            schema_name (str): The name of the schema.
+            table_name (str): The name of the table to read.
+            chunksize (int): Number of rows per chunk.
+            columns (list): The columns to read (all by default).
+            partition_dates (list): Only read the rows of these '_partition_date' values (all by default).
+
+        Yields:
+            pd.DataFrame: The chunks of the table.
+        """
+        return iter_table_chunks(self.engine, schema_name, table_name, chunksize=chunksize, columns=columns,
+                                 partition_dates=partition_dates)
+
+    def pre_clean_csv(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        General cleaning of the CSV data, in a single vectorized pass per column.
+
+        - Drops rows containing "-----" in any column, and rows with 'APPT_DATE' equal to "nu".
+        - Replaces null sentinels ('nan', 'None', '<NA>', 'nu' and whitespace-only values) with NULL (pd.NA).
+
+        Each string column is scanned once and the DataFrame is rebuilt once, instead of running several
+        full-frame `replace` / `isin` passes that each copy the whole frame. For categorical columns, only the
+        categories are checked, and the null sentinels are removed from them.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame (Bronze CSV data).
+
+        Returns:
+            pd.DataFrame: The DataFrame with invalid rows dropped and null sentinels replaced.
+        """
+        keep_mask = np.ones(len(df), dtype=bool)
+        if 'APPT_DATE' in df.columns:
+            keep_mask &= (df['APPT_DATE'] != "nu").fillna(True).to_numpy(dtype=bool)
+
+        columns = {}
+        for column in df.columns:
+            values = df[column]
+            if is_categorical(values):
+                keep_mask &= (values != "-----").to_numpy(dtype=bool)
+                categories = pd.Series(values.cat.categories)
+                null_categories = categories.isin(NULL_SENTINELS + ['']) | categories.astype(str).str.isspace()
+                columns[column] = values.cat.remove_categories(categories[null_categories.to_numpy(dtype=bool)].tolist())
+                continue
+
+            if not pd.api.types.is_string_dtype(values.dtype):
+                columns[column] = values
+                continue
+
+            keep_mask &= (values != "-----").fillna(True).to_numpy(dtype=bool)
+            null_mask = values.isin(NULL_SENTINELS + ['']) | values.str.isspace().fillna(False).astype(bool)
+            columns[column] = values.where(~null_mask, pd.NA)
+
+        return pd.DataFrame(columns, index=df.index)[keep_mask]
+
+    @instrumented('transform.clean_csv')
+    def clean_csv(self, df: pd.DataFrame, typed: bool = False, categorical: bool = False) -> pd.DataFrame:
         """
         Cleans CSV data based on the outlined steps.
         
-        1) General cleaning:
-        - Drops rows containing "-----" in any column.
-        - Replaces 'nan' and 'None' values with NULL (represented by pd.NA).
+        1) General cleaning (see `pre_clean_csv`):
+        - Drops rows containing "-----" in any column, and rows with 'APPT_DATE' equal to "nu".
+        - Replaces null sentinels ('nan', 'None', '<NA>', 'nu' and whitespace-only values) with NULL (represented by pd.NA).
 
         2) Column-specific cleaning:
         ( 'Bronze' Column Name -> 'Silver' Column Name: xyz explanation )
@@ -53,155 +304,94 @@ class DataTransformer:
         - 'LEADNUMBER' -> 'lead_number': No cleaning performed.
         - 'email_hash': No cleaning performed.
         - 'phone_hash': No cleaning performed.
-        - 'CITY' -> 'city': No cleaning performed.
-        - 'STATE' -> 'state': Ensures valid 2-letter state codes. Invalid entries are replaced with NULL or inferred from location data.
+        - 'CITY' -> 'city': No cleaning performed (carried as a categorical).
+        - 'STATE' -> 'state': Missing entries are inferred from the valid state code ending 'location', or set to NULL (see `StateNormalizer`).
         - 'ZIP' -> 'zip': Drops leading '0'. Ensures valid 5-digit integers. Invalid entries are set to NULL.
         - 'APPT_DATE' -> 'appt_date': Converts to 'YYYY-MM-DD'. Rows with 'nu' are dropped, and invalid entries are set to NULL.
         - 'Set' -> 'set': No cleaning performed.
         - 'Demo' -> 'demo': Converts True/False values to '1/0' and stores them as strings.
         - 'Dispo' -> 'dispo': No cleaning performed.
         - 'JOB_STATUS' -> 'job_status': No cleaning performed.
-        - 'location': Cleans leading/trailing spaces. Extracts valid state codes if available.
+        - 'location': Cleans leading/trailing spaces (carried as a categorical). Extracts valid state codes if available.
         - '_extraction_date': No cleaning performed.
         - '_partition_date': No cleaning performed.
 
         3) Post-processing:
-        - After all transformations, all columns are converted to string type.
+        - After all transformations, all columns are converted to string type (categoricals are decoded first).
+        - In typed mode, columns are cast to the Silver data types instead (see `get_silver_table_data_types`),
+          using pandas nullable / Arrow-backed dtypes, and missing values stay NULL.
+        - In categorical mode, the low-cardinality columns (CSV_CATEGORICAL_COLUMNS) are carried as categoricals
+          from the start and returned as categoricals of strings (the values are the same once decoded, except
+          that a real NULL, which the untyped Bronze never holds, becomes '<NA>' instead of 'None', as with the SQL
+          Silver engine), as are 'city', 'state' and 'location'. In typed mode, only the columns of a string type
+          stay categorical.
+        - In diagnostics mode (see `DataDiagnostics`), '_partition_date' and 'STATE' are profiled along the way and a
+          preview of the rows is logged; otherwise no profile is computed.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame (Bronze CSV data, as strings or typed).
+            typed (bool): If True, return typed columns instead of strings.
+            categorical (bool): If True, return the low-cardinality columns as categoricals (decoded at load time).
 
         Returns:
             pd.DataFrame: The cleaned DataFrame with all transformations applied.
         """
         
         # 0) General Cleaning
-        # Drop rows with "-----" in any column
-        df = df[~df.isin(["-----"]).any(axis=1)]
-
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (General Cleaning):", df["_partition_date"].unique())
-        
-        # Replace 'nan' values with NULL (using pd.NA)
-        df = df.replace('nan', pd.NA)
+        if categorical:
+            df = encode_categoricals(df, CSV_CATEGORICAL_COLUMNS)
 
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (General Cleaning):", df["_partition_date"].unique())
+        # Drop rows with "-----" in any column (or 'APPT_DATE' equal to "nu") and replace null sentinels with NULL
+        with metrics.stage('transform.clean_csv.pre_clean', rows_in=len(df)) as stage_metrics:
+            df = self.pre_clean_csv(df)
+            stage_metrics.rows_out = len(df)
 
-        # Replace 'None' values with NULL (using pd.NA)
-        df = df.replace('None', pd.NA)
-
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (General Cleaning):", df["_partition_date"].unique())
+        self.diagnostics.values('clean_csv.pre_clean', df['_partition_date'])
 
         # 1) Clean 'ENTRYDATE' (convert to proper datetime format)
-        def normalize_entry_date(date_str):
-            try:
-                # Convert to datetime in YYYY-MM-DD format
-                if re.match(r"\d{2}-\d{2}-\d{4}", date_str):  # MM-DD-YYYY or DD-MM-YYYY format
-                    date = pd.to_datetime(date_str, dayfirst=True, errors='coerce')
-                else:
-                    date = pd.to_datetime(date_str, errors='coerce')  # Assuming YYYY-MM-DD or invalid formats
-                
-                # Return date in YYYY-MM-DD format
-                return date.strftime('%Y-%m-%d') if pd.notnull(date) else pd.NaT
-            except Exception:
-                return pd.NaT  # Return Not a Time for invalid dates
-
-        df.loc[:, 'ENTRYDATE'] = df['ENTRYDATE'].apply(normalize_entry_date)
-
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (ENTRYDATE):", df["_partition_date"].unique())
+        with metrics.stage('transform.clean_csv.entry_date', rows_in=len(df)) as stage_metrics:
+            df.loc[:, 'ENTRYDATE'] = normalize_dates(df['ENTRYDATE'], ENTRY_DATE_FORMATS, normalize_entry_date, pd.NaT)
+            stage_metrics.rows_out = len(df)
 
-        # 2) Clean 'APPT_DATE'
-        df = df[df['APPT_DATE'] != "nu"]  # Drop rows with 'APPT_DATE' equal to "nu"
+        self.diagnostics.values('clean_csv.entry_date', df['_partition_date'])
 
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (APPT_DATE - part 1):", df["_partition_date"].unique())
+        # 2) Clean 'APPT_DATE' (rows with 'APPT_DATE' equal to "nu" were dropped by the general cleaning)
+        with metrics.stage('transform.clean_csv.appt_date', rows_in=len(df)) as stage_metrics:
+            df['APPT_DATE'] = normalize_dates(df['APPT_DATE'], APPT_DATE_FORMATS, normalize_appt_date, pd.NA)
+            stage_metrics.rows_out = len(df)
 
-        def normalize_appt_date(date_str):
-            try:
-                date = pd.to_datetime(date_str, errors='coerce')  # Convert to datetime
-                # Return date as a string in YYYY-MM-DD format
-                return date.strftime('%Y-%m-%d') if pd.notnull(date) else pd.NA  # Change None to pd.NA
-            except Exception:
-                return pd.NA  # Return pd.NA for invalid dates
+        self.diagnostics.values('clean_csv.appt_date', df['_partition_date'])
 
-        df['APPT_DATE'] = df['APPT_DATE'].apply(normalize_appt_date)
+        # 3) Ensure 'STATE' column values are valid (inferred from 'location' when missing), as categoricals
+        with metrics.stage('transform.clean_csv.state', rows_in=len(df)) as stage_metrics:
+            self.diagnostics.values('clean_csv.state_before', df['STATE'])
 
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (APPT_DATE - part 2):", df["_partition_date"].unique())
+            df['STATE'], df['location'] = self.state_normalizer.normalize(df['STATE'], df['location'])
+            df['CITY'] = to_categorical(df['CITY'])
 
-        # 3) Ensure 'STATE' column values are valid
-        # Get unique STATE values and sort, while ignoring NaN values
-
-        # Debugging: Print unique values of 'STATE' before cleaning
-        print("Debugging (STATE before cleaning):", sorted(df["STATE"].dropna().unique()))
-        print("Debugging (STATE before cleaning with NA):", df["STATE"].unique())
-
-        # Create a mask for invalid STATE values ('nan', 'nu', '<NA>') and valid location values (not '<NA')
-        invalid_state_mask = df['STATE'].isin(['  ', 'nan', 'nu', '<NA>', pd.NA])
-        valid_location_mask = (df['location'] != '<NA>') & (df['location'].notna())
-
-        # Clean up location entries by stripping whitespace
-        df['location'] = df['location'].str.strip()
-
-        # Extract state abbreviation from the location using regex
-        df['location_abbr'] = df['location'].str.extract(r'\|\s*([A-Z]{2})\s*$')
-
-       # Debugging: Check the extracted abbreviations for the first few rows
-        print("Extracted Abbreviations from Location (first 5 rows):")
-        print(df[['location', 'location_abbr']].head())
-
-        # Create a mask for valid abbreviations
-        valid_abbr_mask = df['location_abbr'].notna() & df['location_abbr'].ne('')
-
-        # Replace invalid STATE values with the state abbreviation from the location_abbr column
-        df['STATE'] = np.where(invalid_state_mask & valid_location_mask & valid_abbr_mask, 
-                            df['location_abbr'], 
-                            df['STATE'])
-
-        # Debugging: Check the STATE column after replacement attempt
-        print("STATE after attempted replacement (first 5 rows):")
-        print(df[['STATE', 'location_abbr']].head())
-
-        # Replace any remaining invalid STATE values ('nan', 'nu', '<NA>', whitespace) with pd.NA
-        df['STATE'] = df['STATE'].replace(['nan', 'nu', '<NA>', '  '], pd.NA)
-
-        # Final debugging: Print unique values of 'STATE' after cleaning
-        print("Debugging (STATE after final cleaning):", sorted(df["STATE"].dropna().unique()))
-        print("Debugging (STATE after final cleaning with NA):", df["STATE"].unique())
-
-        # Drop the temporary 'location_abbr' column if you no longer need it
-        df.drop(columns='location_abbr', inplace=True)
-
-        # Final output for verification
-        print("Final DataFrame (first 5 rows):")
-        print(df.head())
-        
+            self.diagnostics.values('clean_csv.state_after', df['STATE'])
+            self.diagnostics.preview('clean_csv.state', df)
+            stage_metrics.rows_out = len(df)
 
         # 4) Clean 'ZIP' column
-        def clean_zip(zip_code):
-            try:
-                # Check if the zip code is a string of digits and has length 5
-                if not zip_code.isdigit() or len(zip_code) != 5:
-                    return pd.NA  # Return NULL for invalid ZIP codes
-                return int(zip_code)  # Convert valid ZIP codes to integers
-            except Exception:
-                return pd.NA  # Return NULL if any error occurs
-
-        df['ZIP'] = df['ZIP'].apply(clean_zip)
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (ZIP - part 1):", df["_partition_date"].unique())
-
-        # Drop rows where ZIP is 0
-        df = df[df['ZIP'] != 0]
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (ZIP - part 2):", df["_partition_date"].unique())
+        with metrics.stage('transform.clean_csv.zip', rows_in=len(df)) as stage_metrics:
+            df['ZIP'] = clean_zip_codes(df['ZIP'])
+
+            # Drop rows where ZIP is 0 (rows with a NULL ZIP are kept)
+            df = df[df['ZIP'].ne(0).fillna(True).astype(bool)]
+            self.diagnostics.values('clean_csv.zip', df['_partition_date'])
+            stage_metrics.rows_out = len(df)
 
         # 5) Convert 'Demo' column values to 0 and 1, then to string
         if 'Demo' in df.columns:
-            df['Demo'] = df['Demo'].replace({'True': '1', 'False': '0'})
-            df['Demo'] = df['Demo'].astype(str)
-        # Debugging: Print unique values of _partition_date after general cleaning
-        # print("Debugging (Demo):", df["_partition_date"].unique())
+            demo_values = {'True': '1', 'False': '0'}
+            if is_categorical(df['Demo']):
+                df['Demo'] = map_categories(df['Demo'], lambda categories: categories.map(lambda value: demo_values.get(value, value)))
+            else:
+                df['Demo'] = df['Demo'].replace(demo_values)
+                if not typed:
+                    df['Demo'] = df['Demo'].astype(str)
+        self.diagnostics.values('clean_csv.demo', df['_partition_date'])
 
         # 6) Map columns for csv_snapshots
         df.rename(columns={
@@ -221,26 +411,86 @@ class DataTransformer:
             '_extraction_date': '_extraction_date',
             '_partition_date': '_partition_date'
         }, inplace=True)
-        print("Columns after mapping:", df.columns.tolist())
+        logging.debug(f"Columns after mapping: {df.columns.tolist()}")
 
-        # 7) Convert all columns to string type
-        df = df.astype(str)
+        # 7) Convert all columns to string type (or to the Silver data types in typed mode)
+        with metrics.stage('transform.clean_csv.cast', rows_in=len(df)) as stage_metrics:
+            if typed:
+                df = cast_to_dtypes(df, get_pandas_dtypes(get_silver_table_data_types()['stg_csv_snapshots']),
+                                    keep_categoricals=categorical)
+            else:
+                df = to_string_columns(df, keep_categoricals=categorical)
+            stage_metrics.rows_out = len(df)
 
         return df
 
-    def clean_parquet(self, df: pd.DataFrame) -> pd.DataFrame:
+    @instrumented('transform.clean_csv_parallel')
+    def clean_csv_parallel(self, df: pd.DataFrame, max_workers: int = None, typed: bool = False,
+                           rows_per_shard: int = None, categorical: bool = False) -> pd.DataFrame:
+        """
+        Runs `clean_csv` on shards of the CSV data in a pool of worker processes, using all the cores.
+
+        The cleaning is row by row, so the rows can be cleaned independently: the data is split by '_partition_date'
+        (or in fixed ranges of `rows_per_shard` rows), each shard is sent to a worker process as an Arrow IPC stream
+        and cleaned there, and the cleaned shards are put back in the original row order (and with the original
+        index), so the result is the same as `clean_csv(df)`. Workers are started with 'spawn' rather than 'fork',
+        as the pipeline may call this from a thread (forking a multi-threaded process can deadlock). Categorical
+        columns travel as Arrow dictionaries, and the categories of the cleaned shards are unified when they are
+        put back together.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame (Bronze CSV data, as strings or typed).
+            max_workers (int): Number of worker processes (defaults to the number of cores).
+            typed (bool): If True, return typed columns instead of strings.
+            rows_per_shard (int): If set, split the data in ranges of this many rows instead of by '_partition_date'.
+            categorical (bool): If True, return the low-cardinality columns as categoricals.
+
+        Returns:
+            pd.DataFrame: The cleaned DataFrame, as returned by `clean_csv`.
+        """
+        if df.empty:
+            return self.clean_csv(df, typed=typed, categorical=categorical)
+
+        # Shards keep the row positions as index, to put the cleaned rows back in the original order
+        original_index = df.index
+        df = df.reset_index(drop=True)
+        if rows_per_shard is None:
+            shard_positions = [positions for _, positions in sorted(df.groupby('_partition_date', dropna=False, sort=False, observed=True).indices.items(),
+                                                                    key=lambda item: item[1][0])]
+        else:
+            shard_positions = [np.arange(start, min(start + rows_per_shard, len(df))) for start in range(0, len(df), rows_per_shard)]
+
+        shards = (dataframe_to_ipc(df.take(positions)) for positions in shard_positions)
+        input_dtypes = df.dtypes.to_dict()
+        output_dtypes = get_pandas_dtypes(get_silver_table_data_types()['stg_csv_snapshots']) if typed else None
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            cleaned_shards = [
+                dataframe_from_ipc(ipc_bytes, output_dtypes)
+                for ipc_bytes in executor.map(clean_csv_shard, shards, [input_dtypes] * len(shard_positions),
+                                              [typed] * len(shard_positions), [categorical] * len(shard_positions))
+            ]
+        logging.info(f"Cleaned {len(df)} CSV rows in {len(shard_positions)} shards.")
+
+        cleaned_df = concat_frames(cleaned_shards).sort_index(kind='stable')
+        cleaned_df.index = original_index.take(cleaned_df.index)
+        return cleaned_df
+
+    @instrumented('transform.clean_parquet')
+    def clean_parquet(self, df: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
         """
         Cleans a Parquet DataFrame by performing the following steps:
         
         1. Drops rows with missing values in the first three ID columns.
         2. Normalizes `email_hash` and `phone_hash` columns by converting them to lowercase and stripping whitespace.
         3. Removes duplicate rows based on the first three ID columns.
-        4. Identifies and prints duplicates based on the combination of `email_hash` and `phone_hash`.
-        5. Identifies and prints duplicates across the first three ID columns.
+        4. In diagnostics mode, logs the duplicates based on the combination of `email_hash` and `phone_hash`.
+        5. In diagnostics mode, logs the duplicates across the first three ID columns.
         6. Renames specific columns for consistency.
+        7. In typed mode, casts the columns to the Silver data types (see `get_silver_table_data_types`).
         
         Args:
             df (pd.DataFrame): Input DataFrame to be cleaned.
+            typed (bool): If True, return typed columns.
             
         Returns:
             pd.DataFrame: Cleaned DataFrame.
@@ -258,16 +508,12 @@ class DataTransformer:
         # 3) Remove duplicates based on the first three ID columns
         df = df.drop_duplicates(subset=df.columns[:3])  # Drop duplicates based on ID columns
 
-        # 4) Check for duplicates in the combination of email_hash and phone_hash
+        # 4) Profile the duplicates in the combination of email_hash and phone_hash (diagnostics mode only)
         if 'email_hash' in df.columns and 'phone_hash' in df.columns:
-            email_phone_duplicates = df[df.duplicated(subset=['email_hash', 'phone_hash'], keep=False)]
-            if not email_phone_duplicates.empty:
-                print(f"Duplicates found based on email_hash and phone_hash:\n{email_phone_duplicates}")
+            self.diagnostics.duplicates('clean_parquet.email_phone_duplicates', df, ['email_hash', 'phone_hash'])
 
-        # 5) Check for duplicates across all three ID columns
-        id_duplicates = df[df.duplicated(subset=df.columns[:3], keep=False)]
-        if not id_duplicates.empty:
-            print(f"Duplicates found across all three ID columns:\n{id_duplicates}")
+        # 5) Profile the duplicates across all three ID columns (diagnostics mode only)
+        self.diagnostics.duplicates('clean_parquet.id_duplicates', df, df.columns[:3].tolist())
 
         # 6) Map columns for leads_parquet
         df.rename(columns={
@@ -276,10 +522,38 @@ class DataTransformer:
                 'email_hash': 'email_hash',
                 '_extraction_date': '_extraction_date'
             }, inplace=True)
-        print("Columns after mapping:", df.columns.tolist())
+        logging.debug(f"Columns after mapping: {df.columns.tolist()}")
+
+        # 7) Cast to the Silver data types in typed mode
+        if typed:
+            df = cast_to_dtypes(df, get_pandas_dtypes(get_silver_table_data_types()['stg_leads_parquet']))
 
         return df
 
+    def clean_parquet_batches(self, batches: Iterable[pd.DataFrame], typed: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Cleans Parquet data batch by batch (e.g. from DataExtractor.iter_parquet_chunks) with `clean_parquet`.
+
+        Duplicates on the ID columns are also removed across batches: a hash of the ID columns of every row
+        already yielded is kept in a set, which is much smaller than the data itself and grows in place (each
+        batch only looks up and adds its own rows).
+
+        Args:
+            batches (Iterable[pd.DataFrame]): The Parquet batches to be cleaned.
+            typed (bool): If True, return typed columns.
+
+        Yields:
+            pd.DataFrame: The next cleaned batch.
+        """
+        seen_ids = set()
+        for batch_df in batches:
+            batch_df = self.clean_parquet(batch_df, typed=typed)
+            id_hashes = pd.util.hash_pandas_object(batch_df.iloc[:, :3], index=False).tolist()
+            # The ID columns are unique within a cleaned batch, so only the earlier batches are looked up
+            new_rows = ~np.fromiter(map(seen_ids.__contains__, id_hashes), dtype=bool, count=len(id_hashes))
+            seen_ids.update(id_hashes)
+            yield batch_df[new_rows]
+
 # If you want to test this file by running it, uncomment this section and 
 # uncomment the 'from step2_load_to_postgres import DataLoader' at the beginning
 
@@ -1,10 +1,12 @@
 # utils_checks_db.py
 
+import logging
+import threading
 import pandas as pd  # Data Transformation
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import text
 from dotenv import load_dotenv
-from utils_connection import create_db_engine, get_connection_uri  # Import the new function
+from utils_connection import get_db_engine, get_connection_uri  # Import the new function
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,7 +15,7 @@ load_dotenv()
 def check_schema_existence(schema_names):
     try:
         connection_uri = get_connection_uri()  # Use the new function to get the connection URI
-        db_engine = create_db_engine(connection_uri)  # Use the connection URI to create the engine
+        db_engine = get_db_engine(connection_uri)  # Use the connection URI to get the shared engine
         if db_engine is None:
             print("Failed to create the database engine.")
             return
@@ -41,7 +43,7 @@ def check_schema_existence(schema_names):
 def check_table_existence(schema_name, table_names):
     try:
         connection_uri = get_connection_uri()  # Use the new function to get the connection URI
-        db_engine = create_db_engine(connection_uri)  # Use the connection URI to create the engine
+        db_engine = get_db_engine(connection_uri)  # Use the connection URI to get the shared engine
         if db_engine is None:
             print("Failed to create the database engine.")
             return
@@ -102,35 +104,93 @@ def map_bronze_columns(table_name):
     else:
         raise ValueError(f"Table '{table_name}' not found in the bronze layer.")
 
-def get_schema_table_columns(connection_uri, schema_name, tables_in_schema):
+# Process-wide cache of the table columns, keyed by (schema, table_name). Filled one whole schema at a time, and
+# invalidated explicitly by the steps running DDL (see invalidate_schema_cache).
+_schema_columns_cache = {}
+_schema_columns_lock = threading.Lock()
+_schema_load_lock = threading.Lock()  # One catalog query at a time: concurrent misses wait for it instead of repeating it
+
+def load_schema_columns(engine, schema_name):
+    """
+    Fetches the column names of every table of a schema in a single query, and caches them.
+
+    Args:
+        engine: The SQLAlchemy engine used to query the catalog.
+        schema_name (str): The schema name.
+
+    Returns:
+        dict: A dictionary where the keys are table names and the values are lists of column names (in table order).
+    """
+    query = text("""
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = :schema
+        ORDER BY table_name, ordinal_position;
+    """)
+    with engine.connect() as connection:
+        rows = connection.execute(query, {"schema": schema_name}).fetchall()
+
+    schema_columns = {}
+    for table_name, column_name in rows:
+        schema_columns.setdefault(table_name, []).append(column_name)
+
+    with _schema_columns_lock:
+        for table_name, columns in schema_columns.items():
+            _schema_columns_cache[(schema_name, table_name)] = columns
+    logging.debug(f"Cached the columns of {len(schema_columns)} tables of schema '{schema_name}'.")
+    return schema_columns
+
+def invalidate_schema_cache(schema_name=None, table_name=None):
+    """
+    Forgets the cached columns, after DDL changed the tables (e.g. step1, step4, step5, new partitions).
+
+    Args:
+        schema_name (str): Only forget the tables of this schema (optional, defaults to every schema).
+        table_name (str): Only forget this table of the schema (optional).
+    """
+    with _schema_columns_lock:
+        for key in list(_schema_columns_cache):
+            if (schema_name is None or key[0] == schema_name) and (table_name is None or key[1] == table_name):
+                del _schema_columns_cache[key]
+
+def get_schema_table_columns(connection_uri, schema_name, tables_in_schema, engine=None):
     """
     Fetches column names for a set of tables in a specified schema from a database.
 
+    The columns come from the process-wide cache; on a miss, the columns of the whole schema are fetched in one
+    query (no engine is created when all the tables are cached).
+
     Args:
         connection_uri (str): The database connection URI.
         schema_name (str): The schema name where the tables are located.
         tables_in_schema (list of str): A list of table names for which the column names are to be fetched.
+        engine: An existing SQLAlchemy engine to reuse (optional). If not given, the shared engine of connection_uri is used.
 
     Returns:
-        dict: A dictionary where the keys are table names and the values are lists of column names for each table.
+        dict: A dictionary where the keys are table names and the values are lists of column names for each table
+        (an empty list if the table does not exist).
     """
     columns_dict = {}
     try:
-        engine = create_db_engine(connection_uri)
-        if engine is None:
-            print("Failed to create the database engine.")
-        
-        with engine.connect() as connection:
-            for table_name in tables_in_schema:
-                query = text(f"""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_schema = '{schema_name}' 
-                    AND table_name = '{table_name}';
-                """)
-                result = connection.execute(query)
-                columns = [row[0] for row in result]  # Extract the first element (column_name) and create a list of columns
-                columns_dict[table_name] = columns  # Fill the columns_dict with keys (table_name) and values (list of column names) 
+        def get_cached():
+            with _schema_columns_lock:
+                return {table_name: _schema_columns_cache.get((schema_name, table_name)) for table_name in tables_in_schema}
+
+        cached = get_cached()
+        if any(columns is None for columns in cached.values()):
+            with _schema_load_lock:
+                cached = get_cached()  # Another thread may have loaded the schema meanwhile
+                if any(columns is None for columns in cached.values()):
+                    if engine is None:
+                        engine = get_db_engine(connection_uri)
+                    if engine is None:
+                        print("Failed to create the database engine.")
+                    schema_columns = load_schema_columns(engine, schema_name)
+                    cached = {table_name: columns if columns is not None else schema_columns.get(table_name, [])
+                              for table_name, columns in cached.items()}
+
+        for table_name in tables_in_schema:
+            columns_dict[table_name] = list(cached[table_name])  # Copy, so callers can't change the cache
 
     except Exception as e:
         print(f"Error occurred while fetching view columns: {str(e)}")
@@ -139,43 +199,45 @@ def get_schema_table_columns(connection_uri, schema_name, tables_in_schema):
 
 def get_bronze_table_data_types():
     """
-    Returns a dictionary with data types for columns in bronze tables.
+    Returns a dictionary with data types for columns in bronze tables (as created by create_bronze_tables.sql).
     """
     bronze_data_types = {
         'leads_parquet': {
-            'lead_UUID': 'UUID',
-            'phone_hash': 'VARCHAR(255)',
-            'email_hash': 'VARCHAR(255)',
-            'inserted_at': 'TIMESTAMP'
+            'lead_UUID': 'TEXT',
+            'phone_hash': 'TEXT',
+            'email_hash': 'TEXT',
+            '_extraction_date': 'TEXT'
         },
         'csv_snapshots': {
-            'ENTRYDATE': 'DATE',
-            'LEADNUMBER': 'INT',
-            'email_hash': 'VARCHAR(255)',
-            'phone_hash': 'VARCHAR(255)',
-            'CITY': 'VARCHAR(100)',
-            'STATE': 'CHAR(2)',
-            'ZIP': 'VARCHAR(10)',
-            'APPT_DATE': 'TIMESTAMP',
-            'Set': 'INT',
-            'Demo': 'INT',
-            'Dispo': 'VARCHAR(50)',
-            'JOB_STATUS': 'VARCHAR(100)',
-            'inserted_at': 'TIMESTAMP'
+            'ENTRYDATE': 'TEXT',
+            'LEADNUMBER': 'TEXT',
+            'email_hash': 'TEXT',
+            'phone_hash': 'TEXT',
+            'CITY': 'TEXT',
+            'STATE': 'TEXT',
+            'ZIP': 'TEXT',
+            'APPT_DATE': 'TEXT',
+            'Set': 'TEXT',
+            'Demo': 'TEXT',
+            'Dispo': 'TEXT',
+            'JOB_STATUS': 'TEXT',
+            'location': 'TEXT',
+            '_extraction_date': 'TEXT',
+            '_partition_date': 'TEXT'
         }
     }
     return bronze_data_types
 
 def get_silver_table_data_types():
     """
-    Returns a dictionary with data types for columns in silver tables.
+    Returns a dictionary with data types for columns in silver tables (as set by apply_silver_types.sql).
     """
     silver_data_types = {
         'stg_leads_parquet': {
-            'lead_uuid': 'UUID',
+            'lead_uuid': 'VARCHAR(255)',
             'phone_hash': 'VARCHAR(255)',
             'email_hash': 'VARCHAR(255)',
-            'inserted_at': 'TIMESTAMP'
+            '_extraction_date': 'DATE'
         },
         'stg_csv_snapshots': {
             'entry_date': 'DATE',
@@ -186,15 +248,42 @@ def get_silver_table_data_types():
             'state': 'CHAR(2)',
             'zip': 'VARCHAR(10)',
             'appt_date': 'TIMESTAMP',
-            'set_count': 'INT',
+            'set': 'INT',
             'demo': 'INT',
             'dispo': 'VARCHAR(50)',
             'job_status': 'VARCHAR(100)',
-            'inserted_at': 'TIMESTAMP'
+            'location': 'VARCHAR(255)',
+            '_extraction_date': 'DATE',
+            '_partition_date': 'DATE'
         }
     }
     return silver_data_types
 
+def get_pandas_dtypes(table_data_types):
+    """
+    Maps the Postgres data types of a table to pandas nullable (or Arrow-backed) dtypes.
+
+    Args:
+        table_data_types (dict): Column names mapped to Postgres data types, e.g. get_silver_table_data_types()['stg_csv_snapshots'].
+
+    Returns:
+        dict: Column names mapped to pandas dtypes ('string[pyarrow]', 'Int64', 'Float64', 'boolean' or 'datetime64[ns]').
+    """
+    pandas_dtypes = {}
+    for column, data_type in table_data_types.items():
+        base_type = data_type.split('(')[0].strip().upper()
+        if base_type in ('INT', 'INTEGER', 'BIGINT', 'SMALLINT'):
+            pandas_dtypes[column] = 'Int64'
+        elif base_type in ('FLOAT', 'DOUBLE PRECISION', 'REAL', 'NUMERIC'):
+            pandas_dtypes[column] = 'Float64'
+        elif base_type == 'BOOLEAN':
+            pandas_dtypes[column] = 'boolean'
+        elif base_type in ('DATE', 'TIMESTAMP'):
+            pandas_dtypes[column] = 'datetime64[ns]'
+        else:  # TEXT, VARCHAR, CHAR, UUID
+            pandas_dtypes[column] = 'string[pyarrow]'
+    return pandas_dtypes
+
 if __name__ == "__main__":
     # Example usage
     schema_names = ['bronze', 'silver']  # Example schema names
@@ -1,10 +1,13 @@
 import os
+import threading
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
 import boto3
 import logging
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from pyarrow import fs as pa_fs
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,6 +26,25 @@ if not all([user, password, host, db_name]):
 # Construct the connection URI
 connection_uri = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
 
+# Connection pool settings (overridable with environment variables)
+# Postgres: pooled connections kept open, extra connections allowed under load, liveness check of a pooled
+# connection before use (a restarted server does not fail the next step), and a per-statement timeout (0: none)
+DB_POOL_SIZE = int(os.getenv('POSTGRES_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('POSTGRES_MAX_OVERFLOW', '10'))
+DB_POOL_PRE_PING = os.getenv('POSTGRES_POOL_PRE_PING', 'true').lower() == 'true'
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('POSTGRES_STATEMENT_TIMEOUT_MS', '0'))
+# S3: HTTP connections kept per client (boto3 defaults to 10, fewer than concurrent fetches), retries with
+# backoff on throttling and transient errors, and TCP keep-alive on the pooled connections
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '32'))
+S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', '5'))
+S3_TCP_KEEPALIVE = os.getenv('S3_TCP_KEEPALIVE', 'true').lower() == 'true'
+
+# Connection registry: one engine per connection URI and one S3 client per process, shared by every step and utility
+_db_engines = {}
+_s3_client = None
+_arrow_s3_filesystem = None
+_registry_lock = threading.Lock()
+
 def get_connection_uri() -> str:
     """
     Get the database connection URI.
@@ -34,7 +56,8 @@ def get_connection_uri() -> str:
 
 def create_db_engine(connection_uri: str) -> any:
     """
-    Create and return a SQLAlchemy engine based on the provided connection URI.
+    Create and return a SQLAlchemy engine based on the provided connection URI, with the pool settings above.
+    Prefer `get_db_engine`, which returns the engine shared by the whole process.
 
     Args:
         connection_uri (str): The connection URI for the database.
@@ -43,7 +66,16 @@ def create_db_engine(connection_uri: str) -> any:
         Engine: A SQLAlchemy engine connected to the specified database.
     """
     try:
-        db_engine = create_engine(connection_uri)
+        connect_args = {}
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            connect_args['options'] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        db_engine = create_engine(
+            connection_uri,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args=connect_args
+        )
         logging.info("Database engine created successfully.")
         return db_engine
     except SQLAlchemyError as e:
@@ -53,9 +85,59 @@ def create_db_engine(connection_uri: str) -> any:
         logging.error(f"An unexpected error occurred: {str(e)}")
         return None
 
+def get_db_engine(connection_uri: str = None) -> any:
+    """
+    Return the SQLAlchemy engine shared by the whole process for a connection URI, created on first use.
+
+    Args:
+        connection_uri (str): The connection URI for the database (optional, defaults to `get_connection_uri()`).
+
+    Returns:
+        Engine: The shared SQLAlchemy engine (and its connection pool).
+    """
+    connection_uri = connection_uri or get_connection_uri()
+    with _registry_lock:
+        if _db_engines.get(connection_uri) is None:
+            _db_engines[connection_uri] = create_db_engine(connection_uri)
+        return _db_engines[connection_uri]
+
+def get_s3_client() -> boto3.client:
+    """
+    Return the boto3 S3 client shared by the whole process (boto3 clients are thread-safe), created on first use.
+
+    Returns:
+        boto3.client: The shared boto3 S3 client.
+    """
+    global _s3_client
+    with _registry_lock:
+        if _s3_client is None:
+            _s3_client = create_s3_client()
+        return _s3_client
+
+def get_arrow_s3_filesystem() -> pa_fs.S3FileSystem:
+    """
+    Return the pyarrow S3 filesystem shared by the whole process, created on first use.
+
+    Returns:
+        pa_fs.S3FileSystem: The shared pyarrow S3 filesystem.
+    """
+    global _arrow_s3_filesystem
+    with _registry_lock:
+        if _arrow_s3_filesystem is None:
+            _arrow_s3_filesystem = create_arrow_s3_filesystem()
+        return _arrow_s3_filesystem
+
+def dispose_connections():
+    """Close the pooled database connections of the shared engines (they reconnect on next use)."""
+    with _registry_lock:
+        for db_engine in _db_engines.values():
+            if db_engine is not None:
+                db_engine.dispose()
+
 def create_s3_client() -> boto3.client:
     """
-    Create and return a boto3 S3 client.
+    Create and return a boto3 S3 client, with the pool and retry settings above.
+    Prefer `get_s3_client`, which returns the client shared by the whole process.
 
     Returns:
         boto3.client: A boto3 S3 client object.
@@ -71,7 +153,12 @@ def create_s3_client() -> boto3.client:
             aws_secret_access_key=s3_secret_access_key,
             region_name=s3_region
         )
-        s3_client = session.client('s3')
+        s3_config = Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={'max_attempts': S3_MAX_ATTEMPTS, 'mode': 'standard'},
+            tcp_keepalive=S3_TCP_KEEPALIVE
+        )
+        s3_client = session.client('s3', config=s3_config)
         print("S3 client created successfully.")
         return s3_client
     except NoCredentialsError:
@@ -81,6 +168,30 @@ def create_s3_client() -> boto3.client:
     except Exception as e:
         raise ValueError(f"Error initializing S3 client: {e}")
 
+def create_arrow_s3_filesystem() -> pa_fs.S3FileSystem:
+    """
+    Create and return a pyarrow S3 filesystem, used to read Parquet files with ranged requests
+    (column projection and row-group streaming) instead of downloading the whole object.
+
+    Returns:
+        pa_fs.S3FileSystem: A pyarrow S3 filesystem object.
+    """
+    # Fetch AWS credentials from environment variables
+    s3_access_key_id = os.getenv('S3_ACCESS_KEY_ID')
+    s3_secret_access_key = os.getenv('S3_SECRET_ACCESS_KEY')
+    s3_region = os.getenv('S3_REGION')
+
+    try:
+        arrow_fs = pa_fs.S3FileSystem(
+            access_key=s3_access_key_id,
+            secret_key=s3_secret_access_key,
+            region=s3_region
+        )
+        logging.info("Arrow S3 filesystem created successfully.")
+        return arrow_fs
+    except Exception as e:
+        raise ValueError(f"Error initializing Arrow S3 filesystem: {e}")
+
 def get_s3_bucket_name() -> str:
     """
     Retrieve the S3 bucket name from the environment variable.
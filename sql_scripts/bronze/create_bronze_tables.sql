@@ -21,6 +21,13 @@
 --   email_hash, phone_hash (Foreign Keys referencing LEADS_PARQUET)
 --   inserted_at (Automatically records insertion time with DEFAULT CURRENT_TIMESTAMP)
 
+-- INGESTION_STATE
+-- Purpose: Stores the S3 objects already loaded into bronze, so that only new or changed objects are ingested.
+-- Key Columns:
+--   s3_key (Primary Key, TEXT)
+--   etag, size_bytes, last_modified (S3 metadata used to detect changes)
+--   rows_loaded (Number of rows appended to bronze for the object)
+
 -- LEADS_PARQUET
 CREATE TABLE IF NOT EXISTS BRONZE.LEADS_PARQUET (
     "lead_UUID" TEXT,
@@ -48,4 +55,31 @@ CREATE TABLE IF NOT EXISTS BRONZE.CSV_SNAPSHOTS (
     "_partition_date" TEXT      
     -- CONSTRAINT fk_email_hash FOREIGN KEY ("email_hash") REFERENCES BRONZE.LEADS_PARQUET("email_hash"),
     -- CONSTRAINT fk_phone_hash FOREIGN KEY ("phone_hash") REFERENCES BRONZE.LEADS_PARQUET("phone_hash")
-);
\ No newline at end of file
+);
+
+-- INGESTION_STATE
+CREATE TABLE IF NOT EXISTS BRONZE.INGESTION_STATE (
+    "s3_key" TEXT PRIMARY KEY,
+    "etag" TEXT,
+    "size_bytes" BIGINT,
+    "last_modified" TIMESTAMPTZ,
+    "rows_loaded" INT,
+    "loaded_at" TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- STAGE_METRICS (see etl/utils/instrumentation.py: written when ETL_METRICS_TABLE=bronze.stage_metrics)
+CREATE TABLE IF NOT EXISTS BRONZE.STAGE_METRICS (
+    "run_id" TEXT,
+    "name" TEXT,
+    "parent" TEXT,
+    "labels" JSONB,
+    "status" TEXT,
+    "started_at" TIMESTAMP,
+    "seconds" DOUBLE PRECISION,
+    "rows_in" BIGINT,
+    "rows_out" BIGINT,
+    "bytes" BIGINT,
+    "rss_start_bytes" BIGINT,
+    "rss_end_bytes" BIGINT,
+    "peak_rss_bytes" BIGINT
+);
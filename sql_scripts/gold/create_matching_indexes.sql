@@ -0,0 +1,13 @@
+-- Hash indexes supporting the lead matching in insert_into_gold_tables.sql.
+-- The matching joins silver.stg_csv_snapshots to silver.stg_leads_parquet with separate equi-joins on
+-- email_hash and on phone_hash (instead of a single OR join, which Postgres can only run as a nested loop).
+-- Hash indexes only support equality, which is all the matching needs, and stay small for long hash values.
+
+CREATE INDEX IF NOT EXISTS idx_stg_leads_parquet_email_hash ON SILVER.STG_LEADS_PARQUET USING HASH (email_hash);
+CREATE INDEX IF NOT EXISTS idx_stg_leads_parquet_phone_hash ON SILVER.STG_LEADS_PARQUET USING HASH (phone_hash);
+CREATE INDEX IF NOT EXISTS idx_stg_csv_snapshots_email_hash ON SILVER.STG_CSV_SNAPSHOTS USING HASH (email_hash);
+CREATE INDEX IF NOT EXISTS idx_stg_csv_snapshots_phone_hash ON SILVER.STG_CSV_SNAPSHOTS USING HASH (phone_hash);
+
+-- Refresh planner statistics so the join strategy is chosen on current row counts
+ANALYZE SILVER.STG_LEADS_PARQUET;
+ANALYZE SILVER.STG_CSV_SNAPSHOTS;
@@ -2,6 +2,15 @@
 -- (i.e., if parquet.email_hash is not NULL); otherwise, it's set to FALSE.
 -- phone_match: Similar logic is applied for phone_match, where it is TRUE if there 
 -- is a match based on phone_hash (i.e., if parquet.phone_hash is not NULL); otherwise, it's set to FALSE
+--
+-- Matching: a CSV lead matches a Parquet lead when their email_hash OR their phone_hash are equal.
+-- A single "LEFT JOIN ... ON csv.email_hash = parquet.email_hash OR csv.phone_hash = parquet.phone_hash"
+-- can only run as a nested loop, so the matching is split into three branches that are each an
+-- equi-join (or anti-join) Postgres can run as a hash join, backed by the hash indexes in create_matching_indexes.sql:
+--   1) Email branch: all pairs whose email_hash are equal.
+--   2) Phone branch: all pairs whose phone_hash are equal, except pairs already returned by the email branch (dedup).
+--   3) No match: CSV leads without any email or phone match (Parquet columns are NULL, like the LEFT JOIN).
+-- Together they return exactly the same rows as the OR join.
 
 INSERT INTO gold.lead_quality_matching (
     lead_uuid,
@@ -26,8 +35,50 @@ INSERT INTO gold.lead_quality_matching (
     conversion_rate,     
     lead_quality_flag
 )
+WITH lead_matches AS (
+    -- 1) Email branch
+    SELECT 
+        csv.*,
+        parquet.lead_uuid AS parquet_lead_uuid,
+        parquet.email_hash AS parquet_email_hash,
+        parquet.phone_hash AS parquet_phone_hash
+    FROM silver.stg_csv_snapshots AS csv
+    JOIN silver.stg_leads_parquet AS parquet 
+    ON csv.email_hash = parquet.email_hash
+
+    UNION ALL
+
+    -- 2) Phone branch (dedup: skip the pairs whose email_hash are equal, already returned by the email branch)
+    SELECT 
+        csv.*,
+        parquet.lead_uuid,
+        parquet.email_hash,
+        parquet.phone_hash
+    FROM silver.stg_csv_snapshots AS csv
+    JOIN silver.stg_leads_parquet AS parquet 
+    ON csv.phone_hash = parquet.phone_hash
+    WHERE csv.email_hash IS NULL 
+        OR parquet.email_hash IS NULL 
+        OR csv.email_hash <> parquet.email_hash
+
+    UNION ALL
+
+    -- 3) No match
+    SELECT 
+        csv.*,
+        NULL,
+        NULL,
+        NULL
+    FROM silver.stg_csv_snapshots AS csv
+    WHERE NOT EXISTS (
+        SELECT 1 FROM silver.stg_leads_parquet AS parquet WHERE parquet.email_hash = csv.email_hash
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM silver.stg_leads_parquet AS parquet WHERE parquet.phone_hash = csv.phone_hash
+    )
+)
 SELECT 
-    parquet.lead_uuid,
+    csv.parquet_lead_uuid,
     csv.lead_number,
     csv.email_hash,
     csv.phone_hash,
@@ -43,11 +94,11 @@ SELECT
     CASE WHEN csv.set = 1 THEN TRUE ELSE FALSE END AS appointment_scheduled,
     CASE WHEN csv.demo = 1 THEN TRUE ELSE FALSE END AS demo_scheduled,
     CASE 
-        WHEN parquet.email_hash IS NOT NULL THEN TRUE 
+        WHEN csv.parquet_email_hash IS NOT NULL THEN TRUE 
         ELSE FALSE 
     END AS email_match,  -- Logic for email match
     CASE 
-        WHEN parquet.phone_hash IS NOT NULL THEN TRUE 
+        WHEN csv.parquet_phone_hash IS NOT NULL THEN TRUE 
         ELSE FALSE 
     END AS phone_match,  -- Logic for phone match
     csv._extraction_date,
@@ -58,6 +109,4 @@ SELECT
         WHEN csv.set = 1 THEN 'Medium Quality'
         ELSE 'Low Quality'
     END AS lead_quality_flag
-FROM silver.stg_csv_snapshots AS csv
-LEFT JOIN silver.stg_leads_parquet AS parquet 
-ON csv.email_hash = parquet.email_hash OR csv.phone_hash = parquet.phone_hash;
\ No newline at end of file
+FROM lead_matches AS csv;
\ No newline at end of file
@@ -5,6 +5,8 @@
 -- correctly interpreted as NULL in the PostgreSQL database, allowing for 
 -- more accurate data representation and analysis. The same logic is applied 
 -- to other relevant tables to maintain consistency across the dataset.
+-- The columns are compared as TEXT, so the script can run again on tables it already typed
+-- (the incremental loads append to the typed tables, and every pipeline run applies the types).
 
 
 -- Alter table for stg_leads_parquet
@@ -23,13 +25,13 @@ ALTER TABLE SILVER.STG_CSV_SNAPSHOTS
     ALTER COLUMN city SET DATA TYPE VARCHAR(100),
     ALTER COLUMN state SET DATA TYPE CHAR(2) 
         USING CASE 
-            WHEN state = '<NA>' THEN NULL 
+            WHEN state::TEXT = '<NA>' THEN NULL 
             ELSE state 
         END,
     ALTER COLUMN zip SET DATA TYPE VARCHAR(10),
     ALTER COLUMN appt_date SET DATA TYPE TIMESTAMP 
         USING CASE 
-            WHEN appt_date = '<NA>' THEN NULL 
+            WHEN appt_date::TEXT = '<NA>' THEN NULL 
             ELSE appt_date::timestamp without time zone 
         END,
     ALTER COLUMN set SET DATA TYPE INT USING set::integer,
@@ -37,17 +39,20 @@ ALTER TABLE SILVER.STG_CSV_SNAPSHOTS
     ALTER COLUMN dispo SET DATA TYPE VARCHAR(50),
     ALTER COLUMN job_status SET DATA TYPE VARCHAR(100),
     ALTER COLUMN location SET DATA TYPE VARCHAR(255),
-    ALTER COLUMN _extraction_date SET DATA TYPE DATE USING _extraction_date::date,
-    ALTER COLUMN _partition_date SET DATA TYPE DATE USING _partition_date::date;
+    ALTER COLUMN _extraction_date SET DATA TYPE DATE USING _extraction_date::date;
+-- Note: _partition_date is the partition key of STG_CSV_SNAPSHOTS, created as DATE (the type of a partition
+-- key cannot be altered). The types above are applied to every daily partition.
 
--- Alter tables for stg_csv_data_01 to stg_csv_data_22
+-- Alter the legacy per-day copies (stg_csv_data_NN), if step3 created them
 DO $$
 DECLARE
-    i INT;
     table_name TEXT;
 BEGIN
-    FOR i IN 1..22 LOOP
-        table_name := format('stg_csv_data_%s', lpad(i::text, 2, '0'));  -- Ensure leading zero
+    FOR table_name IN
+        SELECT tables.table_name FROM information_schema.tables AS tables
+        WHERE tables.table_schema = 'silver' AND tables.table_name LIKE 'stg\_csv\_data\_%'
+        ORDER BY tables.table_name
+    LOOP
         EXECUTE format('
             ALTER TABLE SILVER.%I
                 ALTER COLUMN entry_date SET DATA TYPE DATE USING entry_date::date,
@@ -57,13 +62,13 @@ BEGIN
                 ALTER COLUMN city SET DATA TYPE VARCHAR(100),
                 ALTER COLUMN state SET DATA TYPE CHAR(2) 
                     USING CASE 
-                        WHEN state = ''<NA>'' THEN NULL 
+                        WHEN state::TEXT = ''<NA>'' THEN NULL 
                         ELSE state 
                     END,
                 ALTER COLUMN zip SET DATA TYPE VARCHAR(10),
                 ALTER COLUMN appt_date SET DATA TYPE TIMESTAMP 
                     USING CASE 
-                        WHEN appt_date = ''<NA>'' THEN NULL 
+                        WHEN appt_date::TEXT = ''<NA>'' THEN NULL 
                         ELSE appt_date::timestamp without time zone 
                     END,
                 ALTER COLUMN set SET DATA TYPE INT USING set::integer,
@@ -32,6 +32,12 @@ CREATE TABLE IF NOT EXISTS SILVER.STG_LEADS_PARQUET (
 );
 
 -- STG_CSV_SNAPSHOTS
+-- Range-partitioned by "_partition_date": one partition per day (e.g. SILVER.STG_CSV_SNAPSHOTS_20241001).
+-- The daily partitions are created on ingest by the loader (etl/utils/partitions.py), queries filtering on
+-- "_partition_date" only scan the matching days, and old days can be detached instead of deleted.
+-- "_partition_date" is DATE from the start: the type of a partition key cannot be altered afterwards.
+-- IF NOT EXISTS leaves a STG_CSV_SNAPSHOTS created before the partitioning as it is: step1 then migrates it
+-- (partitions.migrate_to_daily_partitions), keeping its rows.
 CREATE TABLE IF NOT EXISTS SILVER.STG_CSV_SNAPSHOTS (
     "entry_date" TEXT,                     -- Changed DATE to TEXT
     "lead_number" TEXT,        -- Changed INT to TEXT
@@ -47,38 +53,25 @@ CREATE TABLE IF NOT EXISTS SILVER.STG_CSV_SNAPSHOTS (
     "job_status" TEXT,                     -- Changed VARCHAR(100) to TEXT
     "location" TEXT,
     "_extraction_date" TEXT,   
-    "_partition_date" TEXT  
+    "_partition_date" DATE                 -- Partition key
     -- CONSTRAINT fk_email_hash FOREIGN KEY ("email_hash") REFERENCES SILVER.STG_LEADS_PARQUET("email_hash"),
     -- CONSTRAINT fk_phone_hash FOREIGN KEY ("phone_hash") REFERENCES SILVER.STG_LEADS_PARQUET("phone_hash")
-);
+) PARTITION BY RANGE ("_partition_date");
+
+-- Note: the per-day copies SILVER.stg_csv_data_NN are no longer created here. They are only created (like
+-- STG_CSV_SNAPSHOTS) by etl/step3_partition_and_load_all_csv.py when its legacy copy mode is enabled.
 
--- DO block to create tables for each CSV snapshot
-DO $$
-DECLARE
-    i INT;
-    padded_number TEXT;  -- Variable to store the padded number
-BEGIN
-    FOR i IN 1..22 LOOP
-        -- Pad the number with leading zeros
-        padded_number := LPAD(i::TEXT, 2, '0');
-        
-        EXECUTE format('
-            CREATE TABLE IF NOT EXISTS SILVER.stg_csv_data_%s (
-                "entry_date" TEXT,                     -- Changed to TEXT
-                "lead_number" TEXT,                    -- Changed to TEXT
-                "email_hash" TEXT,                     -- Changed to TEXT
-                "phone_hash" TEXT,                     -- Changed to TEXT
-                "city" TEXT,                           -- Changed to TEXT
-                "state" TEXT,                          -- Changed to TEXT
-                "zip" TEXT,                            -- Changed to TEXT
-                "appt_date" TEXT,                      -- Changed to TEXT
-                "set" TEXT,                            -- Changed to TEXT
-                "demo" TEXT,                           -- Changed to TEXT
-                "dispo" TEXT,                          -- Changed to TEXT
-                "job_status" TEXT,                     -- Changed to TEXT
-                "location" TEXT,                       -- Changed to TEXT
-                "_extraction_date" TEXT,               -- Changed to TEXT
-                "_partition_date" TEXT                  -- Changed to TEXT
-            );', padded_number);
-    END LOOP;
-END $$;
\ No newline at end of file
+-- TRY_MAKE_DATE
+-- Purpose: The date of (year, month, day), or NULL if it does not exist (e.g. February 30th) instead of an error.
+-- Used by the set-based Silver transform (etl/utils/silver_sql.py) to parse the CSV dates like pandas does
+-- (years outside of the pandas timestamp range, 1678-2261, are NULL too).
+CREATE OR REPLACE FUNCTION SILVER.TRY_MAKE_DATE(year_value INT, month_value INT, day_value INT)
+RETURNS DATE AS $$
+    SELECT CASE
+        WHEN year_value BETWEEN 1678 AND 2261 AND month_value BETWEEN 1 AND 12 AND day_value BETWEEN 1 AND 31 THEN
+            CASE
+                WHEN day_value <= EXTRACT(DAY FROM make_date(year_value, month_value, 1) + INTERVAL '1 month - 1 day')
+                THEN make_date(year_value, month_value, day_value)
+            END
+    END
+$$ LANGUAGE SQL IMMUTABLE;
@@ -0,0 +1,9 @@
+# conftest.py
+
+import os
+import sys
+
+# The ETL modules import each other by module name (the scripts add '/workspace/etl' and '/workspace/etl/utils'
+# to sys.path): add the folders of this checkout
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(REPO_DIR, 'etl'), os.path.join(REPO_DIR, 'etl', 'utils')]
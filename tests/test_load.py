@@ -0,0 +1,73 @@
+# test_load.py
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+try:
+    from utils_connection import get_connection_uri, get_db_engine
+except ValueError:  # Raised on import when the Postgres environment variables are not set
+    pytest.skip("No Postgres configured (POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DB).",
+                allow_module_level=True)
+
+from load import quote_identifier
+from step2_load_to_postgres import DataLoader
+from transform import DataTransformer
+from utils_checks_db import get_silver_table_data_types, invalidate_schema_cache
+
+# Schema holding the Silver table typed as by step4 (dropped after the tests)
+TEST_SCHEMA = 'test_load'
+
+# Bronze CSV columns, as extracted from S3
+BRONZE_CSV_COLUMNS = ['ENTRYDATE', 'LEADNUMBER', 'email_hash', 'phone_hash', 'CITY', 'STATE', 'ZIP', 'APPT_DATE', 'Set',
+                      'Demo', 'Dispo', 'JOB_STATUS', 'location', '_extraction_date', '_partition_date']
+
+def bronze_csv_delta(partition_date: str) -> pd.DataFrame:
+    """The Bronze rows of one daily CSV file: the untyped cleaning writes '<NA>' for the missing state and appointment."""
+    rows = [
+        ('10/01/2024', '1001', 'e1', 'p1', 'Seattle', 'WA', '98101', '10/05/2024  2:30PM', '1', 'True', 'Sold', 'Open', 'Seattle | WA'),
+        ('10/01/2024', '1002', 'e2', 'p2', 'Boston', 'nan', '02134', '', '0', 'False', 'No Sale', 'Closed', 'Boston | MA'),
+        ('13/45/2023', '1003', 'e3', 'p3', 'nu', 'nu', '', 'nan', '1', 'True', 'Sold', 'Open', ' | nu'),
+    ]
+    return pd.DataFrame([row + (partition_date, partition_date) for row in rows], columns=BRONZE_CSV_COLUMNS)
+
+@pytest.fixture
+def engine():
+    """The shared engine, with stg_csv_snapshots created in TEST_SCHEMA with the types of apply_silver_types.sql."""
+    engine = get_db_engine(get_connection_uri())
+    column_types = get_silver_table_data_types()['stg_csv_snapshots']
+    column_list = ', '.join(f"{quote_identifier(column)} {data_type}" for column, data_type in column_types.items())
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(TEST_SCHEMA)} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {quote_identifier(TEST_SCHEMA)}"))
+            conn.execute(text(f"CREATE TABLE {quote_identifier(TEST_SCHEMA)}.stg_csv_snapshots ({column_list}) "
+                              f'PARTITION BY RANGE ("_partition_date")'))
+    except OperationalError as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    invalidate_schema_cache(TEST_SCHEMA)
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(TEST_SCHEMA)} CASCADE"))
+    invalidate_schema_cache(TEST_SCHEMA)
+
+@pytest.mark.parametrize('load_method', ['copy', 'insert'])
+def test_untyped_deltas_load_after_step4(engine, load_method):
+    loader = DataLoader(engine=engine)
+    transformer = DataTransformer(engine=engine)
+    for partition_date in ['2024-10-01', '2024-10-02']:  # The daily deltas of two incremental runs
+        silver_df = transformer.clean_csv(bronze_csv_delta(partition_date))
+        assert (silver_df['appt_date'] == '<NA>').any()
+        with engine.begin() as conn:
+            loader.delete_rows(conn, 'stg_csv_snapshots', TEST_SCHEMA, [partition_date])
+            assert loader.load_csv_to_postgres(silver_df, 'stg_csv_snapshots', TEST_SCHEMA, method=load_method,
+                                               partitioned=True, conn=conn)
+
+    with engine.connect() as conn:
+        loaded_df = pd.read_sql(text(f"SELECT * FROM {quote_identifier(TEST_SCHEMA)}.stg_csv_snapshots"), conn)
+    assert len(loaded_df) == 6
+    assert loaded_df['appt_date'].notna().sum() == 2
+    assert loaded_df['state'].isna().sum() == 2  # 'MA' is inferred from the location of the second row
+    assert loaded_df['entry_date'].isna().sum() == 2
+    assert sorted(loaded_df['_partition_date'].astype(str).unique()) == ['2024-10-01', '2024-10-02']
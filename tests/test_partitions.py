@@ -0,0 +1,72 @@
+# test_partitions.py
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+try:
+    from utils_connection import get_connection_uri, get_db_engine
+except ValueError:  # Raised on import when the Postgres environment variables are not set
+    pytest.skip("No Postgres configured (POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DB).",
+                allow_module_level=True)
+
+from load import get_column_types, quote_identifier
+from partitions import create_daily_partitions, get_daily_partitions, is_partitioned_table, migrate_to_daily_partitions
+
+# Schema holding the tables of the tests (dropped after the tests)
+TEST_SCHEMA = 'test_partitions'
+
+# A STG_CSV_SNAPSHOTS created before the daily partitions (the key was TEXT), typed by step4 for some columns
+UNPARTITIONED_TABLE_DDL = f"""
+    CREATE TABLE {quote_identifier(TEST_SCHEMA)}.stg_csv_snapshots (
+        "entry_date" DATE, "lead_number" INT, "state" CHAR(2), "appt_date" TIMESTAMP, "_partition_date" TEXT
+    )
+"""
+UNPARTITIONED_ROWS = """
+    ('2024-10-01', 1001, 'WA', '2024-10-05', '2024-10-01'),
+    ('2024-10-01', 1002, NULL, NULL, '2024-10-01'),
+    ('2024-10-02', 1003, 'AZ', NULL, '2024-10-02')
+"""
+
+@pytest.fixture
+def engine():
+    """The shared engine, with an empty TEST_SCHEMA (skips the tests if Postgres is down)."""
+    engine = get_db_engine(get_connection_uri())
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(TEST_SCHEMA)} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {quote_identifier(TEST_SCHEMA)}"))
+    except OperationalError as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(TEST_SCHEMA)} CASCADE"))
+
+def test_migrate_to_daily_partitions(engine):
+    with engine.begin() as conn:
+        conn.execute(text(UNPARTITIONED_TABLE_DDL))
+        conn.execute(text(f"INSERT INTO {quote_identifier(TEST_SCHEMA)}.stg_csv_snapshots VALUES {UNPARTITIONED_ROWS}"))
+        rows_before = pd.read_sql(text(f"SELECT * FROM {quote_identifier(TEST_SCHEMA)}.stg_csv_snapshots"), conn)
+
+        assert migrate_to_daily_partitions(conn, TEST_SCHEMA, 'stg_csv_snapshots') == 3
+
+        assert is_partitioned_table(conn, TEST_SCHEMA, 'stg_csv_snapshots')
+        assert sorted(get_daily_partitions(conn, TEST_SCHEMA, 'stg_csv_snapshots').values()) == [
+            'stg_csv_snapshots_20241001', 'stg_csv_snapshots_20241002']
+        column_types = get_column_types(conn, TEST_SCHEMA, 'stg_csv_snapshots')
+        assert column_types == {'entry_date': 'date', 'lead_number': 'integer', 'state': 'character(2)',
+                                'appt_date': 'timestamp without time zone', '_partition_date': 'date'}
+        rows_after = pd.read_sql(text(f"SELECT * FROM {quote_identifier(TEST_SCHEMA)}.stg_csv_snapshots ORDER BY lead_number"), conn)
+        assert rows_after.drop(columns='_partition_date').equals(rows_before.drop(columns='_partition_date'))
+        assert rows_after['_partition_date'].astype(str).tolist() == rows_before['_partition_date'].tolist()
+        assert get_column_types(conn, TEST_SCHEMA, 'stg_csv_snapshots_unpartitioned') == {}
+
+        # Already partitioned: nothing to do
+        assert migrate_to_daily_partitions(conn, TEST_SCHEMA, 'stg_csv_snapshots') == 0
+
+def test_create_daily_partitions_on_unpartitioned_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(UNPARTITIONED_TABLE_DDL))
+        with pytest.raises(RuntimeError, match='not partitioned'):
+            create_daily_partitions(conn, TEST_SCHEMA, 'stg_csv_snapshots', ['2024-10-01'])
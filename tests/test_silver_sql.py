@@ -0,0 +1,154 @@
+# test_silver_sql.py
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+try:
+    from utils_connection import get_connection_uri, get_db_engine
+except ValueError:  # Raised on import when the Postgres environment variables are not set
+    pytest.skip("No Postgres configured (POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DB).",
+                allow_module_level=True)
+
+from load import quote_identifier, write_df_to_postgres
+from partitions import create_daily_partitions
+from silver_sql import (CSV_COLUMNS, PARQUET_COLUMNS, build_csv_silver_query, build_parquet_silver_query,
+                        check_silver_sql_parity, insert_csv_silver, insert_parquet_silver)
+from transform import DataTransformer
+from utils_checks_db import get_silver_table_data_types
+
+# Schema holding the Bronze fixtures (dropped after the tests)
+TEST_SCHEMA = 'test_silver_sql'
+
+# Bronze CSV rows with the quirks of the real snapshots:
+# (ENTRYDATE, LEADNUMBER, email_hash, phone_hash, CITY, STATE, ZIP, APPT_DATE, Set, Demo, Dispo, JOB_STATUS, location, _extraction_date, _partition_date)
+BRONZE_CSV_ROWS = [
+    # Valid row: MM/DD/YYYY entry date, 'MM/DD/YYYY  h:mmPM' appointment (hour padded with a space), Demo True
+    ('10/01/2024', '1001', 'e1', 'p1', 'Seattle', 'WA', '98101', '10/05/2024  2:30PM', '1', 'True', 'Sold', 'Open', 'Seattle | WA', '2024-10-01', '2024-10-01'),
+    # DD-MM-YYYY entry date, AM appointment, Demo False, ZIP with a leading '0'
+    ('25-10-2024', '1002', 'e2', 'p2', 'Boston', 'MA', '02134', '10/07/2024 11:05AM', '0', 'False', 'No Sale', 'Closed', 'Boston | MA', '2024-10-01', '2024-10-01'),
+    # YYYY-MM-DD and invalid entry dates, no appointment
+    ('2024-10-03', '1003', 'e3', 'p3', 'Phoenix', 'AZ', '85001', '', '1', 'True', 'Sold', 'Open', 'Phoenix | AZ', '2024-10-01', '2024-10-01'),
+    ('13/45/2023', '1004', 'e4', 'p4', 'Tucson', 'AZ', '85701', 'nan', '1', 'True', 'Sold', 'Open', 'Tucson | AZ', '2024-10-01', '2024-10-01'),
+    # Blank and 'nan' states, inferred from 'City | ST' locations (with extra whitespace)
+    ('10/02/2024', '1005', 'e5', 'p5', 'Boise', '  ', '83702', '', '1', 'True', 'Sold', 'Open', '  Boise | ID  ', '2024-10-02', '2024-10-02'),
+    ('10/02/2024', '1006', 'e6', 'p6', 'Portland', 'nan', '97201', '', '1', 'False', 'Sold', 'Open', 'Portland | OR', '2024-10-02', '2024-10-02'),
+    # 'nu' sentinels: state, city and location without a state code
+    ('10/02/2024', '1007', 'e7', 'p7', 'nu', 'nu', '98001', '', '1', 'True', 'nu', 'Open', ' | nu', '2024-10-02', '2024-10-02'),
+    # Short, blank and non-numeric ZIP codes (set to NULL), whitespace-only Dispo
+    ('10/02/2024', '1008', 'e8', 'p8', 'Spokane', 'WA', '1234', '', '1', 'True', '   ', 'Open', 'Spokane | WA', '2024-10-02', '2024-10-02'),
+    ('10/02/2024', '1009', 'e9', 'p9', 'Reno', 'NV', '', '', '1', 'True', 'Sold', '<NA>', 'Reno | NV', '2024-10-02', '2024-10-02'),
+    ('10/02/2024', '1010', 'e10', 'p10', 'Chicago', 'IL', 'abcde', '', '1', 'True', 'None', 'Open', 'Chicago | IL', '2024-10-02', '2024-10-02'),
+    # Dropped rows: a '-----' value, an 'nu' appointment, and a ZIP equal to 0
+    ('-----', '-----', '-----', '-----', '-----', '-----', '-----', '-----', '-----', '-----', '-----', '-----', '-----', '2024-10-02', '2024-10-02'),
+    ('10/02/2024', '1011', 'e11', 'p11', 'Eugene', 'OR', '97401', 'nu', '1', 'True', 'Sold', 'Open', 'Eugene | OR', '2024-10-02', '2024-10-02'),
+    ('10/02/2024', '1012', 'e12', 'p12', 'Salem', 'OR', '00000', '', '1', 'True', 'Sold', 'Open', 'Salem | OR', '2024-10-02', '2024-10-02'),
+]
+
+# Rows kept by both engines (the last three are dropped)
+EXPECTED_CSV_SILVER_ROWS = len(BRONZE_CSV_ROWS) - 3
+
+# Bronze Parquet rows: hashes to normalize, a duplicate ID and a row without ID
+BRONZE_PARQUET_ROWS = [
+    ('u1', ' P1 ', 'E1', '2024-10-01'),
+    ('u2', 'p2', ' e2', '2024-10-01'),
+    ('u1', ' P1 ', 'E1', '2024-10-01'),
+    (None, 'p3', 'e3', '2024-10-01'),
+]
+
+# Rows kept by both engines (the duplicate and the row without ID are dropped)
+EXPECTED_PARQUET_SILVER_ROWS = 2
+
+def create_bronze_table(conn, table_name: str, columns: list, rows: list):
+    """Creates a Bronze table of TEXT columns (as in create_bronze_tables.sql) in TEST_SCHEMA and loads the rows."""
+    column_list = ', '.join(f"{quote_identifier(column)} TEXT" for column in columns)
+    conn.execute(text(f"CREATE TABLE {quote_identifier(TEST_SCHEMA)}.{quote_identifier(table_name)} ({column_list})"))
+    write_df_to_postgres(conn, pd.DataFrame(rows, columns=columns), table_name, TEST_SCHEMA, method='copy')
+
+def create_typed_silver_table(conn, table_name: str, silver_table: str):
+    """Creates a copy of a Silver table with the types of apply_silver_types.sql (as after step4) in TEST_SCHEMA."""
+    column_types = get_silver_table_data_types()[silver_table]
+    column_list = ', '.join(f"{quote_identifier(column)} {data_type}" for column, data_type in column_types.items())
+    partitioning = 'PARTITION BY RANGE ("_partition_date")' if '_partition_date' in column_types else ''
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(TEST_SCHEMA)}.{quote_identifier(table_name)}"))
+    conn.execute(text(f"CREATE TABLE {quote_identifier(TEST_SCHEMA)}.{quote_identifier(table_name)} ({column_list}) {partitioning}"))
+
+def count_differing_rows(conn, table_name: str, other_table_name: str) -> int:
+    """Number of rows of a table missing from the other one, and the other way round (rows compared as a multiset)."""
+    table = f"{quote_identifier(TEST_SCHEMA)}.{quote_identifier(table_name)}"
+    other_table = f"{quote_identifier(TEST_SCHEMA)}.{quote_identifier(other_table_name)}"
+    return conn.execute(text(f"""
+        SELECT (SELECT count(*) FROM (SELECT * FROM {table} EXCEPT ALL SELECT * FROM {other_table}) AS table_only)
+             + (SELECT count(*) FROM (SELECT * FROM {other_table} EXCEPT ALL SELECT * FROM {table}) AS other_only)
+    """)).scalar()
+
+@pytest.fixture(scope='module')
+def engine():
+    """The shared engine, with the Bronze fixtures loaded in TEST_SCHEMA (skips the tests if Postgres is down)."""
+    engine = get_db_engine(get_connection_uri())
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(TEST_SCHEMA)} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {quote_identifier(TEST_SCHEMA)}"))
+            create_bronze_table(conn, 'csv_snapshots', list(CSV_COLUMNS), BRONZE_CSV_ROWS)
+            create_bronze_table(conn, 'leads_parquet', list(PARQUET_COLUMNS), BRONZE_PARQUET_ROWS)
+    except OperationalError as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {quote_identifier(TEST_SCHEMA)} CASCADE"))
+
+@pytest.mark.parametrize('typed', [False, True], ids=['untyped', 'typed'])
+def test_csv_silver_sql_parity(engine, typed):
+    with engine.connect() as conn:
+        sql_df = pd.read_sql(text(build_csv_silver_query(TEST_SCHEMA, typed=typed)), conn)
+    assert len(sql_df) == EXPECTED_CSV_SILVER_ROWS
+
+    differences = check_silver_sql_parity(engine, 'csv', typed=typed, source_schema=TEST_SCHEMA)
+    assert differences.empty, differences.to_string()
+
+def test_csv_silver_sql_parity_by_partition(engine):
+    differences = check_silver_sql_parity(engine, 'csv', partition_dates=['2024-10-02'], source_schema=TEST_SCHEMA)
+    assert differences.empty, differences.to_string()
+
+def test_parquet_silver_sql_parity(engine):
+    with engine.connect() as conn:
+        sql_df = pd.read_sql(text(build_parquet_silver_query(TEST_SCHEMA)), conn)
+    assert len(sql_df) == EXPECTED_PARQUET_SILVER_ROWS
+
+    differences = check_silver_sql_parity(engine, 'parquet', source_schema=TEST_SCHEMA)
+    assert differences.empty, differences.to_string()
+
+@pytest.mark.parametrize('typed', [False, True], ids=['untyped', 'typed'])
+def test_csv_silver_sql_into_step4_types(engine, typed):
+    """Both engines append to a Silver table typed by step4 (DATE, TIMESTAMP, INT, CHAR(2)) and store the same rows."""
+    transformer = DataTransformer(engine=engine)
+    with engine.begin() as conn:
+        create_typed_silver_table(conn, 'stg_csv_snapshots', 'stg_csv_snapshots')
+        create_typed_silver_table(conn, 'stg_csv_snapshots_pandas', 'stg_csv_snapshots')
+
+        assert insert_csv_silver(conn, typed=typed, source_schema=TEST_SCHEMA, target_schema=TEST_SCHEMA) == EXPECTED_CSV_SILVER_ROWS
+
+        bronze_df = pd.read_sql(text(f"SELECT * FROM {quote_identifier(TEST_SCHEMA)}.csv_snapshots"), conn)
+        pandas_df = transformer.clean_csv(bronze_df, typed=typed)
+        create_daily_partitions(conn, TEST_SCHEMA, 'stg_csv_snapshots_pandas', pandas_df['_partition_date'])
+        write_df_to_postgres(conn, pandas_df, 'stg_csv_snapshots_pandas', TEST_SCHEMA, method='copy')
+
+        assert count_differing_rows(conn, 'stg_csv_snapshots', 'stg_csv_snapshots_pandas') == 0
+        missing_appointments = conn.execute(text(
+            f'SELECT count(*) FROM {quote_identifier(TEST_SCHEMA)}.stg_csv_snapshots WHERE "appt_date" IS NULL')).scalar()
+        assert missing_appointments > 0
+
+def test_parquet_silver_sql_into_step4_types(engine):
+    transformer = DataTransformer(engine=engine)
+    with engine.begin() as conn:
+        create_typed_silver_table(conn, 'stg_leads_parquet', 'stg_leads_parquet')
+        create_typed_silver_table(conn, 'stg_leads_parquet_pandas', 'stg_leads_parquet')
+
+        assert insert_parquet_silver(conn, source_schema=TEST_SCHEMA, target_schema=TEST_SCHEMA) == EXPECTED_PARQUET_SILVER_ROWS
+
+        bronze_df = pd.read_sql(text(f"SELECT * FROM {quote_identifier(TEST_SCHEMA)}.leads_parquet"), conn)
+        write_df_to_postgres(conn, transformer.clean_parquet(bronze_df), 'stg_leads_parquet_pandas', TEST_SCHEMA, method='copy')
+
+        assert count_differing_rows(conn, 'stg_leads_parquet', 'stg_leads_parquet_pandas') == 0